@@ -4,7 +4,14 @@
 复刻MediaConvert的统一任务创建接口，支持多种输入方式和任务类型
 """
 
-from typing import Optional, Union
+import asyncio
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Optional, Union, Tuple
+
+import aiofiles
 from fastapi import APIRouter, Request, Form, File, UploadFile, HTTPException, Depends
 from fastapi.responses import JSONResponse
 
@@ -15,6 +22,16 @@ from utils.logging_utils import configure_logging
 router = APIRouter()
 logger = configure_logging(name=__name__)
 
+# 上传文件读取块大小和大小上限
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE_KB", "1024")) * 1024
+UPLOAD_MAX_SIZE = int(os.getenv("UPLOAD_MAX_SIZE_MB", "1024")) * 1024 * 1024
+# 进度流的轮询间隔(秒)
+PROGRESS_STREAM_INTERVAL = int(os.getenv("PROGRESS_STREAM_INTERVAL_MS", "500")) / 1000
+# 任务列表 with_total 计数的上限
+TASK_LIST_COUNT_CAP = int(os.getenv("TASK_LIST_COUNT_CAP", "10000"))
+# 只能由服务端写入的任务参数，客户端传入时丢弃
+INTERNAL_PARAM_KEYS = ('input_sha256',)
+
 # 全局任务处理器实例
 task_processor: Optional[EnhancedTaskProcessor] = None
 
@@ -28,12 +45,14 @@ async def get_task_processor() -> EnhancedTaskProcessor:
 
 
 def initialize_task_processor(database_type: str = "sqlite", 
-                            database_url: str = "sqlite:///./document_tasks.db"):
+                            database_url: str = "sqlite:///./document_tasks.db",
+                            max_concurrent_tasks: int = 3):
     """初始化任务处理器"""
     global task_processor
     task_processor = EnhancedTaskProcessor(
         database_type=database_type,
-        database_url=database_url
+        database_url=database_url,
+        max_concurrent_tasks=max_concurrent_tasks
     )
 
 
@@ -256,11 +275,6 @@ async def create_document_task(
                 detail="Only one input method allowed"
             )
         
-        # 处理文件上传
-        if file_upload:
-            # TODO: 实现文件上传逻辑
-            raise HTTPException(status_code=501, detail="File upload not implemented yet")
-        
         # 解析参数
         task_params = {}
         if params:
@@ -269,6 +283,9 @@ async def create_document_task(
                 task_params = json.loads(params)
             except json.JSONDecodeError:
                 raise HTTPException(status_code=400, detail="Invalid params JSON")
+            if not isinstance(task_params, dict):
+                raise HTTPException(status_code=400, detail="params must be a JSON object")
+            task_params = _strip_internal_params(task_params)
         
         # 验证优先级
         if priority not in ["low", "normal", "high"]:
@@ -282,6 +299,15 @@ async def create_document_task(
             if file_path != original_file_path:
                 logger.info(f"Fixed file_path encoding: {original_file_path} -> {file_path}")
 
+        # 处理文件上传 - 边读取边计算SHA-256写入工作空间暂存文件，创建任务时重命名到input目录
+        staged_input = None
+        staged_filename = None
+        input_sha256 = None
+        if file_upload:
+            staged_filename = Path(file_upload.filename or "").name or "upload"
+            staged_input, input_sha256, input_size = await _stage_uploaded_file(file_upload, processor)
+            logger.info(f"Staged uploaded file: {input_size} bytes, sha256: {input_sha256[:16]}")
+
         # 创建任务请求
         task_request = TaskCreateRequest(
             task_type=task_type,
@@ -297,7 +323,13 @@ async def create_document_task(
         )
         
         # 创建任务
-        task_id = await processor.create_task(task_request)
+        try:
+            task_id = await processor.create_task(task_request, staged_input=staged_input,
+                                                  staged_filename=staged_filename, input_sha256=input_sha256)
+        finally:
+            # 创建失败时清理未移动的暂存文件
+            if staged_input is not None and staged_input.exists():
+                staged_input.unlink()
         
         logger.info(f"Created document conversion task {task_id} for platform {platform}")
         
@@ -314,6 +346,207 @@ async def create_document_task(
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
+def _strip_internal_params(params: Optional[dict]) -> Optional[dict]:
+    """
+    去掉客户端参数中只能由服务端写入的字段（如上传文件SHA-256，客户端伪造会命中或污染其他文档的转换缓存）
+
+    Args:
+        params: 客户端提交的任务参数
+
+    Returns:
+        清理后的任务参数
+    """
+    if not isinstance(params, dict):
+        return params
+    dropped = [key for key in INTERNAL_PARAM_KEYS if key in params]
+    if not dropped:
+        return params
+    logger.warning(f"Ignoring client-supplied internal params: {dropped}")
+    return {key: value for key, value in params.items() if key not in INTERNAL_PARAM_KEYS}
+
+
+async def _stage_uploaded_file(file_upload: UploadFile, processor: EnhancedTaskProcessor) -> Tuple[Path, str, int]:
+    """
+    把上传文件分块写入工作空间暂存目录，同时计算SHA-256（用于转换结果缓存键）
+
+    Args:
+        file_upload: 上传文件
+        processor: 任务处理器
+
+    Returns:
+        (暂存文件路径, SHA-256, 文件大小)
+    """
+    chunk_size = UPLOAD_CHUNK_SIZE
+    max_size = UPLOAD_MAX_SIZE
+    staged_path = processor.workspace_manager.create_upload_staging_path()
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(staged_path, 'wb') as f:
+            while True:
+                chunk = await file_upload.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise HTTPException(status_code=413, detail=f"Uploaded file exceeds {max_size} bytes")
+                digest.update(chunk)
+                await f.write(chunk)
+        if size == 0:
+            raise HTTPException(status_code=400, detail="Uploaded file is empty")
+    except BaseException:
+        if staged_path.exists():
+            staged_path.unlink()
+        raise
+    finally:
+        await file_upload.close()
+    return staged_path, digest.hexdigest(), size
+
+
+def _parse_batch_items(body: bytes, content_type: str) -> Tuple[dict, list, Optional[dict]]:
+    """
+    解析批量提交的请求体
+
+    Args:
+        body: 原始请求体
+        content_type: 请求Content-Type
+
+    Returns:
+        (公共默认参数, 任务列表, S3前缀展开配置)
+    """
+    if "ndjson" in content_type or "jsonl" in content_type:
+        items = []
+        for line_no, line in enumerate(body.decode('utf-8').splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                raise HTTPException(status_code=400, detail=f"Invalid JSON on line {line_no}: {e.msg}")
+        return {}, items, None
+
+    try:
+        payload = json.loads(body)
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON body: {e.msg}")
+
+    if isinstance(payload, list):
+        return {}, payload, None
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=400, detail="Body must be a JSON list or object")
+
+    defaults = payload.get('defaults') or {}
+    if not isinstance(defaults, dict):
+        raise HTTPException(status_code=400, detail="defaults must be an object")
+    tasks = payload.get('tasks')
+    s3_prefix = payload.get('s3_prefix')
+    if (tasks is None) == (s3_prefix is None):
+        raise HTTPException(status_code=400, detail="Provide exactly one of tasks or s3_prefix")
+    if tasks is not None and not isinstance(tasks, list):
+        raise HTTPException(status_code=400, detail="tasks must be a list")
+    if s3_prefix is not None and not isinstance(s3_prefix, dict):
+        raise HTTPException(status_code=400, detail="s3_prefix must be an object")
+    return defaults, tasks or [], s3_prefix
+
+
+def _build_batch_request(defaults: dict, item: dict) -> TaskCreateRequest:
+    """合并默认参数并校验单个批量任务（输入方式校验与单任务接口一致）"""
+    if not isinstance(item, dict):
+        raise ValueError("task must be an object")
+    fields = {**defaults, **item}
+    if isinstance(defaults.get('params'), dict) and isinstance(item.get('params'), dict):
+        fields['params'] = {**defaults['params'], **item['params']}
+    fields['params'] = _strip_internal_params(fields.get('params'))
+
+    input_count = sum([
+        bool(fields.get('bucket_name') and fields.get('file_path')),
+        bool(fields.get('file_url')),
+        bool(fields.get('input_path'))
+    ])
+    if input_count != 1:
+        raise ValueError("Must provide exactly one input method: (bucket_name + file_path), file_url or input_path")
+
+    if fields.get('file_path'):
+        from utils.encoding_utils import EncodingUtils
+        fields['file_path'] = EncodingUtils.fix_file_path_encoding(fields['file_path'])
+
+    return TaskCreateRequest(**fields)
+
+
+@router.post("/tasks/batch", summary="批量创建任务")
+async def create_document_tasks_batch(
+    request: Request,
+    processor: EnhancedTaskProcessor = Depends(get_task_processor)
+):
+    """
+    批量创建文档转换任务
+
+    请求体支持三种形式：
+    - `application/x-ndjson`：每行一个任务对象，字段与 TaskCreateRequest 相同
+    - JSON列表：`[{"task_type": ..., "bucket_name": ..., "file_path": ...}, ...]`
+    - JSON对象：`{"defaults": {...}, "tasks": [...]}`，或用 `s3_prefix` 代替 `tasks`，
+      展开前缀下的对象，每个对象创建一个任务：
+      `{"defaults": {"task_type": "pdf_to_markdown"}, "s3_prefix": {"bucket_name": "ai-file", "prefix": "docs/", "suffixes": [".pdf"]}}`
+
+    所有任务校验通过后才会写入数据库（任一任务无效时整批返回400），
+    任务分块批量插入，插入完成后只唤醒一次调度协程。
+    """
+    try:
+        max_tasks = int(os.getenv("BATCH_MAX_TASKS", "50000"))
+        body = await request.body()
+        defaults, items, s3_prefix = _parse_batch_items(body, request.headers.get("content-type", ""))
+
+        if s3_prefix is not None:
+            bucket_name = s3_prefix.get('bucket_name') or defaults.get('bucket_name')
+            if not bucket_name:
+                raise HTTPException(status_code=400, detail="s3_prefix.bucket_name is required")
+            max_files = min(int(s3_prefix.get('max_files') or max_tasks), max_tasks)
+            listing = await processor.s3_download_service.list_objects(
+                bucket_name,
+                prefix=s3_prefix.get('prefix', ""),
+                suffixes=s3_prefix.get('suffixes'),
+                max_keys=max_files
+            )
+            if not listing['success']:
+                raise HTTPException(status_code=502, detail=f"Failed to list S3 prefix: {listing['error']}")
+            items = [{'bucket_name': bucket_name, 'file_path': obj['key']} for obj in listing['objects']]
+
+        if not items:
+            raise HTTPException(status_code=400, detail="No tasks to create")
+        if len(items) > max_tasks:
+            raise HTTPException(status_code=400, detail=f"Too many tasks: {len(items)} (limit: {max_tasks})")
+
+        task_requests = []
+        errors = []
+        for index, item in enumerate(items):
+            try:
+                task_requests.append(_build_batch_request(defaults, item))
+            except (ValueError, TypeError) as e:
+                errors.append({'index': index, 'error': str(e)})
+        if errors:
+            raise HTTPException(status_code=400, detail={'message': f"{len(errors)} invalid tasks", 'errors': errors[:100]})
+
+        task_ids = await processor.create_tasks_batch(task_requests)
+
+        logger.info(f"Created {len(task_ids)} document conversion tasks in batch "
+                    f"(IDs {task_ids[0]}-{task_ids[-1]})")
+
+        return {
+            "message": f"{len(task_ids)} document conversion tasks created successfully",
+            "status": "pending",
+            "count": len(task_ids),
+            "first_task_id": task_ids[0],
+            "last_task_id": task_ids[-1],
+            "task_ids": task_ids
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to create batch tasks: {e}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
 @router.put("/tasks/{task_id}/task-type", summary="修改任务类型")
 async def update_task_type(
     task_id: int,
@@ -469,6 +702,117 @@ async def get_task(
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
+async def _iter_progress_events(task: DocumentTask,
+                                request: Request,
+                                processor: EnhancedTaskProcessor,
+                                include_markdown: bool):
+    """
+    生成任务进度的Server-Sent Events
+
+    处理中任务读取处理器内存中的实时进度，不查询数据库；其他状态读取数据库。
+    Markdown按已完整写出的字节数增量推送，任务结束时推送剩余内容和end事件。
+    """
+    offset = 0
+    last_progress = None
+    while True:
+        if await request.is_disconnected():
+            return
+
+        live = processor.get_task_progress(task.id)
+        if live is not None:
+            progress = {
+                "status": "processing",
+                "stage": live.get("stage"),
+                "pages_processed": live.get("pages_processed"),
+                "page_count": live.get("page_count")
+            }
+            markdown_path = live.get("markdown_path")
+            markdown_bytes = live.get("markdown_bytes", 0)
+            finished = False
+        else:
+            task = await processor.db_manager.get_task(task.id)
+            if not task:
+                yield _format_sse("error", {"detail": "Task not found"})
+                return
+            status = task.status.value if hasattr(task.status, 'value') else task.status
+            finished = status in ("completed", "failed", "cancelled")
+            progress = {
+                "status": status,
+                "stage": status,
+                "pages_processed": task.pages_processed,
+                "page_count": task.result.get("page_count") if isinstance(task.result, dict) else None
+            }
+            markdown_path = task.output_path if finished and (task.output_path or "").endswith(".md") else None
+            markdown_bytes = None
+
+        if progress != last_progress:
+            last_progress = progress
+            yield _format_sse("progress", progress)
+
+        if include_markdown and markdown_path and Path(markdown_path).exists():
+            if markdown_bytes is None:
+                markdown_bytes = Path(markdown_path).stat().st_size
+            if markdown_bytes < offset:
+                # 任务重试时Markdown重新生成，从头推送
+                offset = 0
+            if markdown_bytes > offset:
+                async with aiofiles.open(markdown_path, 'rb') as f:
+                    await f.seek(offset)
+                    data = await f.read(markdown_bytes - offset)
+                yield _format_sse("markdown", {"offset": offset, "text": data.decode('utf-8', errors='replace')})
+                offset = markdown_bytes
+
+        if finished:
+            yield _format_sse("end", {
+                "status": progress["status"],
+                "output_url": task.output_url,
+                "error_message": task.error_message
+            })
+            return
+
+        await asyncio.sleep(PROGRESS_STREAM_INTERVAL)
+
+
+def _format_sse(event: str, data: dict) -> str:
+    """格式化一条Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.get("/tasks/{task_id}/progress/stream", summary="流式获取任务进度")
+async def stream_task_progress(
+    task_id: str,
+    request: Request,
+    include_markdown: bool = True,
+    processor: EnhancedTaskProcessor = Depends(get_task_processor)
+):
+    """
+    以Server-Sent Events推送任务进度和已生成的Markdown
+
+    事件类型：
+    - progress: 状态、阶段、已处理页数和总页数（变化时推送）
+    - markdown: 新写出的Markdown片段（offset为片段在文件中的字节偏移），大文档可以在后续页面完成前读取前面的页面
+    - end: 任务结束，附带 output_url / error_message
+
+    Args:
+        task_id: 任务ID
+        request: 请求对象（检测客户端断开）
+        include_markdown: 是否推送Markdown内容
+
+    Returns:
+        text/event-stream 响应
+    """
+    task = await processor.db_manager.get_task(task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    from fastapi.responses import StreamingResponse
+    return StreamingResponse(
+        _iter_progress_events(task, request, processor, include_markdown),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get(
     "/tasks",
     summary="查询任务列表",
@@ -483,7 +827,9 @@ async def get_task(
     - **task_type**: 按任务类型过滤 (pdf_to_markdown, office_to_pdf, office_to_markdown)
     - **platform**: 按平台过滤
     - **limit**: 返回结果数量限制 (默认20)
-    - **offset**: 分页偏移量 (默认0)
+    - **cursor**: 分页游标，传入上一页返回的 `next_cursor` 获取下一页（推荐，每页耗时与页码无关）
+    - **offset**: 分页偏移量 (默认0，与cursor互斥；翻页越深越慢，仅为兼容保留)
+    - **with_total**: 是否返回总数（最多数到 `TASK_LIST_COUNT_CAP` 条，超过时 `total_exact` 为false）
 
     ### 💡 使用示例
     ```bash
@@ -493,8 +839,9 @@ async def get_task(
     # 查询已完成的PDF转Markdown任务
     curl "http://localhost:8000/api/tasks?status=completed&task_type=pdf_to_markdown&limit=10"
 
-    # 分页查询
-    curl "http://localhost:8000/api/tasks?offset=20&limit=10"
+    # 游标分页：第一页不带cursor，之后传入上一页的next_cursor
+    curl "http://localhost:8000/api/tasks?limit=10&with_total=true"
+    curl "http://localhost:8000/api/tasks?limit=10&cursor=WyIyMDI1LTA4LTA5VDEwOjAwOjAwIiwxMjNd"
     ```
     """,
     responses={
@@ -518,13 +865,13 @@ async def get_task(
                                 "task_processing_time": 150.5
                             }
                         ],
+                        "count": 1,
                         "total": 1,
+                        "total_exact": True,
                         "offset": 0,
                         "limit": 20,
-                        "filters": {
-                            "status": "completed",
-                            "task_type": "pdf_to_markdown"
-                        }
+                        "has_more": False,
+                        "next_cursor": None
                     }
                 }
             }
@@ -538,28 +885,49 @@ async def query_tasks(
     platform: Optional[str] = None,
     limit: int = 20,
     offset: int = 0,
+    cursor: Optional[str] = None,
+    with_total: bool = False,
     processor: EnhancedTaskProcessor = Depends(get_task_processor)
 ):
-    """查询任务列表，支持多种过滤条件"""
+    """查询任务列表，支持多种过滤条件和游标分页"""
     try:
-        filter_params = QueryTasksFilter(
-            status=status,
-            priority=priority,
-            task_type=task_type,
-            platform=platform,
-            limit=limit,
-            offset=offset
-        )
+        if cursor and offset:
+            raise HTTPException(status_code=400, detail="cursor and offset cannot be used together")
+
+        try:
+            filter_params = QueryTasksFilter(
+                status=status,
+                priority=priority,
+                task_type=task_type,
+                platform=platform,
+                limit=limit,
+                offset=offset,
+                cursor=cursor
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        page = await processor.db_manager.query_tasks_page(filter_params)
         
-        tasks = await processor.db_manager.query_tasks(filter_params)
+        total = None
+        total_exact = None
+        if with_total:
+            counted = await processor.db_manager.count_tasks(filter_params, cap=TASK_LIST_COUNT_CAP)
+            total, total_exact = counted['total'], counted['exact']
         
         return {
-            "tasks": [task.to_dict() for task in tasks],
-            "total": len(tasks),
+            "tasks": [task.to_dict() for task in page['tasks']],
+            "count": len(page['tasks']),
+            "total": total,
+            "total_exact": total_exact,
             "limit": limit,
-            "offset": offset
+            "offset": offset,
+            "has_more": page['has_more'],
+            "next_cursor": page['next_cursor']
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to query tasks: {e}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
@@ -673,14 +1041,16 @@ async def retry_failed_tasks(
 async def download_file(
     task_id: str, 
     file_name: str,
+    request: Request,
     processor: EnhancedTaskProcessor = Depends(get_task_processor)
 ):
     """
-    下载转换后的文件（代理MinIO下载）
+    下载转换后的文件（代理MinIO下载，分块流式转发，支持Range断点续传和ETag缓存校验）
     
     Args:
         task_id: 任务ID
         file_name: 文件名
+        request: 请求对象（读取Range / If-Range / If-None-Match / If-Modified-Since）
     
     Returns:
         文件下载响应
@@ -732,28 +1102,31 @@ async def download_file(
         else:
             raise HTTPException(status_code=400, detail="Unsupported file URL format")
         
-        # 使用S3DownloadService下载文件数据
-        from services.s3_download_service import S3DownloadService
-        s3_service = S3DownloadService()
-        
-        download_result = await s3_service.download_file_data(
+        # 以流的方式打开S3对象，条件请求和范围请求交给S3处理
+        stream_result = await processor.s3_download_service.open_object_stream(
             bucket_name=bucket_name,
-            s3_key=s3_key
+            s3_key=s3_key,
+            range_header=request.headers.get('range'),
+            if_range=request.headers.get('if-range'),
+            if_none_match=request.headers.get('if-none-match'),
+            if_modified_since=request.headers.get('if-modified-since')
         )
         
-        if not download_result.get('success'):
-            raise HTTPException(status_code=500, detail=f"Download failed: {download_result.get('error')}")
+        if not stream_result.get('success'):
+            if stream_result.get('error_code') in ('NoSuchKey', '404'):
+                raise HTTPException(status_code=404, detail="File not found")
+            raise HTTPException(status_code=500, detail=f"Download failed: {stream_result.get('error')}")
         
-        # 获取文件数据和内容类型
-        file_data = download_result['data']
-        content_type = download_result.get('content_type', 'application/octet-stream')
-        
-        # 返回文件响应
-        from fastapi.responses import StreamingResponse
-        from urllib.parse import quote
+        from fastapi.responses import Response, StreamingResponse
         import os
         import re
-        import io
+        
+        status_code = stream_result['status']
+        headers = dict(stream_result['headers'])
+        
+        # 304未修改 / 416范围无效时不返回内容
+        if status_code in (304, 416):
+            return Response(status_code=status_code, headers=headers)
         
         # 获取文件名（不包含路径）
         safe_filename = os.path.basename(decoded_file_name)
@@ -761,17 +1134,13 @@ async def download_file(
         # 创建ASCII安全的文件名用于Content-Disposition
         # 移除或替换非ASCII字符
         ascii_filename = re.sub(r'[^\x00-\x7F]+', '_', safe_filename)
-        
-        # 创建字节流
-        file_stream = io.BytesIO(file_data)
+        headers["Content-Disposition"] = f"attachment; filename={ascii_filename}"
         
         return StreamingResponse(
-            io.BytesIO(file_data),
-            media_type=content_type,
-            headers={
-                "Content-Disposition": f"attachment; filename={ascii_filename}",
-                "Content-Length": str(len(file_data))
-            }
+            processor.s3_download_service.iter_object_chunks(stream_result['body']),
+            status_code=status_code,
+            media_type=stream_result['content_type'],
+            headers=headers
         )
         
     except HTTPException:
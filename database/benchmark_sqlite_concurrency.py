@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+SQLite并发写入基准测试
+在临时SQLite数据库中用多个写协程（update_task）和读协程（get_task / query_tasks_page）
+同时访问 DatabaseManager，分别测量默认配置（回滚日志、每个会话新建连接）、
+生产配置（WAL + 写连接池 + 只读连接池）和单写连接配置（SQLITE_WRITE_POOL_SIZE=1）下的
+写入/读取吞吐、延迟和 "database is locked" 错误数。
+
+用法:
+    python database/benchmark_sqlite_concurrency.py
+    python database/benchmark_sqlite_concurrency.py --writers 16 --readers 8 --duration 10 --rows 50000
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+from statistics import median
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.database_manager import DatabaseManager
+from database.models import QueryTasksFilter, TaskPriority, TaskStatus
+
+TASK_TYPES = ['pdf_to_markdown', 'office_to_markdown', 'office_to_pdf', 'image_to_markdown']
+
+
+async def _seed(db: DatabaseManager, rows: int) -> list:
+    """写入初始任务数据，返回任务ID列表"""
+    rng = random.Random(42)
+    return await db.create_tasks_bulk([
+        {
+            'task_type': rng.choice(TASK_TYPES),
+            'status': TaskStatus.pending,
+            'priority': rng.choice(list(TaskPriority)),
+            'platform': f"platform_{i % 20}",
+            'bucket_name': 'ai-file',
+            'file_path': f"docs/{i}.pdf",
+            'params': {'lang': 'ch'},
+            'retry_count': 0,
+            'max_retry_count': 3,
+        }
+        for i in range(rows)
+    ], chunk_size=2000)
+
+
+async def _writer(db: DatabaseManager, task_ids: list, deadline: float, stats: dict, seed: int):
+    """按处理器的写入形状循环更新任务字段"""
+    rng = random.Random(seed)
+    while time.perf_counter() < deadline:
+        task_id = rng.choice(task_ids)
+        start = time.perf_counter()
+        success = await db.update_task(
+            task_id,
+            status=TaskStatus.processing,
+            task_processing_time=rng.random() * 10,
+            output_path=f"/app/task/output/{task_id}/result.md"
+        )
+        stats['write_latency'].append((time.perf_counter() - start) * 1000)
+        stats['writes' if success else 'write_errors'] += 1
+
+
+async def _reader(db: DatabaseManager, task_ids: list, deadline: float, stats: dict, seed: int):
+    """交替执行任务详情和任务列表查询"""
+    rng = random.Random(seed)
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            if rng.random() < 0.5:
+                await db.get_task(rng.choice(task_ids))
+            else:
+                await db.query_tasks_page(QueryTasksFilter(status=TaskStatus.processing, limit=20))
+            stats['reads'] += 1
+        except Exception:
+            stats['read_errors'] += 1
+        stats['read_latency'].append((time.perf_counter() - start) * 1000)
+
+
+def _percentile(samples: list, q: float) -> float:
+    """计算百分位数（毫秒）"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+PROFILES = (
+    ('default', False, None),
+    ('tuned', True, None),
+    ('single_writer', True, 1),
+)
+
+
+async def run(tuned: bool, write_pool_size, rows: int, writers: int, readers: int, duration: float) -> dict:
+    """在一个临时数据库中运行一轮并发读写"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = DatabaseManager("sqlite", f"sqlite+aiosqlite:///{os.path.join(tmp_dir, 'bench.db')}",
+                             reconnect_interval=1, sqlite_tuning=tuned,
+                             sqlite_write_pool_size=write_pool_size)
+        await db.initialize()
+        try:
+            task_ids = await _seed(db, rows)
+            stats = {'writes': 0, 'write_errors': 0, 'reads': 0, 'read_errors': 0,
+                     'write_latency': [], 'read_latency': []}
+            deadline = time.perf_counter() + duration
+            start = time.perf_counter()
+            await asyncio.gather(
+                *(_writer(db, task_ids, deadline, stats, i) for i in range(writers)),
+                *(_reader(db, task_ids, deadline, stats, 1000 + i) for i in range(readers))
+            )
+            elapsed = time.perf_counter() - start
+        finally:
+            await db.close()
+
+    return {
+        'writes_per_sec': stats['writes'] / elapsed,
+        'reads_per_sec': stats['reads'] / elapsed,
+        'write_errors': stats['write_errors'],
+        'read_errors': stats['read_errors'],
+        'write_p50': median(stats['write_latency']) if stats['write_latency'] else 0.0,
+        'write_p99': _percentile(stats['write_latency'], 0.99),
+        'read_p50': median(stats['read_latency']) if stats['read_latency'] else 0.0,
+        'read_p99': _percentile(stats['read_latency'], 0.99),
+    }
+
+
+async def main_async(args) -> int:
+    """依次运行各配置并输出对比"""
+    results = {}
+    for name, tuned, write_pool_size in PROFILES:
+        results[name] = await run(tuned, write_pool_size, args.rows, args.writers, args.readers, args.duration)
+
+    print(f"\n{args.rows} rows, {args.writers} writers, {args.readers} readers, {args.duration:.0f}s per run")
+    print(f"  {'metric':<16}" + "".join(f"{name:>15}" for name, _, _ in PROFILES))
+    for metric in ('writes_per_sec', 'reads_per_sec', 'write_errors', 'read_errors',
+                   'write_p50', 'write_p99', 'read_p50', 'read_p99'):
+        print(f"  {metric:<16}" + "".join(f"{results[name][metric]:>15.1f}" for name, _, _ in PROFILES))
+    print("  (latencies in ms)")
+    return 0
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="Benchmark concurrent SQLite access with and without the tuned profile")
+    parser.add_argument("--rows", type=int, default=20000, help="tasks to seed before the run")
+    parser.add_argument("--writers", type=int, default=8, help="concurrent update_task coroutines")
+    parser.add_argument("--readers", type=int, default=4, help="concurrent query coroutines")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per run")
+    args = parser.parse_args()
+    return asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
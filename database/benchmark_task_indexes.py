@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+任务表索引基准测试
+在临时SQLite数据库中生成不同规模的任务数据，分别在无复合索引和有复合索引时
+测量调度认领与列表查询的耗时，观察查询时间随行数的变化。
+
+用法:
+    python database/benchmark_task_indexes.py --rows 10000 100000 500000 --explain
+    python database/benchmark_task_indexes.py --rows 200000 --pending-ratio 0.25
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import datetime as dt
+from statistics import median
+
+from sqlalchemy import create_engine, select, insert, text, func, and_, desc
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.database_manager import DatabaseManager
+from database.models import Base, DocumentTask, TaskStatus, TaskPriority
+
+TASK_TYPES = ['pdf_to_markdown', 'office_to_markdown', 'office_to_pdf', 'image_to_markdown']
+PLATFORMS = [f"platform_{i}" for i in range(20)]
+# 历史任务绝大多数已结束，待处理任务默认只占很小一部分（--pending-ratio 可模拟批量提交后的积压）
+STATUS_WEIGHTS = {
+    TaskStatus.completed: 0.94,
+    TaskStatus.failed: 0.03,
+    TaskStatus.processing: 0.01,
+}
+
+
+def build_queries(now: dt.datetime) -> dict:
+    """与 DatabaseManager 中相同形状的查询"""
+    return {
+        # claim_pending_tasks 的候选任务子查询
+        'claim_pending': DatabaseManager.build_pending_query(10),
+        # /api/tasks?status=pending
+        'list_by_status': (
+            select(DocumentTask)
+            .where(DocumentTask.status == TaskStatus.pending)
+            .order_by(desc(DocumentTask.created_at))
+            .limit(20)
+        ),
+        # /api/tasks?platform=...&created_after=...
+        'list_by_platform_range': (
+            select(DocumentTask)
+            .where(and_(DocumentTask.platform == PLATFORMS[3],
+                        DocumentTask.created_at >= now - dt.timedelta(days=30)))
+            .order_by(desc(DocumentTask.created_at))
+            .limit(20)
+        ),
+        # /api/tasks?task_type=...
+        'list_by_task_type': (
+            select(DocumentTask)
+            .where(DocumentTask.task_type == TASK_TYPES[1])
+            .order_by(desc(DocumentTask.created_at))
+            .limit(20)
+        ),
+        # /api/tasks
+        'list_all': (
+            select(DocumentTask)
+            .order_by(desc(DocumentTask.created_at))
+            .limit(20)
+        ),
+        # get_task_statistics
+        'status_counts': (
+            select(DocumentTask.status, func.count(DocumentTask.id)).group_by(DocumentTask.status)
+        ),
+    }
+
+
+def populate(engine, rows: int, now: dt.datetime, pending_ratio: float, batch_size: int = 20000):
+    """生成按创建时间递增的任务数据（时间跨度一年）"""
+    rng = random.Random(42)
+    statuses = list(STATUS_WEIGHTS) + [TaskStatus.pending]
+    weights = [w * (1 - pending_ratio) / sum(STATUS_WEIGHTS.values()) for w in STATUS_WEIGHTS.values()]
+    weights.append(pending_ratio)
+    start = now - dt.timedelta(days=365)
+    step = dt.timedelta(days=365) / rows
+
+    with engine.begin() as conn:
+        for offset in range(0, rows, batch_size):
+            batch = []
+            for i in range(offset, min(offset + batch_size, rows)):
+                batch.append({
+                    'task_type': rng.choice(TASK_TYPES),
+                    'status': rng.choices(statuses, weights)[0],
+                    'priority': rng.choice(list(TaskPriority)),
+                    'platform': rng.choice(PLATFORMS),
+                    'bucket_name': 'ai-file',
+                    'file_path': f"docs/{i}.pdf",
+                    'params': {'lang': 'ch'},
+                    'retry_count': 0,
+                    'max_retry_count': 3,
+                    'created_at': start + step * i,
+                })
+            conn.execute(insert(DocumentTask), batch)
+
+
+def time_queries(engine, queries: dict, repeat: int) -> dict:
+    """每个查询执行repeat次，返回耗时中位数(毫秒)"""
+    timings = {}
+    with engine.connect() as conn:
+        for name, query in queries.items():
+            samples = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                conn.execute(query).fetchall()
+                samples.append((time.perf_counter() - start) * 1000)
+            timings[name] = median(samples)
+    return timings
+
+
+def explain(engine, queries: dict):
+    """输出SQLite查询计划"""
+    with engine.connect() as conn:
+        for name, query in queries.items():
+            sql = str(query.compile(engine, compile_kwargs={"literal_binds": True}))
+            plan = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")).fetchall()
+            print(f"  {name}: " + "; ".join(row[-1] for row in plan))
+
+
+def run(rows: int, repeat: int, show_plan: bool, pending_ratio: float) -> dict:
+    """在一个临时数据库中测量无索引和有索引时的查询耗时"""
+    now = dt.datetime.now()
+    queries = build_queries(now)
+    indexes = list(DocumentTask.__table__.indexes)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}")
+        Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            for index in indexes:
+                index.drop(conn)
+
+        start = time.perf_counter()
+        populate(engine, rows, now, pending_ratio)
+        populate_time = time.perf_counter() - start
+
+        without_indexes = time_queries(engine, queries, repeat)
+        if show_plan:
+            print(f"\n[{rows} rows] query plans without composite indexes:")
+            explain(engine, queries)
+
+        start = time.perf_counter()
+        with engine.begin() as conn:
+            for index in indexes:
+                index.create(conn)
+            conn.execute(text("ANALYZE"))
+        index_time = time.perf_counter() - start
+
+        with_indexes = time_queries(engine, queries, repeat)
+        if show_plan:
+            print(f"[{rows} rows] query plans with composite indexes:")
+            explain(engine, queries)
+        engine.dispose()
+
+    print(f"\n{rows} rows (populate {populate_time:.1f}s, build indexes {index_time:.1f}s)")
+    print(f"  {'query':<24}{'no index (ms)':>16}{'indexed (ms)':>16}{'speedup':>10}")
+    for name in queries:
+        before, after = without_indexes[name], with_indexes[name]
+        speedup = before / after if after > 0 else float('inf')
+        print(f"  {name:<24}{before:>16.2f}{after:>16.2f}{speedup:>9.1f}x")
+    return {'without': without_indexes, 'with': with_indexes}
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="Benchmark document_tasks indexes on SQLite")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 300000],
+                        help="row counts to benchmark")
+    parser.add_argument("--repeat", type=int, default=20, help="executions per query")
+    parser.add_argument("--pending-ratio", type=float, default=0.02, help="share of pending tasks")
+    parser.add_argument("--explain", action="store_true", help="print SQLite query plans")
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        run(rows, args.repeat, args.explain, args.pending_ratio)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
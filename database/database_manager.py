@@ -6,20 +6,53 @@
 
 import asyncio
 import datetime as dt
+import os
 import traceback
-from typing import Optional, List, Dict, Union
-from sqlalchemy import select, and_, func, case, inspect, desc, asc
+from typing import Optional, List, Dict, Any, Union, Callable
+from sqlalchemy import select, update, insert, and_, or_, func, case, inspect, desc, asc, literal, literal_column, union_all, bindparam, event, text
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, AsyncEngine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.exc import SQLAlchemyError, OperationalError
 from contextlib import asynccontextmanager
 
-from database.models import Base, DocumentTask, TaskStatus, TaskPriority, QueryTasksFilter, TaskStatistics
+from database.models import (Base, DocumentTask, SourceFingerprint, TaskStatus, TaskPriority, QueryTasksFilter,
+                             TaskStatistics, decode_task_cursor, encode_task_cursor)
 from utils.logging_utils import configure_logging
 
 # 配置日志记录器
 logger = configure_logging(name=__name__)
 
+# 任务表的全部列名，update_task 只写入这些字段
+TASK_COLUMNS = frozenset(DocumentTask.__table__.columns.keys())
+
+
+# 旧版本数据库表中没有、启动时自动补齐的可空列
+LATE_TASK_COLUMNS = ("worker_id", "lease_expires_at", "input_sha256")
+
+
+def add_missing_task_columns(sync_conn) -> List[str]:
+    """
+    为已有的任务表补齐后来新增的可空列（create_all 不会修改已存在的表）
+
+    Args:
+        sync_conn: 同步连接
+
+    Returns:
+        新增的列名列表
+    """
+    table = DocumentTask.__table__
+    existing = {column['name'] for column in inspect(sync_conn).get_columns(table.name)}
+    added = []
+    for name in LATE_TASK_COLUMNS:
+        if name in existing:
+            continue
+        column_type = table.c[name].type.compile(dialect=sync_conn.dialect)
+        sync_conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {name} {column_type}"))
+        added.append(name)
+        logger.info(f"Added column {table.name}.{name} ({column_type})")
+    return added
+
 
 class DatabaseManager:
     """
@@ -31,7 +64,9 @@ class DatabaseManager:
                  database_type: str,
                  database_url: str,
                  loop: Optional[asyncio.AbstractEventLoop] = None,
-                 reconnect_interval: int = 5) -> None:
+                 reconnect_interval: int = 5,
+                 sqlite_tuning: Optional[bool] = None,
+                 sqlite_write_pool_size: Optional[int] = None) -> None:
         """
         初始化数据库管理器
         
@@ -40,12 +75,23 @@ class DatabaseManager:
             database_url: 数据库连接URL
             loop: 异步事件循环
             reconnect_interval: 重连间隔(秒)
+            sqlite_tuning: 是否启用SQLite生产配置（WAL + PRAGMA + 读写连接池），默认读取 SQLITE_TUNING
+            sqlite_write_pool_size: 生产配置下的写连接数，默认读取 SQLITE_WRITE_POOL_SIZE，1表示单写连接
         """
         self.database_type: str = database_type.lower()
         self.database_url: str = database_url
         self.loop: asyncio.AbstractEventLoop = loop or asyncio.get_running_loop()
         self._engine: Optional[AsyncEngine] = None
         self._session_factory: Optional[sessionmaker] = None
+        # 只读查询使用的引擎和会话工厂（SQLite生产配置下为独立的读连接池，其余情况与写引擎相同）
+        self._read_engine: Optional[AsyncEngine] = None
+        self._read_session_factory: Optional[sessionmaker] = None
+        if sqlite_tuning is None:
+            sqlite_tuning = os.getenv("SQLITE_TUNING", "true").lower() == "true"
+        # 内存数据库每个连接各自独立，不能拆分读写连接，也不支持WAL
+        self.sqlite_tuning: bool = (self.database_type == "sqlite" and sqlite_tuning
+                                    and ":memory:" not in database_url and "mode=memory" not in database_url)
+        self.sqlite_write_pool_size: int = max(1, int(sqlite_write_pool_size or os.getenv("SQLITE_WRITE_POOL_SIZE", "4")))
         self.reconnect_interval: int = reconnect_interval
         self._is_connected: bool = False
         self._max_retries: int = 5
@@ -54,6 +100,89 @@ class DatabaseManager:
         """初始化数据库引擎和会话工厂，自动创建缺失的表"""
         await self._connect()
 
+    @staticmethod
+    def _sqlite_pragmas(read_only: bool = False) -> List[str]:
+        """
+        SQLite生产配置的连接级PRAGMA
+
+        WAL下读不阻塞写、写不阻塞读；synchronous=NORMAL 在WAL下只在检查点时fsync，
+        进程崩溃不丢已提交事务（断电可能丢最后几个事务）；busy_timeout 让锁冲突等待而不是立即报 "database is locked"。
+
+        Args:
+            read_only: 是否为只读连接
+
+        Returns:
+            PRAGMA语句列表
+        """
+        pragmas = [
+            f"PRAGMA journal_mode={os.getenv('SQLITE_JOURNAL_MODE', 'WAL')}",
+            f"PRAGMA busy_timeout={int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))}",
+            f"PRAGMA synchronous={os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')}",
+            f"PRAGMA cache_size=-{int(os.getenv('SQLITE_CACHE_SIZE_KB', '65536'))}",
+            f"PRAGMA mmap_size={int(os.getenv('SQLITE_MMAP_SIZE_MB', '256')) * 1024 * 1024}",
+            "PRAGMA temp_store=MEMORY",
+        ]
+        if read_only:
+            pragmas.append("PRAGMA query_only=ON")
+        return pragmas
+
+    def _create_engine(self, read_only: bool = False) -> AsyncEngine:
+        """
+        按数据库类型创建异步引擎
+
+        SQLite生产配置下写引擎和读引擎各自使用固定大小的连接池，都在建立连接时设置PRAGMA。
+        写连接数为1时所有写入在进程内排队（不再在文件锁上竞争，尾延迟更稳定，但单次写入的中位延迟更高），
+        大于1时并发写入由 busy_timeout 在文件锁上等待。
+
+        Args:
+            read_only: 是否创建只读引擎
+
+        Returns:
+            异步引擎
+        """
+        # 根据数据库类型配置引擎参数
+        engine_kwargs = {
+            "echo": False,  # 生产环境关闭SQL日志
+            "pool_pre_ping": True,
+            "pool_recycle": 3600,
+        }
+        
+        if self.database_type == "mysql":
+            engine_kwargs.update({
+                "pool_size": 10,
+                "max_overflow": 20,
+                "pool_timeout": 30,
+            })
+        elif self.database_type == "sqlite":
+            engine_kwargs.update({
+                "connect_args": {"check_same_thread": False}
+            })
+            if self.sqlite_tuning:
+                # aiosqlite默认使用NullPool（每次会话新建连接），这里改为固定大小的连接池，PRAGMA只需在建连时设置一次
+                engine_kwargs.update({
+                    "poolclass": AsyncAdaptedQueuePool,
+                    "pool_size": int(os.getenv("SQLITE_READ_POOL_SIZE", "4")) if read_only else self.sqlite_write_pool_size,
+                    "max_overflow": 0,
+                    "pool_timeout": 60,
+                })
+        
+        # 创建异步引擎
+        engine = create_async_engine(self.database_url, **engine_kwargs)
+
+        if self.sqlite_tuning:
+            pragmas = self._sqlite_pragmas(read_only)
+
+            @event.listens_for(engine.sync_engine, "connect")
+            def _apply_pragmas(dbapi_connection, connection_record):
+                cursor = dbapi_connection.cursor()
+                try:
+                    for pragma in pragmas:
+                        cursor.execute(pragma)
+                finally:
+                    cursor.close()
+
+        return engine
+
     async def _connect(self) -> None:
         """连接数据库并初始化引擎和会话工厂"""
         retries = 0
@@ -61,26 +190,9 @@ class DatabaseManager:
             try:
                 logger.info(f"Connecting to {self.database_type} database...")
                 
-                # 根据数据库类型配置引擎参数
-                engine_kwargs = {
-                    "echo": False,  # 生产环境关闭SQL日志
-                    "pool_pre_ping": True,
-                    "pool_recycle": 3600,
-                }
-                
-                if self.database_type == "mysql":
-                    engine_kwargs.update({
-                        "pool_size": 10,
-                        "max_overflow": 20,
-                        "pool_timeout": 30,
-                    })
-                elif self.database_type == "sqlite":
-                    engine_kwargs.update({
-                        "connect_args": {"check_same_thread": False}
-                    })
-                
-                # 创建异步引擎
-                self._engine = create_async_engine(self.database_url, **engine_kwargs)
+                # 创建异步引擎（SQLite生产配置下读写分离）
+                self._engine = self._create_engine()
+                self._read_engine = self._create_engine(read_only=True) if self.sqlite_tuning else self._engine
                 
                 # 创建会话工厂
                 self._session_factory = sessionmaker(
@@ -88,13 +200,21 @@ class DatabaseManager:
                     class_=AsyncSession,
                     expire_on_commit=False
                 )
+                self._read_session_factory = sessionmaker(
+                    bind=self._read_engine,
+                    class_=AsyncSession,
+                    expire_on_commit=False
+                )
                 
-                # 测试连接
+                # 测试连接（写连接上切换WAL，之后的读连接都在WAL模式下打开）
                 async with self._engine.begin() as conn:
                     await conn.run_sync(Base.metadata.create_all)
+                    await conn.run_sync(add_missing_task_columns)
                 
                 self._is_connected = True
-                logger.info(f"Successfully connected to {self.database_type} database")
+                logger.info(f"Successfully connected to {self.database_type} database" +
+                            (f" (SQLite WAL, {self.sqlite_write_pool_size} write connections + read pool)"
+                             if self.sqlite_tuning else ""))
                 return
                 
             except Exception as e:
@@ -123,11 +243,41 @@ class DatabaseManager:
             finally:
                 await session.close()
 
-    async def create_task(self, task: DocumentTask) -> DocumentTask:
-        """创建新任务"""
+    @asynccontextmanager
+    async def get_read_session(self):
+        """获取只读查询会话的上下文管理器（SQLite生产配置下使用读连接池，不占用写连接）"""
+        if not self._is_connected or not self._read_session_factory:
+            await self._connect()
+
+        async with self._read_session_factory() as session:
+            try:
+                yield session
+            except Exception as e:
+                logger.error(f"Database read session error: {e}")
+                raise
+            finally:
+                await session.close()
+
+    async def create_task(self,
+                          task: DocumentTask,
+                          before_commit: Optional[Callable[[DocumentTask], None]] = None) -> DocumentTask:
+        """
+        创建新任务
+
+        Args:
+            task: 任务对象
+            before_commit: 分配ID后、提交前调用的回调（提交前其他会话看不到该任务，
+                           可在此把输入文件放到任务目录，不会被提前认领）
+
+        Returns:
+            已保存的任务对象
+        """
         try:
             async with self.get_session() as session:
                 session.add(task)
+                if before_commit is not None:
+                    await session.flush()
+                    before_commit(task)
                 await session.commit()
                 await session.refresh(task)
                 logger.info(f"Created task {task.id} in database")
@@ -136,10 +286,48 @@ class DatabaseManager:
             logger.error(f"Failed to create task {task.id}: {e}")
             raise
 
+    async def create_tasks_bulk(self, rows: List[Dict[str, Any]], chunk_size: int = 500) -> List[int]:
+        """
+        批量创建任务：按块执行多行INSERT，所有块在同一事务中提交
+
+        Args:
+            rows: 任务字段字典列表（各行字段相同）
+            chunk_size: 每条INSERT语句包含的行数
+
+        Returns:
+            与rows顺序一致的任务ID列表
+        """
+        if not rows:
+            return []
+
+        task_ids: List[int] = []
+        try:
+            async with self.get_session() as session:
+                for start in range(0, len(rows), chunk_size):
+                    chunk = rows[start:start + chunk_size]
+                    if self.database_type == "mysql":
+                        # MySQL不支持RETURNING；单条多行INSERT分配连续的自增ID，lastrowid为第一行的ID
+                        result = await session.execute(insert(DocumentTask).values(chunk))
+                        first_id = result.lastrowid
+                        task_ids.extend(range(first_id, first_id + len(chunk)))
+                    else:
+                        result = await session.execute(
+                            insert(DocumentTask).returning(DocumentTask.id, sort_by_parameter_order=True),
+                            chunk
+                        )
+                        task_ids.extend(result.scalars().all())
+                await session.commit()
+
+            logger.info(f"Created {len(task_ids)} tasks in database (IDs {task_ids[0]}-{task_ids[-1]})")
+            return task_ids
+        except Exception as e:
+            logger.error(f"Failed to bulk create {len(rows)} tasks: {e}")
+            raise
+
     async def get_task(self, task_id: str) -> Optional[DocumentTask]:
         """根据ID获取任务"""
         try:
-            async with self.get_session() as session:
+            async with self.get_read_session() as session:
                 result = await session.execute(
                     select(DocumentTask).where(DocumentTask.id == task_id)
                 )
@@ -152,34 +340,87 @@ class DatabaseManager:
             return None
 
     async def update_task(self, task_id: str, **kwargs) -> bool:
-        """更新任务信息"""
+        """
+        更新任务信息
+
+        直接执行一条 UPDATE ... WHERE id=:id，不先读取和加载整行；
+        不属于任务表的字段会被忽略，updated_at 自动更新。
+
+        Args:
+            task_id: 任务ID
+            **kwargs: 要更新的字段
+
+        Returns:
+            任务存在且更新成功时返回True
+        """
+        values = {key: value for key, value in kwargs.items() if key in TASK_COLUMNS}
+        ignored = set(kwargs) - set(values)
+        if ignored:
+            logger.warning(f"Ignoring unknown task fields for task {task_id}: {sorted(ignored)}")
+        values.setdefault('updated_at', dt.datetime.now())
+
         try:
             async with self.get_session() as session:
                 result = await session.execute(
-                    select(DocumentTask).where(DocumentTask.id == task_id)
+                    update(DocumentTask).where(DocumentTask.id == task_id).values(**values),
+                    execution_options={"synchronize_session": False}
                 )
-                task = result.scalar_one_or_none()
-                
-                if not task:
-                    logger.warning(f"Task {task_id} not found for update")
-                    return False
-                
-                # 更新字段
-                for key, value in kwargs.items():
-                    if hasattr(task, key):
-                        setattr(task, key, value)
-                
-                # 自动更新updated_at
-                task.updated_at = dt.datetime.now()
-                
                 await session.commit()
-                logger.debug(f"Updated task {task_id} in database")
-                return True
+
+            if result.rowcount == 0:
+                logger.warning(f"Task {task_id} not found for update")
+                return False
+
+            logger.debug(f"Updated task {task_id} in database: {sorted(values)}")
+            return True
                 
         except Exception as e:
             logger.error(f"Failed to update task {task_id}: {e}")
             return False
 
+    async def update_tasks_bulk(self, updates: Dict[Any, Dict[str, Any]]) -> bool:
+        """
+        在一个事务中更新多个任务
+
+        字段集合相同的任务合并为一次 executemany 的 UPDATE ... WHERE id=:id，
+        整批只提交一次（写入密集时把多次提交合并为一次）。
+
+        Args:
+            updates: 任务ID -> 要更新的字段
+
+        Returns:
+            是否提交成功
+        """
+        if not updates:
+            return True
+
+        now = dt.datetime.now()
+        groups: Dict[tuple, List[Dict[str, Any]]] = {}
+        for task_id, fields in updates.items():
+            values = {key: value for key, value in fields.items() if key in TASK_COLUMNS}
+            values.setdefault('updated_at', now)
+            keys = tuple(sorted(values))
+            groups.setdefault(keys, []).append({'b_id': task_id, **{f"v_{key}": values[key] for key in keys}})
+
+        table = DocumentTask.__table__
+        try:
+            async with self.get_session() as session:
+                for keys, params in groups.items():
+                    statement = (
+                        update(table)
+                        .where(table.c.id == bindparam('b_id'))
+                        .values({key: bindparam(f"v_{key}", type_=table.c[key].type) for key in keys})
+                    )
+                    await session.execute(statement, params)
+                await session.commit()
+
+            logger.debug(f"Updated {len(updates)} tasks in one transaction ({len(groups)} statements)")
+            return True
+
+        except Exception as e:
+            logger.error(f"Failed to bulk update {len(updates)} tasks: {e}")
+            return False
+
     async def update_task_status(self, task_id: str, status: TaskStatus, 
                                error_message: Optional[str] = None) -> bool:
         """更新任务状态"""
@@ -195,6 +436,295 @@ class DatabaseManager:
             
         return await self.update_task(task_id, **update_data)
 
+    @staticmethod
+    def resolve_aging_seconds(aging_seconds: Optional[float] = None) -> float:
+        """优先级老化间隔(秒)：等待时间每增加该值，任务的有效优先级提升一级，默认读取 TASK_PRIORITY_AGING_SECONDS"""
+        return float(aging_seconds or os.getenv("TASK_PRIORITY_AGING_SECONDS", "300"))
+
+    @staticmethod
+    def build_pending_query(limit: int, aging_seconds: Optional[float] = None):
+        """
+        构建按老化后的优先级排序的待处理任务ID查询（SQLite）
+
+        排序键为 创建时间 + 优先级等级 × aging_seconds：低一级的任务只要比高一级任务早创建超过 aging_seconds
+        就会先被认领，持续到达的高优先级任务不会让低优先级任务一直等待。
+        同一优先级内排序键随创建时间递增，因此每个优先级单独按 (status, priority, created_at) 索引顺序
+        读取前limit个任务再合并，结果与全表排序相同，只需读取至多 3×limit 条索引项。
+
+        Args:
+            limit: 最多返回的任务数
+            aging_seconds: 优先级老化间隔(秒)
+
+        Returns:
+            任务ID查询
+        """
+        aging_seconds = DatabaseManager.resolve_aging_seconds(aging_seconds)
+        ranked = [
+            select(
+                DocumentTask.id,
+                DocumentTask.created_at,
+                literal(rank).label("rank"),
+                (func.julianday(DocumentTask.created_at) * 86400.0 + rank * aging_seconds).label("score")
+            )
+            .where(and_(DocumentTask.status == TaskStatus.pending, DocumentTask.priority == priority))
+            .order_by(asc(DocumentTask.created_at), asc(DocumentTask.id))
+            .limit(limit)
+            .subquery()
+            for rank, priority in enumerate((TaskPriority.high, TaskPriority.normal, TaskPriority.low))
+        ]
+        candidates = union_all(*[select(subquery) for subquery in ranked]).subquery()
+        return (
+            select(candidates.c.id)
+            .order_by(candidates.c.score, candidates.c.rank, candidates.c.id)
+            .limit(limit)
+        )
+
+    async def claim_pending_tasks(self,
+                                  limit: int,
+                                  worker_id: Optional[str] = None,
+                                  lease_seconds: float = 300,
+                                  aging_seconds: Optional[float] = None) -> List[DocumentTask]:
+        """
+        原子地认领待处理任务：在同一条语句/事务中把最多limit个pending任务置为processing
+
+        SQLite(3.35+)使用 UPDATE ... RETURNING，MySQL使用 SELECT ... FOR UPDATE SKIP LOCKED，
+        多个处理器进程同时认领时不会拿到同一个任务。认领时记录处理器实例和租约到期时间。
+        认领顺序带优先级老化（见 build_pending_query），低优先级任务等待足够久后排在新到的高优先级任务之前。
+
+        Args:
+            limit: 最多认领的任务数
+            worker_id: 认领任务的处理器实例ID
+            lease_seconds: 租约时长(秒)，处理器需在到期前续期
+            aging_seconds: 优先级老化间隔(秒)，默认读取 TASK_PRIORITY_AGING_SECONDS
+
+        Returns:
+            认领成功的任务列表（按老化后的优先级排序）
+        """
+        if limit <= 0:
+            return []
+        aging_seconds = self.resolve_aging_seconds(aging_seconds)
+
+        now = dt.datetime.now()
+        claim_values = {"status": TaskStatus.processing, "started_at": now, "updated_at": now,
+                        "worker_id": worker_id, "lease_expires_at": now + dt.timedelta(seconds=lease_seconds)}
+
+        try:
+            async with self.get_session() as session:
+                if self.database_type == "mysql":
+                    priority_order = case(
+                        (DocumentTask.priority == TaskPriority.high, 0),
+                        (DocumentTask.priority == TaskPriority.normal, 1),
+                        else_=2
+                    )
+                    aged_created_at = func.timestampadd(
+                        literal_column("SECOND"), priority_order * int(aging_seconds), DocumentTask.created_at
+                    )
+                    pending_query = (
+                        select(DocumentTask.id)
+                        .where(DocumentTask.status == TaskStatus.pending)
+                        .order_by(aged_created_at, priority_order, asc(DocumentTask.id))
+                        .limit(limit)
+                    )
+                    # MySQL不支持RETURNING，锁定候选行后再更新，跳过已被其他事务锁定的行
+                    result = await session.execute(pending_query.with_for_update(skip_locked=True))
+                    task_ids = [row[0] for row in result]
+                    if not task_ids:
+                        await session.commit()
+                        return []
+                    await session.execute(
+                        update(DocumentTask).where(DocumentTask.id.in_(task_ids)).values(**claim_values)
+                    )
+                    result = await session.execute(select(DocumentTask).where(DocumentTask.id.in_(task_ids)))
+                    tasks = list(result.scalars().all())
+                else:
+                    pending_query = self.build_pending_query(limit, aging_seconds)
+                    # 再次校验status，保证并发语句之间不会重复认领
+                    result = await session.execute(
+                        update(DocumentTask)
+                        .where(and_(DocumentTask.id.in_(pending_query),
+                                    DocumentTask.status == TaskStatus.pending))
+                        .values(**claim_values)
+                        .returning(DocumentTask),
+                        execution_options={"synchronize_session": False}
+                    )
+                    tasks = list(result.scalars().all())
+
+                await session.commit()
+
+            priority_rank = {TaskPriority.high: 0, TaskPriority.normal: 1, TaskPriority.low: 2}
+            tasks.sort(key=lambda task: (
+                task.created_at + dt.timedelta(seconds=priority_rank.get(task.priority, 1) * aging_seconds),
+                priority_rank.get(task.priority, 1), task.id
+            ))
+            if tasks:
+                logger.debug(f"Claimed {len(tasks)} pending tasks: {[task.id for task in tasks]}")
+            return tasks
+
+        except Exception as e:
+            logger.error(f"Failed to claim pending tasks: {e}")
+            return []
+
+    async def renew_task_leases(self, task_ids: List[int], worker_id: str, lease_seconds: float) -> int:
+        """
+        续期本实例持有的处理中任务的租约
+
+        Args:
+            task_ids: 任务ID列表
+            worker_id: 处理器实例ID
+            lease_seconds: 租约时长(秒)
+
+        Returns:
+            续期成功的任务数（租约已被回收的任务不再续期）
+        """
+        if not task_ids:
+            return 0
+        try:
+            async with self.get_session() as session:
+                result = await session.execute(
+                    update(DocumentTask)
+                    .where(and_(DocumentTask.id.in_(task_ids),
+                                DocumentTask.status == TaskStatus.processing,
+                                DocumentTask.worker_id == worker_id))
+                    .values(lease_expires_at=dt.datetime.now() + dt.timedelta(seconds=lease_seconds)),
+                    execution_options={"synchronize_session": False}
+                )
+                await session.commit()
+                return result.rowcount
+        except Exception as e:
+            logger.error(f"Failed to renew leases for {len(task_ids)} tasks: {e}")
+            return 0
+
+    async def release_task_leases(self, task_ids: List[int], worker_id: str) -> int:
+        """
+        把本实例已认领但尚未开始处理的任务放回pending（处理器停止时调用，不必等租约过期）
+
+        Args:
+            task_ids: 任务ID列表
+            worker_id: 处理器实例ID
+
+        Returns:
+            放回的任务数
+        """
+        if not task_ids:
+            return 0
+        try:
+            async with self.get_session() as session:
+                result = await session.execute(
+                    update(DocumentTask)
+                    .where(and_(DocumentTask.id.in_(task_ids),
+                                DocumentTask.status == TaskStatus.processing,
+                                DocumentTask.worker_id == worker_id))
+                    .values(status=TaskStatus.pending, worker_id=None, lease_expires_at=None,
+                            started_at=None, updated_at=dt.datetime.now()),
+                    execution_options={"synchronize_session": False}
+                )
+                await session.commit()
+                return result.rowcount
+        except Exception as e:
+            logger.error(f"Failed to release leases for {len(task_ids)} tasks: {e}")
+            return 0
+
+    async def recover_expired_tasks(self) -> int:
+        """
+        把租约已过期的处理中任务（所属处理器已崩溃或停止续期）重置为pending
+
+        其他实例正在处理、租约有效的任务不受影响。认领时未记录租约的旧任务视为已过期。
+
+        Returns:
+            回收的任务数
+        """
+        now = dt.datetime.now()
+        try:
+            async with self.get_session() as session:
+                result = await session.execute(
+                    update(DocumentTask)
+                    .where(and_(DocumentTask.status == TaskStatus.processing,
+                                or_(DocumentTask.lease_expires_at.is_(None),
+                                    DocumentTask.lease_expires_at < now)))
+                    .values(status=TaskStatus.pending, worker_id=None, lease_expires_at=None, updated_at=now,
+                            error_message="Task recovered after its processor lease expired"),
+                    execution_options={"synchronize_session": False}
+                )
+                await session.commit()
+                return result.rowcount
+        except Exception as e:
+            logger.error(f"Failed to recover expired tasks: {e}")
+            return 0
+
+    async def get_source_fingerprint(self, fingerprint: str) -> Optional[SourceFingerprint]:
+        """
+        查询来源指纹，命中时累加命中次数
+
+        Args:
+            fingerprint: 指纹
+
+        Returns:
+            指纹记录，不存在时返回None
+        """
+        try:
+            async with self.get_session() as session:
+                result = await session.execute(
+                    select(SourceFingerprint).where(SourceFingerprint.fingerprint == fingerprint)
+                )
+                record = result.scalar_one_or_none()
+                if record:
+                    await session.execute(
+                        update(SourceFingerprint)
+                        .where(SourceFingerprint.id == record.id)
+                        .values(hit_count=SourceFingerprint.hit_count + 1, last_hit_at=dt.datetime.now())
+                    )
+                    await session.commit()
+                return record
+        except Exception as e:
+            logger.error(f"Failed to get source fingerprint {fingerprint}: {e}")
+            return None
+
+    async def save_source_fingerprint(self, fingerprint: str, **kwargs) -> bool:
+        """
+        保存来源指纹（已存在时覆盖输出信息）
+
+        Args:
+            fingerprint: 指纹
+            **kwargs: SourceFingerprint字段
+
+        Returns:
+            是否保存成功
+        """
+        try:
+            async with self.get_session() as session:
+                result = await session.execute(
+                    select(SourceFingerprint).where(SourceFingerprint.fingerprint == fingerprint)
+                )
+                record = result.scalar_one_or_none()
+                if record is None:
+                    session.add(SourceFingerprint(fingerprint=fingerprint, **kwargs))
+                else:
+                    for key, value in kwargs.items():
+                        if hasattr(record, key):
+                            setattr(record, key, value)
+                await session.commit()
+                return True
+        except Exception as e:
+            # 并发写入同一指纹时唯一约束冲突，保留先写入的记录即可
+            logger.warning(f"Failed to save source fingerprint {fingerprint}: {e}")
+            return False
+
+    async def delete_source_fingerprint(self, fingerprint: str) -> bool:
+        """删除来源指纹（输出已失效时调用）"""
+        try:
+            async with self.get_session() as session:
+                result = await session.execute(
+                    select(SourceFingerprint).where(SourceFingerprint.fingerprint == fingerprint)
+                )
+                record = result.scalar_one_or_none()
+                if record:
+                    await session.delete(record)
+                    await session.commit()
+                return True
+        except Exception as e:
+            logger.error(f"Failed to delete source fingerprint {fingerprint}: {e}")
+            return False
+
     async def update_callback_status(self, task_id: str, status_code: int, 
                                    message: Optional[str] = None) -> bool:
         """更新回调状态"""
@@ -205,59 +735,131 @@ class DatabaseManager:
             callback_time=dt.datetime.now()
         )
 
+    @staticmethod
+    def _build_task_conditions(filter_params: QueryTasksFilter) -> list:
+        """根据查询过滤器构建WHERE条件（不含分页游标）"""
+        conditions = []
+
+        if filter_params.status:
+            conditions.append(DocumentTask.status == filter_params.status)
+        if filter_params.priority:
+            conditions.append(DocumentTask.priority == filter_params.priority)
+        if filter_params.task_type:
+            conditions.append(DocumentTask.task_type == filter_params.task_type)
+        if filter_params.platform:
+            conditions.append(DocumentTask.platform == filter_params.platform)
+        if filter_params.created_after:
+            conditions.append(DocumentTask.created_at >= filter_params.created_after)
+        if filter_params.created_before:
+            conditions.append(DocumentTask.created_at <= filter_params.created_before)
+        if filter_params.has_result is not None:
+            if filter_params.has_result:
+                conditions.append(DocumentTask.result.isnot(None))
+            else:
+                conditions.append(DocumentTask.result.is_(None))
+        if filter_params.has_error is not None:
+            if filter_params.has_error:
+                conditions.append(DocumentTask.error_message.isnot(None))
+            else:
+                conditions.append(DocumentTask.error_message.is_(None))
+
+        return conditions
+
     async def query_tasks(self, filter_params: QueryTasksFilter) -> List[DocumentTask]:
-        """查询任务列表"""
+        """查询任务列表（按创建时间、ID倒序；提供cursor时从游标之后开始，否则按offset分页）"""
+        page = await self.query_tasks_page(filter_params)
+        return page['tasks']
+
+    async def query_tasks_page(self, filter_params: QueryTasksFilter) -> Dict[str, Any]:
+        """
+        按游标分页查询任务列表
+
+        游标为上一页最后一个任务的 (created_at, id)，条件写成
+        created_at <= :c AND (created_at < :c OR id < :id)，
+        第一项可直接作为 created_at 相关索引的范围扫描起点，每页的代价与页码无关，
+        分页期间新插入的任务也不会导致后续页面错位。
+
+        Args:
+            filter_params: 查询过滤器
+
+        Returns:
+            结果字典，包含 tasks / next_cursor / has_more
+        """
         try:
-            async with self.get_session() as session:
+            async with self.get_read_session() as session:
                 query = select(DocumentTask)
-                
-                # 构建查询条件
-                conditions = []
-                
-                if filter_params.status:
-                    conditions.append(DocumentTask.status == filter_params.status)
-                if filter_params.priority:
-                    conditions.append(DocumentTask.priority == filter_params.priority)
-                if filter_params.task_type:
-                    conditions.append(DocumentTask.task_type == filter_params.task_type)
-                if filter_params.platform:
-                    conditions.append(DocumentTask.platform == filter_params.platform)
-                if filter_params.created_after:
-                    conditions.append(DocumentTask.created_at >= filter_params.created_after)
-                if filter_params.created_before:
-                    conditions.append(DocumentTask.created_at <= filter_params.created_before)
-                if filter_params.has_result is not None:
-                    if filter_params.has_result:
-                        conditions.append(DocumentTask.result.isnot(None))
-                    else:
-                        conditions.append(DocumentTask.result.is_(None))
-                if filter_params.has_error is not None:
-                    if filter_params.has_error:
-                        conditions.append(DocumentTask.error_message.isnot(None))
-                    else:
-                        conditions.append(DocumentTask.error_message.is_(None))
-                
+                conditions = self._build_task_conditions(filter_params)
+
+                if filter_params.cursor:
+                    cursor_created_at, cursor_id = decode_task_cursor(filter_params.cursor)
+                    conditions.append(DocumentTask.created_at <= cursor_created_at)
+                    conditions.append(or_(DocumentTask.created_at < cursor_created_at,
+                                          DocumentTask.id < cursor_id))
+
                 if conditions:
                     query = query.where(and_(*conditions))
-                
-                # 排序和分页
-                query = query.order_by(desc(DocumentTask.created_at))
-                query = query.offset(filter_params.offset).limit(filter_params.limit)
-                
+
+                # 排序和分页：多取一条判断是否还有下一页
+                query = query.order_by(desc(DocumentTask.created_at), desc(DocumentTask.id))
+                if not filter_params.cursor and filter_params.offset:
+                    query = query.offset(filter_params.offset)
+                query = query.limit(filter_params.limit + 1)
+
                 result = await session.execute(query)
-                tasks = result.scalars().all()
-                
+                tasks = list(result.scalars().all())
+
+                has_more = len(tasks) > filter_params.limit
+                tasks = tasks[:filter_params.limit]
+                next_cursor = encode_task_cursor(tasks[-1].created_at, tasks[-1].id) if has_more else None
+
                 logger.debug(f"Queried {len(tasks)} tasks from database")
-                return list(tasks)
-                
+                return {
+                    'tasks': tasks,
+                    'next_cursor': next_cursor,
+                    'has_more': has_more
+                }
+
         except Exception as e:
             logger.error(f"Failed to query tasks: {e}")
-            return []
+            return {'tasks': [], 'next_cursor': None, 'has_more': False}
+
+    async def count_tasks(self, filter_params: QueryTasksFilter, cap: Optional[int] = None) -> Dict[str, Any]:
+        """
+        统计满足过滤条件的任务数
+
+        指定cap时最多数到cap条（子查询LIMIT），代价有上限，超过时返回cap并标记为近似值。
+
+        Args:
+            filter_params: 查询过滤器（忽略分页参数）
+            cap: 计数上限，None表示精确计数
+
+        Returns:
+            结果字典，包含 total 和 exact
+        """
+        try:
+            async with self.get_read_session() as session:
+                query = select(DocumentTask.id)
+                conditions = self._build_task_conditions(filter_params)
+                if conditions:
+                    query = query.where(and_(*conditions))
+                if cap is not None:
+                    query = query.limit(cap)
+
+                result = await session.execute(select(func.count()).select_from(query.subquery()))
+                total = result.scalar() or 0
+                return {
+                    'total': total,
+                    'exact': cap is None or total < cap
+                }
+
+        except Exception as e:
+            logger.error(f"Failed to count tasks: {e}")
+            return {'total': None, 'exact': False}
 
     async def get_tasks_by_status(self, status: str) -> List[DocumentTask]:
         """根据状态获取任务列表"""
         try:
-            async with self.get_session() as session:
+            async with self.get_read_session() as session:
                 query = select(DocumentTask).where(DocumentTask.status == status)
                 result = await session.execute(query)
                 tasks = result.scalars().all()
@@ -270,7 +872,7 @@ class DatabaseManager:
     async def get_task_statistics(self) -> TaskStatistics:
         """获取任务统计信息"""
         try:
-            async with self.get_session() as session:
+            async with self.get_read_session() as session:
                 # 统计各状态任务数量
                 status_counts = await session.execute(
                     select(
@@ -366,5 +968,7 @@ class DatabaseManager:
         """关闭数据库连接"""
         if self._engine:
             await self._engine.dispose()
+            if self._read_engine is not None and self._read_engine is not self._engine:
+                await self._read_engine.dispose()
             self._is_connected = False
             logger.info("Database connection closed")
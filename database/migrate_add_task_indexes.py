@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+数据库迁移脚本：为document_tasks表补建复合索引
+新建数据库由 Base.metadata.create_all 直接创建这些索引；已有数据库的表不会被重建，需要运行本脚本。
+"""
+
+import os
+import sys
+import time
+import asyncio
+from sqlalchemy import inspect, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.models import DocumentTask
+from utils.logging_utils import configure_logging
+
+logger = configure_logging(name=__name__)
+
+
+def _create_missing_indexes(sync_conn) -> list:
+    """在同步连接上创建缺失的索引，返回新建的索引名列表"""
+    inspector = inspect(sync_conn)
+    if not inspector.has_table(DocumentTask.__tablename__):
+        logger.info("Table document_tasks does not exist yet, it will be created with all indexes on startup")
+        return []
+
+    existing = {index['name'] for index in inspector.get_indexes(DocumentTask.__tablename__)}
+    created = []
+    for index in sorted(DocumentTask.__table__.indexes, key=lambda i: i.name):
+        if index.name in existing:
+            logger.info(f"Index {index.name} already exists, skipping")
+            continue
+        start_time = time.monotonic()
+        index.create(sync_conn)
+        created.append(index.name)
+        logger.info(f"Created index {index.name} on ({', '.join(c.name for c in index.columns)}) "
+                    f"in {time.monotonic() - start_time:.2f}s")
+    return created
+
+
+async def migrate_add_task_indexes() -> bool:
+    """为已有的任务表补建复合索引（可重复执行）"""
+
+    # 获取数据库URL
+    database_url = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./document_tasks.db")
+    logger.info(f"Adding task indexes to database: {database_url.split('@')[-1]}")
+
+    engine = create_async_engine(database_url)
+    try:
+        async with engine.begin() as conn:
+            created = await conn.run_sync(_create_missing_indexes)
+
+            # SQLite需要统计信息才能在多个候选索引之间正确选择
+            if created and database_url.startswith("sqlite"):
+                await conn.execute(text("ANALYZE document_tasks"))
+                logger.info("Updated SQLite planner statistics (ANALYZE)")
+
+        logger.info(f"Index migration completed, {len(created)} indexes created")
+        return True
+
+    except Exception as e:
+        logger.error(f"Index migration failed: {e}")
+        return False
+    finally:
+        await engine.dispose()
+
+
+async def main():
+    """主函数"""
+    logger.info("Starting database migration to add task indexes...")
+
+    success = await migrate_add_task_indexes()
+
+    if success:
+        logger.info("✅ Database index migration completed successfully!")
+    else:
+        logger.error("❌ Database index migration failed!")
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
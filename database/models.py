@@ -4,10 +4,12 @@
 参考MediaConvert的设计，实现完整的任务状态持久化
 """
 
+import base64
 import datetime as dt
+import json
 from enum import Enum
-from typing import Optional, Dict, Any
-from sqlalchemy import Column, Integer, String, Text, JSON, Enum as SQLEnum, DateTime, Float, Boolean
+from typing import Optional, Dict, Any, Tuple
+from sqlalchemy import Column, Index, Integer, String, Text, JSON, Enum as SQLEnum, DateTime, Float, Boolean
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 from pydantic import BaseModel, Field, ConfigDict, field_validator
@@ -50,6 +52,7 @@ class DocumentTask(Base):
     file_path = Column(Text, nullable=True)           # 文件在bucket中的路径
     file_name = Column(String(255), nullable=True)    # 文件名称
     file_size_bytes = Column(Integer, nullable=True)  # 文件大小
+    input_sha256 = Column(String(64), nullable=True)  # 服务端计算的上传文件SHA-256（转换结果缓存键，不接受客户端传入）
     
     # 输出信息
     output_url = Column(String(500), nullable=True)   # 输出文件URL
@@ -86,6 +89,23 @@ class DocumentTask(Base):
     # 平台信息
     platform = Column(String(50), nullable=True)     # 平台标识
     engine_name = Column(String(50), nullable=True)  # 引擎名称
+
+    # 处理租约：认领任务的处理器实例及租约到期时间，处理器定期续期，过期后任务可被其他实例回收
+    worker_id = Column(String(64), nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+
+    # 复合索引，对应调度与列表查询的访问路径（已有数据库通过 database/migrate_add_task_indexes.py 补建）
+    __table_args__ = (
+        # 调度认领：status='pending' 按优先级、创建时间取任务
+        Index("ix_document_tasks_status_priority_created", "status", "priority", "created_at"),
+        # 按状态列表 / 统计 / 清理：status 过滤后按创建时间排序
+        Index("ix_document_tasks_status_created", "status", "created_at"),
+        # 按平台、任务类型列表
+        Index("ix_document_tasks_platform_created", "platform", "created_at"),
+        Index("ix_document_tasks_task_type_created", "task_type", "created_at"),
+        # 不带过滤条件的列表和创建时间范围查询
+        Index("ix_document_tasks_created_at", "created_at"),
+    )
     
     def to_dict(self) -> Dict[str, Any]:
         """转换为字典格式"""
@@ -101,6 +121,7 @@ class DocumentTask(Base):
             'file_path': self.file_path,
             'file_name': self.file_name,
             'file_size_bytes': self.file_size_bytes,
+            'input_sha256': self.input_sha256,
             'output_url': self.output_url,
             's3_urls': self.s3_urls,
             'params': self.params,
@@ -122,10 +143,41 @@ class DocumentTask(Base):
             'callback_message': self.callback_message,
             'callback_time': self.callback_time.isoformat() if self.callback_time else None,
             'platform': self.platform,
-            'engine_name': self.engine_name
+            'engine_name': self.engine_name,
+            'worker_id': self.worker_id,
+            'lease_expires_at': self.lease_expires_at.isoformat() if self.lease_expires_at else None
         }
 
 
+class SourceFingerprint(Base):
+    """
+    已转换输入的来源指纹
+    记录S3源对象（bucket/key/ETag/大小）在给定任务类型和参数下的转换输出，
+    同一未变化对象的重复请求可直接复用已上传的结果
+    """
+    __tablename__ = "source_fingerprints"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    fingerprint = Column(String(64), unique=True, index=True, nullable=False)  # 指纹（SHA-256）
+    
+    # 源对象信息
+    bucket_name = Column(String(255), nullable=False)  # S3存储桶名称
+    file_path = Column(Text, nullable=False)           # 文件在bucket中的路径
+    etag = Column(String(255), nullable=False)         # 源对象ETag
+    size_bytes = Column(Integer, nullable=False)       # 源对象大小
+    task_type = Column(String(50), nullable=False)     # 任务类型
+    
+    # 转换输出
+    source_task_id = Column(Integer, nullable=False)   # 生成该输出的任务ID
+    output_url = Column(String(500), nullable=True)    # 主要输出文件URL
+    s3_urls = Column(JSON, nullable=True)              # 全部输出文件地址
+    
+    # 使用情况
+    hit_count = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime, default=dt.datetime.now, nullable=False)
+    last_hit_at = Column(DateTime, nullable=True)
+
+
 class TaskCreateRequest(BaseModel):
     """任务创建请求模型"""
     # 任务基本信息
@@ -165,6 +217,39 @@ class TaskCreateRequest(BaseModel):
         return v
 
 
+def encode_task_cursor(created_at: dt.datetime, task_id: int) -> str:
+    """
+    生成任务列表的分页游标
+
+    Args:
+        created_at: 当前页最后一个任务的创建时间
+        task_id: 当前页最后一个任务的ID
+
+    Returns:
+        不透明的游标字符串（URL安全的base64）
+    """
+    raw = json.dumps([created_at.isoformat(), task_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_task_cursor(cursor: str) -> Tuple[dt.datetime, int]:
+    """
+    解析任务列表的分页游标
+
+    Args:
+        cursor: encode_task_cursor 生成的游标
+
+    Returns:
+        (创建时间, 任务ID)
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, task_id = json.loads(raw)
+        return dt.datetime.fromisoformat(created_at), int(task_id)
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
 class QueryTasksFilter(BaseModel):
     """任务查询过滤器"""
     status: Optional[TaskStatus] = Field(None, description="任务状态过滤")
@@ -177,9 +262,17 @@ class QueryTasksFilter(BaseModel):
     has_error: Optional[bool] = Field(None, description="是否有错误")
     limit: int = Field(20, description="每页记录数", ge=1, le=100)
     offset: int = Field(0, description="分页偏移量", ge=0)
+    cursor: Optional[str] = Field(None, description="分页游标（上一页返回的next_cursor），与offset互斥")
     
     model_config = ConfigDict(arbitrary_types_allowed=True)
     
+    @field_validator("cursor")
+    def validate_cursor(cls, v):
+        """校验分页游标"""
+        if v:
+            decode_task_cursor(v)
+        return v or None
+    
     @field_validator("created_after", "created_before", mode="before")
     def parse_datetime(cls, v):
         """解析日期时间"""
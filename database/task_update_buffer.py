@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+任务字段更新的写合并缓冲
+处理一个任务时的多次字段更新（输入文件信息、转换结果、上传地址、完成状态……）先在内存中按任务合并，
+在阶段边界用一条UPDATE写入数据库，减少每个任务的数据库写入次数。
+"""
+
+import os
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from database.database_manager import DatabaseManager
+from utils.logging_utils import configure_logging
+
+logger = configure_logging(name=__name__)
+
+
+class TaskUpdateBuffer:
+    """
+    按任务合并字段更新
+
+    stage() 只在内存中合并字段（同一字段后写覆盖先写）；flush() 把已合并的字段连同附加字段
+    用一条UPDATE写入，写入失败时字段放回缓冲，由下一次 flush() 重试，调用方确认写入成功后才能 discard()。
+    关闭合并时 stage() 直接写入数据库，与逐次调用 update_task 的行为相同。
+    所有方法都在事件循环中调用，同一任务同一时刻只由一个工作协程处理，不需要加锁。
+    """
+
+    def __init__(self,
+                 db_manager: DatabaseManager,
+                 enabled: Optional[bool] = None,
+                 writer: Optional[Callable[[Any, Dict[str, Any]], Awaitable[bool]]] = None):
+        """
+        初始化写合并缓冲
+
+        Args:
+            db_manager: 数据库管理器
+            enabled: 是否合并写入，默认读取 TASK_UPDATE_COALESCE
+            writer: 写入函数 (task_id, 字段) -> 是否成功，返回时字段已提交；默认直接调用 update_task
+        """
+        self.db_manager = db_manager
+        self.writer = writer
+        if enabled is None:
+            enabled = os.getenv("TASK_UPDATE_COALESCE", "true").lower() == "true"
+        self.enabled = enabled
+        self._pending: Dict[Any, Dict[str, Any]] = {}
+
+        self.stats = {
+            "staged_updates": 0,
+            "writes": 0,
+            "failed_writes": 0
+        }
+
+    async def stage(self, task_id: Any, **fields) -> bool:
+        """
+        暂存任务字段更新
+
+        Args:
+            task_id: 任务ID
+            **fields: 要更新的字段
+
+        Returns:
+            是否成功（合并模式下总是成功）
+        """
+        self.stats["staged_updates"] += 1
+        if not self.enabled:
+            return await self._write(task_id, fields)
+        self._pending.setdefault(task_id, {}).update(fields)
+        return True
+
+    def peek(self, task_id: Any) -> Dict[str, Any]:
+        """
+        读取尚未写入数据库的字段
+
+        Args:
+            task_id: 任务ID
+
+        Returns:
+            已暂存字段的副本
+        """
+        return dict(self._pending.get(task_id, {}))
+
+    async def flush(self, task_id: Any, direct: bool = False, **fields) -> bool:
+        """
+        把任务已暂存的字段和附加字段合并为一条UPDATE写入
+
+        Args:
+            task_id: 任务ID
+            direct: 绕过写入函数（写回队列）直接调用 update_task
+            **fields: 附加字段（覆盖同名的暂存字段）
+
+        Returns:
+            是否写入成功（没有需要写入的字段时返回True）
+        """
+        values = {**self._pending.pop(task_id, {}), **fields}
+        if not values:
+            return True
+        success = await self._write(task_id, values, direct=direct)
+        if not success:
+            # 放回缓冲，期间新暂存的字段更新，优先保留
+            self._pending[task_id] = {**values, **self._pending.get(task_id, {})}
+        return success
+
+    def discard(self, task_id: Any):
+        """丢弃任务已暂存的字段"""
+        self._pending.pop(task_id, None)
+
+    async def flush_all(self):
+        """写入所有任务的暂存字段（停止处理器时调用）"""
+        for task_id in list(self._pending):
+            await self.flush(task_id)
+
+    async def _write(self, task_id: Any, values: Dict[str, Any], direct: bool = False) -> bool:
+        """执行一次数据库写入并记录统计"""
+        if self.writer is not None and not direct:
+            success = await self.writer(task_id, values)
+        else:
+            success = await self.db_manager.update_task(task_id, **values)
+        self.stats["writes" if success else "failed_writes"] += 1
+        return success
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取写合并统计信息"""
+        return {
+            **self.stats,
+            "enabled": self.enabled,
+            "pending_tasks": len(self._pending)
+        }
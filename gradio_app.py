@@ -58,15 +58,17 @@ class DocumentConverter:
             # 准备转换请求数据
             data = {
                 'task_type': conversion_type,
-                'priority': priority,
-                'input_path': file_path
+                'priority': priority
             }
             
-            # 发送转换请求
-            response = self.session.post(
-                f"{API_BASE_URL}/api/tasks/create",
-                data=data
-            )
+            # 以multipart方式上传文件，服务端直接写入任务工作空间（不依赖共享文件系统）
+            content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+            with open(file_path, 'rb') as f:
+                response = self.session.post(
+                    f"{API_BASE_URL}/api/tasks/create",
+                    data=data,
+                    files={'file_upload': (filename, f, content_type)}
+                )
             
             if response.status_code == 200:
                 result = response.json()
@@ -47,11 +47,12 @@ async def lifespan(app: FastAPI):
         # 初始化任务处理器
         database_type = os.getenv("DATABASE_TYPE", "sqlite")
         database_url = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./document_tasks.db")
+        max_concurrent_tasks = int(os.getenv("MAX_CONCURRENT_TASKS", "3"))
         
-        logger.info(f"Initializing task processor - DB: {database_type}")
+        logger.info(f"Initializing task processor - DB: {database_type}, Max concurrent: {max_concurrent_tasks}")
         
         # 初始化API中的任务处理器
-        initialize_task_processor(database_type, database_url)
+        initialize_task_processor(database_type, database_url, max_concurrent_tasks)
         
         # 获取任务处理器实例
         from api.unified_document_api import task_processor as api_processor
@@ -8,19 +8,33 @@ import asyncio
 import threading
 import uuid
 import gc
+import hashlib
+import json
 import os
 import shutil
+import socket
+import time
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, Any, Optional, List
 
 from database.models import DocumentTask, TaskStatus, TaskPriority, TaskCreateRequest
 from database.database_manager import DatabaseManager
+from database.task_update_buffer import TaskUpdateBuffer
 from services.s3_download_service import S3DownloadService
 from services.s3_upload_service import S3UploadService
+from services.http_download_service import HttpDownloadService
 from utils.workspace_manager import WorkspaceManager
 from utils.logging_utils import configure_logging, get_task_logger
 from services.document_service import DocumentService
+from services.inference_executor import InferenceExecutor
+from services.inference_batcher import InferenceBatcher
+from services.libreoffice_pool import LibreOfficePool
+from services.mineru_pipeline import (
+    DEFAULT_PIPELINE_OPTIONS, MIDDLE_JSON_FORMATS, resolve_pipeline_options, resolve_output_options, middle_json_filename
+)
+from services.conversion_cache import ConversionCache, CACHEABLE_TASK_TYPES, compute_file_sha256
+from services.pdf_text_extractor import resolve_fast_path
 
 logger = configure_logging(name=__name__)
 
@@ -59,25 +73,73 @@ class EnhancedTaskProcessor:
         
         # 初始化数据库管理器
         self.db_manager: Optional[DatabaseManager] = None
+        # 任务字段写合并缓冲（数据库初始化后创建）
+        self.task_updates: Optional[TaskUpdateBuffer] = None
         
         # 初始化服务组件
         self.s3_download_service = S3DownloadService()
         self.s3_upload_service = S3UploadService()
+        self.http_download_service = HttpDownloadService()
         self.workspace_manager = WorkspaceManager(workspace_dir)
-        self.doc_service = DocumentService()
+        # MinerU推理执行器 - warm模式每个工作进程各加载一份完整模型，默认只启动1个（按显存容量通过
+        # INFERENCE_MAX_WORKERS 扩容）并按默认参数预热；thread/process模式默认并发数与最大并发任务数一致
+        inference_mode = os.getenv("INFERENCE_EXECUTOR_MODE", "warm").lower()
+        default_inference_workers = 1 if inference_mode == "warm" else max_concurrent_tasks
+        self.inference_executor = InferenceExecutor(
+            mode=inference_mode,
+            max_workers=int(os.getenv("INFERENCE_MAX_WORKERS", str(default_inference_workers))),
+            warmup_options=DEFAULT_PIPELINE_OPTIONS
+        )
+        # 跨文档微批处理 - 将同时到达的PDF任务合并为一次批量推理
+        self.inference_batcher = InferenceBatcher(self.inference_executor)
+        # 常驻LibreOffice进程池 - LIBREOFFICE_POOL_SIZE=0 时退回每个文件启动一次LibreOffice
+        self.libreoffice_pool = LibreOfficePool() if int(os.getenv("LIBREOFFICE_POOL_SIZE", "2")) > 0 else None
+        self.doc_service = DocumentService(
+            inference_executor=self.inference_executor,
+            inference_batcher=self.inference_batcher,
+            libreoffice_pool=self.libreoffice_pool
+        )
+        # 转换结果缓存 - 相同输入和参数的重复提交直接复用结果
+        self.conversion_cache = ConversionCache()
+        # S3来源指纹 - 未变化的S3对象重复提交时跳过下载、转换和上传
+        self.source_fingerprint_enabled = os.getenv("SOURCE_FINGERPRINT_ENABLED", "true").lower() == "true"
         
         # 队列系统 - 复刻MediaConvert的多队列设计
-        self.fetch_queue = asyncio.Queue()           # 获取任务队列
-        self.task_processing_queue = asyncio.Queue() # 任务处理队列
-        self.update_queue = asyncio.Queue()          # 状态更新队列
+        self.fetch_queue = asyncio.Queue()           # 获取任务唤醒信号（新任务/重试/处理名额释放）
+        self.task_processing_queue = asyncio.Queue() # 已认领任务交给处理协程（按认领顺序，None表示退出）
+        self.update_queue = asyncio.Queue()          # 任务字段写回队列（由写回协程合并后批量提交）
         self.cleanup_queue = asyncio.Queue()         # 清理队列
         self.callback_queue = asyncio.Queue()        # 回调队列
         
-        # 优先级队列 - 支持智能调度
-        self.high_priority_queue = asyncio.Queue()   # 高优先级队列
-        self.normal_priority_queue = asyncio.Queue() # 普通优先级队列
-        self.low_priority_queue = asyncio.Queue()    # 低优先级队列
-        
+        # 已认领但尚未处理完成的任务数，认领数不超过最大并发任务数
+        self.claimed_tasks = 0
+
+        # 处理租约 - 认领时记录本实例ID和租约到期时间，处理期间定期续期；
+        # 只有租约过期（所属实例已崩溃或失去响应）的处理中任务才会被回收，多个处理器共享数据库时不会重复处理
+        self.instance_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"[:64]
+        self.task_lease_seconds = float(os.getenv("TASK_LEASE_SECONDS", "300"))
+        self.lease_renew_interval = self.task_lease_seconds / 3
+        self.leased_tasks: set = set()
+        # 终态（完成/失败/重新排队）未能写入数据库的任务 -> 写入成功后的后续动作（"cleanup" / "fetch"），
+        # 这些任务保留缓冲字段和租约，由租约协程重试写入
+        self.unsaved_task_states: Dict[int, str] = {}
+
+        # 处理中任务的实时进度（阶段、已输出页数、Markdown已写出字节数），任务结束后移除
+        self.task_progress: Dict[int, Dict[str, Any]] = {}
+        # 已处理页数写入数据库的最小间隔(秒)，期间的进度只保存在内存中
+        self.page_progress_db_interval = float(os.getenv("TASK_PROGRESS_DB_INTERVAL", "2"))
+
+        # 写回批处理：自第一条更新起最多等待的时间(秒)和每批最多包含的更新数
+        self.update_flush_interval = int(os.getenv("TASK_UPDATE_FLUSH_INTERVAL_MS", "50")) / 1000
+        self.update_batch_size = int(os.getenv("TASK_UPDATE_BATCH_SIZE", "200"))
+        self.update_worker: Optional[asyncio.Task] = None
+        self.write_behind_stats = {
+            "batches": 0,
+            "updates": 0,
+            "task_writes": 0,
+            "failed_batches": 0
+        }
+
         # 运行状态
         self.is_running = False
         self.workers = []
@@ -102,6 +164,7 @@ class EnhancedTaskProcessor:
                 database_url=self.database_url
             )
             await self.db_manager.initialize()
+            self.task_updates = TaskUpdateBuffer(self.db_manager, writer=self._write_task_update)
             
             logger.info("Database connection initialized successfully")
             
@@ -109,12 +172,16 @@ class EnhancedTaskProcessor:
             logger.error(f"Failed to initialize database: {e}")
             raise
     
-    async def create_task(self, request: TaskCreateRequest) -> str:
+    async def create_task(self, request: TaskCreateRequest, staged_input: Optional[Path] = None,
+                          staged_filename: Optional[str] = None, input_sha256: Optional[str] = None) -> str:
         """
         创建新任务
         
         Args:
             request: 任务创建请求
+            staged_input: 已暂存的上传文件（位于工作空间内），任务创建时直接移动到任务input目录
+            staged_filename: 上传文件的原始文件名
+            input_sha256: 暂存上传文件时服务端计算的SHA-256
             
         Returns:
             任务ID
@@ -133,21 +200,33 @@ class EnhancedTaskProcessor:
                 params=request.params,
                 callback_url=request.callback_url,
                 platform=request.platform,
+                input_sha256=input_sha256,
                 created_at=datetime.now()
             )
             
+            before_commit = None
+            if staged_input is not None:
+                def before_commit(new_task: DocumentTask):
+                    # 在任务对其他会话可见之前把上传文件重命名到input目录（同一文件系统，不复制）
+                    target_path = self.workspace_manager.get_downloaded_file_path(new_task.id, staged_filename)
+                    target_path.parent.mkdir(parents=True, exist_ok=True)
+                    os.replace(staged_input, target_path)
+                    new_task.input_path = str(target_path)
+                    new_task.file_name = staged_filename
+                    new_task.file_size_bytes = target_path.stat().st_size
+
             # 保存到数据库 - 数据库会自动分配自增ID
-            task = await self.db_manager.create_task(task)
+            task = await self.db_manager.create_task(task, before_commit=before_commit)
             task_id = task.id  # 获取数据库分配的自增ID
 
-            # 放入获取队列
+            # 唤醒获取协程立即认领，无需等待轮询间隔
             await self.fetch_queue.put(task_id)
 
             # 更新统计
             self.stats["total_tasks"] += 1
 
             task_logger = get_task_logger(task_id)
-            task_logger.log_task_start(request.task_type, f"Input: {request.input_path or request.file_url or f's3://{request.bucket_name}/{request.file_path}'}")
+            task_logger.log_task_start(request.task_type, f"Input: {task.input_path or request.file_url or f's3://{request.bucket_name}/{request.file_path}'}")
 
             logger.info(f"Created task {task_id}: {request.task_type}")
             return task_id
@@ -156,6 +235,49 @@ class EnhancedTaskProcessor:
             logger.error(f"Failed to create task: {e}")
             raise
     
+    async def create_tasks_batch(self, requests: List[TaskCreateRequest], chunk_size: Optional[int] = None) -> List[int]:
+        """
+        批量创建任务：分块批量插入数据库，全部插入后只唤醒一次获取协程
+
+        Args:
+            requests: 任务创建请求列表
+            chunk_size: 每条INSERT语句包含的任务数，默认读取 BATCH_INSERT_CHUNK_SIZE
+
+        Returns:
+            与requests顺序一致的任务ID列表
+        """
+        chunk_size = int(chunk_size or os.getenv("BATCH_INSERT_CHUNK_SIZE", "500"))
+        now = datetime.now()
+        rows = [
+            {
+                'task_type': request.task_type,
+                'status': TaskStatus.pending,
+                'priority': request.priority,
+                'bucket_name': request.bucket_name,
+                'file_path': request.file_path,
+                'file_url': request.file_url,
+                'input_path': request.input_path,
+                'output_path': request.output_path,
+                'params': request.params,
+                'callback_url': request.callback_url,
+                'platform': request.platform,
+                'retry_count': 0,
+                'max_retry_count': 3,
+                'created_at': now
+            }
+            for request in requests
+        ]
+
+        task_ids = await self.db_manager.create_tasks_bulk(rows, chunk_size)
+
+        # 唤醒获取协程一次，由其按空闲名额分批认领
+        if task_ids:
+            await self.fetch_queue.put(None)
+
+        self.stats["total_tasks"] += len(task_ids)
+        logger.info(f"Created {len(task_ids)} tasks in batch")
+        return task_ids
+
     async def start(self):
         """启动任务处理器"""
         if self.is_running:
@@ -169,16 +291,31 @@ class EnhancedTaskProcessor:
             # 恢复未完成的任务
             await self._recover_incomplete_tasks()
 
+            # 启动时检查一次S3连通性（失败只告警，不阻止启动；客户端在后续操作中共享复用）
+            await asyncio.gather(
+                self.s3_download_service.probe_connection(),
+                self.s3_upload_service.probe_connection()
+            )
+
+            # 启动推理执行器和LibreOffice进程池
+            await self.inference_executor.start()
+            if self.libreoffice_pool is not None:
+                await self.libreoffice_pool.start()
+
             self.is_running = True
 
+            # 启动后立即认领积压和恢复的任务
+            self.fetch_queue.put_nowait(None)
+
             # 启动工作协程
+            self.update_worker = asyncio.create_task(self._update_task_worker())
             self.workers = [
                 asyncio.create_task(self._fetch_task_worker()),
-                asyncio.create_task(self._priority_scheduler_worker()),
-                asyncio.create_task(self._update_task_worker()),
+                self.update_worker,
                 asyncio.create_task(self._cleanup_worker()),
                 asyncio.create_task(self._callback_worker()),
                 asyncio.create_task(self._gc_worker()),
+                asyncio.create_task(self._lease_worker()),
             ]
 
             # 启动任务处理工作协程
@@ -194,46 +331,74 @@ class EnhancedTaskProcessor:
             raise
 
     async def _recover_incomplete_tasks(self):
-        """恢复未完成的任务"""
+        """回收租约已过期的处理中任务（其他实例正在处理的任务租约有效，不受影响）"""
         try:
-            logger.info("Recovering incomplete tasks...")
+            recovered_count = await self.db_manager.recover_expired_tasks()
+            if recovered_count:
+                logger.info(f"Recovered {recovered_count} processing tasks with expired leases to pending status")
+                self.fetch_queue.put_nowait(None)
+            return recovered_count
 
-            # 查询processing状态的任务
-            from database.models import QueryTasksFilter, TaskStatus
-            filter_params = QueryTasksFilter(
-                status=TaskStatus.processing,
-                limit=100  # 最大限制100个任务
-            )
+        except Exception as e:
+            logger.error(f"Failed to recover incomplete tasks: {e}")
+            import traceback
+            logger.error(traceback.format_exc())
+            return 0
 
-            processing_tasks = await self.db_manager.query_tasks(filter_params)
+    async def _lease_worker(self):
+        """租约工作协程：续期本实例持有的任务租约，并回收其他实例崩溃后遗留的任务"""
+        while self.is_running:
+            await asyncio.sleep(self.lease_renew_interval)
+            try:
+                await self._retry_unsaved_task_states()
+                if self.leased_tasks:
+                    renewed = await self.db_manager.renew_task_leases(
+                        list(self.leased_tasks), self.instance_id, self.task_lease_seconds
+                    )
+                    if renewed < len(self.leased_tasks):
+                        logger.debug(f"Renewed {renewed} of {len(self.leased_tasks)} task leases, "
+                                       f"the others were recovered or finished")
+                await self._recover_incomplete_tasks()
+            except Exception as e:
+                logger.error(f"Error in lease_worker: {e}")
 
-            if not processing_tasks:
-                logger.info("No incomplete tasks to recover")
-                return
+    async def _retry_unsaved_task_states(self):
+        """重试写入未落库的任务终态，成功后再执行清理回调或重新排队"""
+        for task_id, follow_up in list(self.unsaved_task_states.items()):
+            if not await self.task_updates.flush(task_id):
+                continue
+            del self.unsaved_task_states[task_id]
+            self.task_updates.discard(task_id)
+            self.leased_tasks.discard(task_id)
+            logger.info(f"Persisted final state of task {task_id} after retry")
+            if follow_up == "fetch":
+                await self.fetch_queue.put(task_id)
+            else:
+                await self.cleanup_queue.put(task_id)
 
-            logger.info(f"Found {len(processing_tasks)} incomplete tasks to recover")
+    async def _write_final_state(self, task_id: int, follow_up: str, **fields) -> bool:
+        """
+        写入任务终态（完成/失败/重新排队）
 
-            # 将任务状态重置为pending
-            recovered_count = 0
-            for task in processing_tasks:
-                try:
-                    await self.db_manager.update_task_status(
-                        task.id,
-                        TaskStatus.pending,
-                        error_message="Task recovered after service restart"
-                    )
-                    recovered_count += 1
-                    logger.debug(f"Recovered task {task.id}: {task.task_type}")
-                except Exception as e:
-                    logger.error(f"Failed to recover task {task.id}: {e}")
+        先与缓冲中的字段合并经写回队列写入，失败时绕过写回队列直接写入一次；仍然失败时字段保留在缓冲中，
+        任务保留租约，由租约协程继续重试，写入成功后才执行后续动作
 
-            logger.info(f"Successfully recovered {recovered_count} tasks to pending status")
+        Args:
+            task_id: 任务ID
+            follow_up: 写入成功后的后续动作（"cleanup" 清理并回调 / "fetch" 重新排队）
+            **fields: 终态字段
+
+        Returns:
+            是否已写入数据库
+        """
+        if await self.task_updates.flush(task_id, **fields):
+            return True
+        if await self.task_updates.flush(task_id, direct=True):
+            return True
+        logger.error(f"Failed to persist final state of task {task_id}, keeping its lease and retrying")
+        self.unsaved_task_states[task_id] = follow_up
+        return False
 
-        except Exception as e:
-            logger.error(f"Failed to recover incomplete tasks: {e}")
-            import traceback
-            logger.error(traceback.format_exc())
-    
     async def stop(self):
         """停止任务处理器"""
         if not self.is_running:
@@ -241,11 +406,27 @@ class EnhancedTaskProcessor:
         
         logger.info("Stopping TaskProcessor...")
         self.is_running = False
+        # 已认领但尚未开始处理的任务放回pending，不必等租约过期；再唤醒等待任务的处理协程使其退出
+        await self._release_claimed_tasks(self._drain_task_processing_queue())
+        for _ in range(self.max_concurrent_tasks):
+            self.task_processing_queue.put_nowait(None)
         
         # 等待所有工作协程完成
         if self.workers:
             await asyncio.gather(*self.workers, return_exceptions=True)
         
+        # 关闭推理执行器和LibreOffice进程池
+        await self.inference_executor.shutdown()
+        if self.libreoffice_pool is not None:
+            await self.libreoffice_pool.shutdown()
+        
+        # 关闭HTTP下载连接池
+        await self.http_download_service.close()
+        
+        # 写入尚未落库的任务字段
+        if self.task_updates:
+            await self.task_updates.flush_all()
+        
         # 关闭数据库连接
         if self.db_manager:
             await self.db_manager.close()
@@ -253,71 +434,84 @@ class EnhancedTaskProcessor:
         logger.info("TaskProcessor stopped")
     
     async def _fetch_task_worker(self):
-        """获取任务工作协程"""
+        """获取任务工作协程：被唤醒或兜底轮询时，按空闲处理名额原子认领待处理任务"""
         while self.is_running:
             try:
-                # 从数据库获取待处理任务
-                from database.models import QueryTasksFilter
-                filter_params = QueryTasksFilter(
-                    status=TaskStatus.pending,
-                    limit=self.max_concurrent_tasks
+                # 等待唤醒信号；超时兜底轮询，用于发现其他进程创建的任务
+                try:
+                    await asyncio.wait_for(self.fetch_queue.get(), timeout=self.task_check_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+                # 合并积压的唤醒信号，一次认领即可
+                while not self.fetch_queue.empty():
+                    self.fetch_queue.get_nowait()
+
+                free_slots = self.max_concurrent_tasks - self.claimed_tasks
+                if free_slots <= 0:
+                    # 名额已满，任务处理完成时会再次唤醒
+                    continue
+
+                # 认领顺序已带优先级老化（TASK_PRIORITY_AGING_SECONDS），等待足够久的低优先级任务不会被
+                # 新到的高优先级任务持续挤占；认领数不超过空闲名额，本地只需按认领顺序交给处理协程
+                tasks = await self.db_manager.claim_pending_tasks(
+                    free_slots, worker_id=self.instance_id, lease_seconds=self.task_lease_seconds
                 )
-                tasks = await self.db_manager.query_tasks(filter_params)
-                
+                self.claimed_tasks += len(tasks)
                 for task in tasks:
-                    # 更新状态为处理中
-                    await self.db_manager.update_task_status(task.id, TaskStatus.processing)
-                    
-                    # 根据优先级分发到不同队列
-                    if task.priority == TaskPriority.high:
-                        await self.high_priority_queue.put(task.id)
-                    elif task.priority == TaskPriority.low:
-                        await self.low_priority_queue.put(task.id)
-                    else:
-                        await self.normal_priority_queue.put(task.id)
-                
-                # 等待一段时间再次检查
-                await asyncio.sleep(self.task_check_interval)
+                    self.leased_tasks.add(task.id)
+
+                if not self.is_running:
+                    # 认领期间处理器已停止，直接放回
+                    await self._release_claimed_tasks([task.id for task in tasks])
+                    break
+                for task in tasks:
+                    self.task_processing_queue.put_nowait(task.id)
                 
             except Exception as e:
                 logger.error(f"Error in fetch_task_worker: {e}")
                 await asyncio.sleep(self.task_check_interval)
-    
-    async def _priority_scheduler_worker(self):
-        """优先级调度工作协程"""
-        while self.is_running:
-            try:
-                task_id = None
-                
-                # 按优先级顺序获取任务
-                if not self.high_priority_queue.empty():
-                    task_id = await self.high_priority_queue.get()
-                elif not self.normal_priority_queue.empty():
-                    task_id = await self.normal_priority_queue.get()
-                elif not self.low_priority_queue.empty():
-                    task_id = await self.low_priority_queue.get()
-                
-                if task_id:
-                    await self.task_processing_queue.put(task_id)
-                else:
-                    await asyncio.sleep(1)  # 没有任务时短暂等待
-                    
-            except Exception as e:
-                logger.error(f"Error in priority_scheduler_worker: {e}")
-                await asyncio.sleep(1)
+
+    def _drain_task_processing_queue(self) -> List[int]:
+        """取出处理队列中尚未开始处理的任务ID"""
+        task_ids = []
+        while not self.task_processing_queue.empty():
+            task_id = self.task_processing_queue.get_nowait()
+            if task_id is not None:
+                task_ids.append(task_id)
+        return task_ids
+
+    async def _release_claimed_tasks(self, task_ids: List[int]):
+        """
+        把已认领但尚未开始处理的任务放回pending并释放租约
+
+        Args:
+            task_ids: 任务ID列表
+        """
+        if not task_ids:
+            return
+        released = await self.db_manager.release_task_leases(task_ids, self.instance_id)
+        for task_id in task_ids:
+            self.leased_tasks.discard(task_id)
+        self.claimed_tasks = max(0, self.claimed_tasks - len(task_ids))
+        logger.info(f"Released {released} of {len(task_ids)} claimed tasks that had not started")
+
+    def _release_task_slot(self):
+        """任务处理结束，释放认领名额并唤醒获取协程"""
+        self.claimed_tasks = max(0, self.claimed_tasks - 1)
+        self.fetch_queue.put_nowait(None)
     
     async def _task_worker(self, worker_id: int):
         """任务处理工作协程"""
         logger.info(f"Task worker {worker_id} started")
         
         while self.is_running:
+            # 等待认领的任务，停止时收到None退出
+            task_id = await self.task_processing_queue.get()
+            if task_id is None:
+                break
+
             try:
-                # 从处理队列获取任务
-                task_id = await asyncio.wait_for(
-                    self.task_processing_queue.get(),
-                    timeout=self.task_check_interval
-                )
-                
                 # 获取任务详情
                 task = await self.db_manager.get_task(task_id)
                 if not task:
@@ -338,7 +532,7 @@ class EnhancedTaskProcessor:
                 processing_time = (end_time - start_time).total_seconds()
                 
                 # 更新任务结果
-                await self._handle_task_result(task, result, processing_time, task_logger)
+                persisted = await self._handle_task_result(task, result, processing_time, task_logger)
                 
                 # 更新统计
                 self.stats["active_tasks"] -= 1
@@ -347,17 +541,21 @@ class EnhancedTaskProcessor:
                 else:
                     self.stats["failed_tasks"] += 1
                 
-                # 放入后续处理队列
-                await self.update_queue.put(task_id)
-                await self.cleanup_queue.put(task_id)
+                # 放入后续处理队列（终态已在 _handle_task_result 中提交，回调读取到的一定是最终状态；
+                # 未写入的终态由租约协程重试成功后再放入）
+                if persisted:
+                    await self.cleanup_queue.put(task_id)
                 
-            except asyncio.TimeoutError:
-                continue
             except Exception as e:
                 logger.error(f"Error in task_worker {worker_id}: {e}")
-                if 'task_id' in locals():
-                    await self._handle_task_error(task_id, str(e))
+                await self._handle_task_error(task_id, str(e))
                 await asyncio.sleep(1)
+            finally:
+                self.task_progress.pop(task_id, None)
+                if task_id not in self.unsaved_task_states:
+                    self.task_updates.discard(task_id)
+                    self.leased_tasks.discard(task_id)
+                self._release_task_slot()
 
     async def _process_task(self, task: DocumentTask, task_logger) -> Dict[str, Any]:
         """
@@ -371,30 +569,52 @@ class EnhancedTaskProcessor:
             处理结果字典
         """
         try:
+            # 步骤0: 检查S3来源指纹，同一未变化对象已按相同参数转换过时直接复用结果
+            source_info = None
+            fingerprint = None
+            if self.source_fingerprint_enabled and task.bucket_name and task.file_path:
+                source_info = await self.s3_download_service.check_file_exists(task.bucket_name, task.file_path)
+                if source_info.get('exists') and source_info.get('etag'):
+                    fingerprint = self._build_source_fingerprint(task, source_info)
+                    if not (task.params or {}).get('force_reprocess', False):
+                        reused = await self._reuse_source_fingerprint(task, fingerprint, task_logger)
+                        if reused is not None:
+                            return reused
+
             # 创建任务工作空间
             workspace = self.workspace_manager.create_task_workspace(task.id)
             task_logger.log_task_progress("workspace_created", f"Workspace: {workspace}")
 
             # 步骤1: 下载文件
-            input_file_path = await self._download_input_file(task, task_logger)
+            self._set_task_progress(task.id, stage="downloading")
+            input_info: Dict[str, Any] = {}
+            input_file_path = await self._download_input_file(task, task_logger, source_info, input_info)
             if not input_file_path:
                 raise Exception("Failed to download input file")
 
             # 步骤2: 执行文档转换
+            self._set_task_progress(task.id, stage="converting")
             output_file_path = await self._execute_conversion(task, input_file_path, task_logger)
             if not output_file_path:
                 raise Exception("Document conversion failed")
 
-            # 步骤3: 上传结果文件
+            # 步骤3: 上传结果文件（先把输入文件信息和转换结果合并为一次写入）
+            self._set_task_progress(task.id, stage="uploading")
+            await self.task_updates.flush(task.id)
             upload_result = await self._upload_output_file(task, output_file_path, task_logger)
             if not upload_result['success']:
                 raise Exception(f"Failed to upload output file: {upload_result.get('error')}")
 
+            # 记录来源指纹，供后续相同请求复用
+            if fingerprint:
+                await self._save_source_fingerprint(task, fingerprint, source_info)
+
             return {
                 'success': True,
                 'input_file': str(input_file_path),
                 'output_file': str(output_file_path),
                 'upload_result': upload_result,
+                'input_info': input_info,
                 'conversion_type': task.task_type
             }
 
@@ -406,10 +626,132 @@ class EnhancedTaskProcessor:
                 'error_type': type(e).__name__
             }
 
-    async def _download_input_file(self, task: DocumentTask, task_logger) -> Optional[Path]:
-        """下载输入文件"""
+    def _build_source_fingerprint(self, task: DocumentTask, source_info: Dict[str, Any]) -> str:
+        """
+        计算S3来源指纹：源对象 bucket/key/ETag/大小 + 任务类型 + 影响输出的参数和引擎版本
+
+        Args:
+            task: 任务对象
+            source_info: check_file_exists 返回的对象信息
+
+        Returns:
+            指纹（十六进制SHA-256）
+        """
+        if task.task_type in CACHEABLE_TASK_TYPES:
+            options = self._get_output_options(task)
+            if (task.params or {}).get('keep_pdf'):
+                # 保留中间PDF时输出多一个文件，与不保留的结果区分
+                options['keep_pdf'] = True
+            engine = self.conversion_cache.engine_version
+        else:
+            options = {}
+            engine = "libreoffice"
+        material = json.dumps({
+            'bucket': task.bucket_name,
+            'key': task.file_path,
+            'etag': source_info['etag'],
+            'size': source_info.get('file_size', 0),
+            'task_type': task.task_type,
+            'options': options,
+            'engine': engine
+        }, sort_keys=True, ensure_ascii=True)
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    async def _reuse_source_fingerprint(self, task: DocumentTask, fingerprint: str, task_logger) -> Optional[Dict[str, Any]]:
+        """
+        命中来源指纹时把任务指向已上传的输出
+
+        Args:
+            task: 任务对象
+            fingerprint: 来源指纹
+            task_logger: 任务日志记录器
+
+        Returns:
+            处理结果字典，未命中或输出已失效时返回None
+        """
+        record = await self.db_manager.get_source_fingerprint(fingerprint)
+        if record is None or not record.s3_urls:
+            return None
+
+        # 输出可能已被清理，确认主要输出仍然存在
+        main_url = record.output_url if (record.output_url or '').startswith('s3://') else record.s3_urls[0]
+        if not await self.s3_upload_service.check_object_exists(main_url):
+            task_logger.warning(f"Outputs of task {record.source_task_id} no longer exist, converting again")
+            await self.db_manager.delete_source_fingerprint(fingerprint)
+            return None
+
+        task_logger.log_task_progress("source_fingerprint_hit",
+                                      f"Reusing outputs of task {record.source_task_id}: {len(record.s3_urls)} files")
+        await self.task_updates.stage(
+            task.id,
+            output_url=record.output_url,
+            s3_urls=record.s3_urls,
+            file_size_bytes=record.size_bytes
+        )
+        return {
+            'success': True,
+            'conversion_type': task.task_type,
+            'source_fingerprint_hit': True,
+            'source_task_id': record.source_task_id,
+            'upload_result': {
+                'success': True,
+                's3_url': record.output_url,
+                'total_files': len(record.s3_urls)
+            }
+        }
+
+    async def _save_source_fingerprint(self, task: DocumentTask, fingerprint: str, source_info: Dict[str, Any]):
+        """
+        保存来源指纹（读取上传后写入任务的输出地址）
+
+        Args:
+            task: 任务对象
+            fingerprint: 来源指纹
+            source_info: check_file_exists 返回的对象信息
+        """
+        # 上传地址通常还在写合并缓冲中，与完成状态一起写入
+        staged = self.task_updates.peek(task.id)
+        if 's3_urls' in staged:
+            output_url, s3_urls = staged.get('output_url'), staged['s3_urls']
+        else:
+            updated_task = await self.db_manager.get_task(task.id)
+            if updated_task is None:
+                return
+            output_url, s3_urls = updated_task.output_url, updated_task.s3_urls
+        if not s3_urls:
+            return
+        await self.db_manager.save_source_fingerprint(
+            fingerprint,
+            bucket_name=task.bucket_name,
+            file_path=task.file_path,
+            etag=source_info['etag'],
+            size_bytes=source_info.get('file_size', 0),
+            task_type=task.task_type,
+            source_task_id=task.id,
+            output_url=output_url,
+            s3_urls=s3_urls
+        )
+
+    async def _download_input_file(self,
+                                   task: DocumentTask,
+                                   task_logger,
+                                   source_info: Optional[Dict[str, Any]] = None,
+                                   input_info: Optional[Dict[str, Any]] = None) -> Optional[Path]:
+        """
+        下载输入文件
+
+        Args:
+            task: 任务对象
+            task_logger: 任务日志记录器
+            source_info: 已获取的S3对象信息，提供时下载不再重复HEAD
+            input_info: 输出参数，记录输入来源和本地文件放置策略
+        """
         try:
+            if input_info is None:
+                input_info = {}
+
             if task.bucket_name and task.file_path:
+                input_info['source'] = 's3'
                 # 从S3下载 - 应用MediaConvert的中文文件名处理方案
                 from utils.encoding_utils import EncodingUtils
 
@@ -427,7 +769,8 @@ class EnhancedTaskProcessor:
                 result = await self.s3_download_service.download_file(
                     bucket_name=task.bucket_name,
                     s3_key=task.file_path,
-                    local_file_path=str(local_path)
+                    local_file_path=str(local_path),
+                    object_info=source_info
                 )
 
                 if result['success']:
@@ -435,7 +778,7 @@ class EnhancedTaskProcessor:
                                                 f"Size: {result['file_size']} bytes, Time: {result['download_time']:.2f}s")
 
                     # 更新任务信息
-                    await self.db_manager.update_task(
+                    await self.task_updates.stage(
                         task.id,
                         input_path=str(local_path),
                         file_name=filename,
@@ -448,16 +791,53 @@ class EnhancedTaskProcessor:
                     return None
 
             elif task.file_url:
-                # 从HTTP URL下载
-                # TODO: 实现HTTP下载逻辑
-                task_logger.error("HTTP URL download not implemented yet")
-                return None
+                # 从HTTP URL下载 - 流式写入input目录，重试时从 .part 文件续传
+                input_info['source'] = 'http'
+                from urllib.parse import urlparse, unquote
+                import mimetypes
+
+                filename = task.file_name or unquote(Path(urlparse(task.file_url).path).name) or f"input_{task.id}"
+                local_path = self.workspace_manager.get_downloaded_file_path(task.id, filename)
+
+                task_logger.log_task_progress("downloading_from_url", task.file_url)
+
+                result = await self.http_download_service.download_file(task.file_url, str(local_path))
+
+                if result['success']:
+                    # URL中没有扩展名时按Content-Type补全，转换流程依赖扩展名判断格式
+                    if not local_path.suffix and result.get('content_type'):
+                        extension = mimetypes.guess_extension(result['content_type'].split(';')[0].strip())
+                        if extension:
+                            renamed_path = local_path.with_suffix(extension)
+                            os.replace(local_path, renamed_path)
+                            local_path = renamed_path
+                            filename = local_path.name
+
+                    task_logger.log_file_operation(
+                        "http_download", task.file_url, True,
+                        f"Size: {result['file_size']} bytes, Time: {result['download_time']:.2f}s, "
+                        f"Throughput: {result['throughput'] / 1024 / 1024:.2f} MB/s, Resumed: {result['resumed_bytes']} bytes"
+                    )
+
+                    # 更新任务信息
+                    await self.task_updates.stage(
+                        task.id,
+                        input_path=str(local_path),
+                        file_name=filename,
+                        file_size_bytes=result['file_size']
+                    )
+
+                    return local_path
+                else:
+                    task_logger.log_file_operation("http_download", task.file_url, False, result.get('error'))
+                    return None
 
             elif task.input_path:
-                # 使用本地文件 - 复制到task_workspace的input目录
+                # 使用本地文件 - 放到task_workspace的input目录（尽量不复制数据）
+                input_info['source'] = 'local'
                 input_path = Path(task.input_path)
                 if input_path.exists():
-                    # 复制文件到task_workspace的input目录
+                    # 放到task_workspace的input目录
                     filename = input_path.name
                     workspace_input_path = self.workspace_manager.get_downloaded_file_path(task.id, filename)
 
@@ -466,12 +846,13 @@ class EnhancedTaskProcessor:
 
                     # 检查源文件和目标文件是否相同
                     if input_path.resolve() == workspace_input_path.resolve():
-                        # 如果源文件和目标文件相同，直接使用原文件
+                        # 如果源文件和目标文件相同（如直接上传的文件），直接使用原文件
+                        input_info['staging_strategy'] = 'in_place'
                         task_logger.log_file_operation("local_file_direct", str(input_path), True,
                                                      f"Using file directly (same path), Size: {input_path.stat().st_size} bytes")
                         
                         # 更新任务信息
-                        await self.db_manager.update_task(
+                        await self.task_updates.stage(
                             task.id,
                             input_path=str(input_path),
                             file_name=filename,
@@ -480,15 +861,18 @@ class EnhancedTaskProcessor:
                         
                         return input_path
                     else:
-                        # 复制文件
-                        import shutil
-                        shutil.copy2(str(input_path), str(workspace_input_path))
+                        # 按 硬链接 -> reflink -> copy_file_range -> 符号链接 -> 复制 的顺序放到input目录
+                        staging = await asyncio.to_thread(
+                            self.workspace_manager.stage_input_file, input_path, workspace_input_path
+                        )
+                        input_info['staging_strategy'] = staging['strategy']
 
-                        task_logger.log_file_operation("local_file_copy", f"{input_path} -> {workspace_input_path}", True,
-                                                     f"Size: {workspace_input_path.stat().st_size} bytes")
+                        task_logger.log_file_operation(f"local_file_{staging['strategy']}",
+                                                     f"{input_path} -> {workspace_input_path}", True,
+                                                     f"Size: {staging['size']} bytes")
 
                         # 更新任务信息
-                        await self.db_manager.update_task(
+                        await self.task_updates.stage(
                             task.id,
                             input_path=str(workspace_input_path),
                             file_name=filename,
@@ -526,41 +910,63 @@ class EnhancedTaskProcessor:
 
             task_logger.log_task_progress("conversion_started", f"Type: {task.task_type}")
 
-            # 根据任务类型执行转换
-            if task.task_type == 'office_to_pdf':
-                result = await self.doc_service.convert_office_to_pdf(
-                    input_path=str(input_file),
-                    output_path=str(output_file)
-                )
-            elif task.task_type == 'pdf_to_markdown':
-                result = await self.doc_service.convert_pdf_to_markdown(
-                    input_path=str(input_file),
-                    output_path=str(output_file),
-                    **task.params or {}
-                )
-            elif task.task_type == 'office_to_markdown':
-                result = await self.doc_service.convert_office_to_markdown(
-                    input_path=str(input_file),
-                    output_path=str(output_file)
-                )
-            elif task.task_type == 'image_to_markdown':
-                result = await self.doc_service.convert_image_to_markdown(
-                    input_path=str(input_file),
-                    output_path=str(output_file)
-                )
-            else:
-                raise ValueError(f"Unsupported task type: {task.task_type}")
+            # 查询转换结果缓存
+            cache_key = await self._get_conversion_cache_key(task, input_file)
+            result = None
+            if cache_key and not (task.params or {}).get('force_reprocess', False):
+                result = await self._restore_cached_conversion(task, cache_key, input_file, output_file, task_logger)
+
+            # 未命中缓存时根据任务类型执行转换
+            if result is None:
+                if task.task_type == 'office_to_pdf':
+                    result = await self.doc_service.convert_office_to_pdf(
+                        input_path=str(input_file),
+                        output_path=str(output_file)
+                    )
+                elif task.task_type == 'pdf_to_markdown':
+                    result = await self.doc_service.convert_pdf_to_markdown(
+                        input_path=str(input_file),
+                        output_path=str(output_file),
+                        params=task.params or {},
+                        progress_callback=self._make_page_progress_reporter(task, task_logger)
+                    )
+                elif task.task_type == 'office_to_markdown':
+                    result = await self.doc_service.convert_office_to_markdown(
+                        input_path=str(input_file),
+                        output_path=str(output_file),
+                        params=task.params or {},
+                        progress_callback=self._make_page_progress_reporter(task, task_logger),
+                        temp_dir=str(self.workspace_manager.get_task_temp_dir(task.id))
+                    )
+                elif task.task_type == 'image_to_markdown':
+                    result = await self.doc_service.convert_image_to_markdown(
+                        input_path=str(input_file),
+                        output_path=str(output_file),
+                        params=task.params or {}
+                    )
+                else:
+                    raise ValueError(f"Unsupported task type: {task.task_type}")
 
             if result['success']:
                 task_logger.log_conversion_step(task.task_type, str(input_file), str(output_file), True,
                                               f"Output size: {output_file.stat().st_size if output_file.exists() else 0} bytes")
 
+                # 保存到转换结果缓存（跳过的转换不一定对应本次输入，不缓存）
+                if cache_key and not result.get('cache_hit') and not result.get('skipped'):
+                    await asyncio.to_thread(
+                        self.conversion_cache.store,
+                        cache_key,
+                        str(output_file),
+                        (result.get('json_files') or [None])[0],
+                        result.get('images_dir'),
+                        result.get('page_count')
+                    )
+
                 # 更新任务信息
-                await self.db_manager.update_task(
-                    task.id,
-                    output_path=str(output_file),
-                    result=result
-                )
+                update_fields = {'output_path': str(output_file), 'result': result}
+                if result.get('page_count'):
+                    update_fields['pages_processed'] = result['page_count']
+                await self.task_updates.stage(task.id, **update_fields)
 
                 return output_file
             else:
@@ -571,6 +977,85 @@ class EnhancedTaskProcessor:
             task_logger.error(f"Conversion failed: {e}")
             return None
 
+    async def _get_conversion_cache_key(self, task: DocumentTask, input_file: Path) -> Optional[str]:
+        """
+        计算转换结果缓存键，任务类型不可缓存或缓存关闭时返回None
+
+        Args:
+            task: 任务对象
+            input_file: 输入文件路径
+
+        Returns:
+            缓存键
+        """
+        if not self.conversion_cache.enabled or task.task_type not in CACHEABLE_TASK_TYPES:
+            return None
+        params = task.params or {}
+        if params.get('keep_pdf'):
+            # 缓存中不保存中间PDF，需要保留PDF的任务始终实际转换
+            return None
+        # 只使用服务端计算的哈希（上传暂存时写入任务列），任务参数由客户端提供，不能作为缓存键
+        input_sha256 = task.input_sha256 or await asyncio.to_thread(compute_file_sha256, str(input_file))
+        return self.conversion_cache.build_key(input_sha256, task.task_type, self._get_output_options(task))
+
+    def _get_output_options(self, task: DocumentTask) -> Dict[str, Any]:
+        """
+        影响转换输出的任务参数，用于缓存键和来源指纹
+
+        Args:
+            task: 任务对象
+
+        Returns:
+            流水线参数，启用文本层快速通道时附带 fast_path
+        """
+        options = resolve_pipeline_options(task.params)
+        if task.task_type != 'image_to_markdown' and resolve_fast_path(task.params):
+            options['fast_path'] = True
+        return options
+
+    async def _restore_cached_conversion(self,
+                                         task: DocumentTask,
+                                         cache_key: str,
+                                         input_file: Path,
+                                         output_file: Path,
+                                         task_logger) -> Optional[Dict[str, Any]]:
+        """
+        从转换结果缓存恢复输出文件
+
+        Args:
+            task: 任务对象
+            cache_key: 缓存键
+            input_file: 输入文件路径
+            output_file: 输出Markdown路径
+            task_logger: 任务日志记录器
+
+        Returns:
+            与转换结果格式一致的字典，未命中返回None
+        """
+        # JSON文件按输入文件名和输出格式命名，与流水线输出保持一致
+        json_name = middle_json_filename(input_file.stem, resolve_output_options(task.params)['json_format'])
+        cached = await asyncio.to_thread(
+            self.conversion_cache.restore, cache_key, str(output_file), json_name
+        )
+        if cached is None:
+            return None
+
+        task_logger.log_task_progress("conversion_cache_hit", f"Key: {cache_key[:16]}")
+        return {
+            'success': True,
+            'input_path': str(input_file),
+            'output_path': str(output_file),
+            'markdown_files': [cached['markdown_file']],
+            'json_files': [cached['json_file']] if cached['json_file'] else [],
+            'image_files': cached['image_files'],
+            'images_dir': cached['images_dir'],
+            'file_count': 1,
+            'page_count': cached['page_count'],
+            'conversion_type': task.task_type,
+            'cache_hit': True,
+            'cache_key': cache_key
+        }
+
     async def _upload_output_file(self, task: DocumentTask, output_file: Path, task_logger) -> Dict[str, Any]:
         """上传输出文件到S3（支持完整目录上传）"""
         try:
@@ -578,7 +1063,7 @@ class EnhancedTaskProcessor:
             output_dir = output_file.parent
             has_multiple_files = len(list(output_dir.iterdir())) > 1
             has_images_dir = (output_dir / "images").exists()
-            has_json_file = any(f.suffix == '.json' for f in output_dir.iterdir() if f.is_file())
+            has_json_file = any(f.name.endswith(tuple(MIDDLE_JSON_FORMATS.values())) for f in output_dir.iterdir() if f.is_file())
 
             # 如果有多个文件（特别是图片目录或JSON文件），使用完整目录上传
             if has_multiple_files and (has_images_dir or has_json_file):
@@ -648,7 +1133,8 @@ class EnhancedTaskProcessor:
                     original_filename=original_filename,
                     original_bucket=original_bucket,
                     original_folder=original_folder,
-                    task_type=task.task_type
+                    task_type=task.task_type,
+                    progress_callback=self._make_upload_progress_reporter(task_logger)
                 )
 
                 if result['success']:
@@ -659,7 +1145,7 @@ class EnhancedTaskProcessor:
                     s3_urls = [file_info['s3_url'] for file_info in result.get('uploaded_files', [])]
 
                     # 更新任务信息
-                    await self.db_manager.update_task(
+                    await self.task_updates.stage(
                         task.id,
                         output_url=result.get('s3_url'),  # 主要文件URL
                         s3_urls=s3_urls
@@ -719,7 +1205,7 @@ class EnhancedTaskProcessor:
                                                 f"Size: {result['file_size']} bytes, Time: {result['upload_time']:.2f}s")
 
                     # 更新任务信息
-                    await self.db_manager.update_task(
+                    await self.task_updates.stage(
                         task.id,
                         output_url=result.get('http_url'),
                         s3_urls=[result['s3_url']]
@@ -737,32 +1223,127 @@ class EnhancedTaskProcessor:
                 'error_type': type(e).__name__
             }
 
-    async def _handle_task_result(self, task: DocumentTask, result: Dict[str, Any], processing_time: float, task_logger):
-        """处理任务结果"""
+    def _make_upload_progress_reporter(self, task_logger):
+        """
+        创建目录上传的进度回调：逐文件记录调试日志，失败文件和每10%进度记录到任务日志
+
+        Args:
+            task_logger: 任务日志记录器
+
+        Returns:
+            进度回调函数
+        """
+        last_reported = {'percent': -1}
+
+        def report(progress: Dict[str, Any]):
+            if not progress['success']:
+                task_logger.log_s3_operation("upload", progress['s3_key'], False, progress.get('error') or "")
+            else:
+                task_logger.debug(f"Uploaded {progress['relative_path']} ({progress['file_size']} bytes, "
+                                  f"{progress['upload_time']:.2f}s)")
+
+            total_files = progress['total_files'] or 1
+            percent = progress['completed_files'] * 100 // total_files
+            if percent // 10 > last_reported['percent'] // 10 or progress['completed_files'] == progress['total_files']:
+                last_reported['percent'] = percent
+                task_logger.log_task_progress(
+                    "uploading_to_s3",
+                    f"{progress['completed_files']}/{progress['total_files']} files, "
+                    f"{progress['uploaded_bytes']}/{progress['total_bytes']} bytes ({percent}%)"
+                )
+
+        return report
+
+    def _set_task_progress(self, task_id: int, **fields):
+        """
+        更新处理中任务的实时进度
+
+        Args:
+            task_id: 任务ID
+            **fields: 进度字段（stage / pages_processed / page_count / markdown_path / markdown_bytes）
+        """
+        progress = self.task_progress.setdefault(task_id, {})
+        progress.update(fields)
+        progress['updated_at'] = time.time()
+
+    def get_task_progress(self, task_id: int) -> Optional[Dict[str, Any]]:
+        """
+        获取处理中任务的实时进度
+
+        Args:
+            task_id: 任务ID
+
+        Returns:
+            进度字典的副本，任务不在处理中时返回None
+        """
+        progress = self.task_progress.get(task_id)
+        return dict(progress) if progress is not None else None
+
+    def _make_page_progress_reporter(self, task: DocumentTask, task_logger):
+        """
+        创建页面进度回调：实时进度保存在内存中，已处理页数按 page_progress_db_interval 合并写入数据库
+
+        Args:
+            task: 任务对象
+            task_logger: 任务日志记录器
+
+        Returns:
+            异步进度回调函数
+        """
+        last_written = {'time': 0.0, 'pages': None}
+
+        async def report(progress: Dict[str, Any]):
+            self._set_task_progress(task.id, **progress)
+
+            pages = progress['pages_processed']
+            finished = pages >= progress['page_count']
+            now = time.monotonic()
+            if pages != last_written['pages'] and (finished or now - last_written['time'] >= self.page_progress_db_interval):
+                last_written.update(time=now, pages=pages)
+                await self._write_task_update(task.id, {'pages_processed': pages}, wait=False)
+                task_logger.log_task_progress("converting", f"{pages}/{progress['page_count']} pages")
+
+        return report
+
+    async def _handle_task_result(self, task: DocumentTask, result: Dict[str, Any], processing_time: float, task_logger) -> bool:
+        """
+        处理任务结果
+
+        Returns:
+            终态是否已写入数据库
+        """
         try:
             if result['success']:
-                # 成功处理
-                await self.db_manager.update_task(
+                # 成功处理（与缓冲中的上传地址合并为一次写入）
+                persisted = await self._write_final_state(
                     task.id,
+                    "cleanup",
                     status=TaskStatus.completed,
                     completed_at=datetime.now(),
                     task_processing_time=processing_time,
                     result=result
                 )
                 task_logger.log_task_completion(True, processing_time, result.get('upload_result', {}).get('s3_url', ''))
+                return persisted
             else:
                 # 失败处理
-                await self._handle_task_error(task.id, result.get('error', 'Unknown error'))
+                return await self._handle_task_error(task.id, result.get('error', 'Unknown error'))
 
         except Exception as e:
             logger.error(f"Error handling task result for {task.id}: {e}")
+            return False
 
-    async def _handle_task_error(self, task_id: str, error_message: str):
-        """处理任务错误"""
+    async def _handle_task_error(self, task_id: str, error_message: str) -> bool:
+        """
+        处理任务错误
+
+        Returns:
+            重试或失败状态是否已写入数据库
+        """
         try:
             task = await self.db_manager.get_task(task_id)
             if not task:
-                return
+                return False
 
             task_logger = get_task_logger(task_id)
 
@@ -771,8 +1352,9 @@ class EnhancedTaskProcessor:
 
             if retry_count < task.max_retry_count:
                 # 重试
-                await self.db_manager.update_task(
+                persisted = await self._write_final_state(
                     task_id,
+                    "fetch",
                     status=TaskStatus.pending,
                     retry_count=retry_count,
                     last_retry_at=datetime.now(),
@@ -781,12 +1363,14 @@ class EnhancedTaskProcessor:
 
                 task_logger.log_error_with_retry(error_message, retry_count, task.max_retry_count)
 
-                # 重新放入获取队列
-                await self.fetch_queue.put(task_id)
+                # 重新放入获取队列（状态写入成功后才能被重新认领）
+                if persisted:
+                    await self.fetch_queue.put(task_id)
             else:
                 # 标记为最终失败
-                await self.db_manager.update_task(
+                persisted = await self._write_final_state(
                     task_id,
+                    "cleanup",
                     status=TaskStatus.failed,
                     completed_at=datetime.now(),
                     retry_count=retry_count,
@@ -794,27 +1378,91 @@ class EnhancedTaskProcessor:
                 )
 
                 task_logger.log_error_with_retry(error_message, retry_count, task.max_retry_count)
+            return persisted
 
         except Exception as e:
             logger.error(f"Error handling task error for {task_id}: {e}")
+            return False
 
-    async def _update_task_worker(self):
-        """任务状态更新工作协程"""
-        while self.is_running:
-            try:
-                task_id = await asyncio.wait_for(
-                    self.update_queue.get(),
-                    timeout=self.task_check_interval
-                )
+    async def _write_task_update(self, task_id: Any, fields: Dict[str, Any], wait: bool = True) -> bool:
+        """
+        通过写回队列提交任务字段更新
 
-                # 这里可以添加额外的状态更新逻辑
-                # 例如发送通知、更新缓存等
-                logger.debug(f"Updated task {task_id}")
+        Args:
+            task_id: 任务ID
+            fields: 要更新的字段
+            wait: 是否等待所在批次提交完成（状态变更需要等待，进度更新不需要）
+
+        Returns:
+            wait为True时返回是否提交成功，否则返回True
+        """
+        if self.update_worker is None or self.update_worker.done():
+            # 写回协程未运行（启动前或停止后）时直接写入
+            return await self.db_manager.update_task(task_id, **fields)
+
+        future = asyncio.get_running_loop().create_future() if wait else None
+        self.update_queue.put_nowait((task_id, fields, future))
+        if future is None:
+            return True
+        return await future
+
+    async def _update_task_worker(self):
+        """
+        任务字段写回协程
 
+        从 update_queue 收集所有工作协程提交的状态、进度和结果更新，自第一条更新起等待
+        update_flush_interval 或凑满 update_batch_size 条后，按任务合并（同一任务后提交的字段覆盖先提交的），
+        在一个事务中提交，提交完成后才通知等待中的提交方。队列按提交顺序处理，同一任务的更新不会乱序。
+        """
+        loop = asyncio.get_running_loop()
+        while self.is_running or not self.update_queue.empty():
+            try:
+                batch = [await asyncio.wait_for(self.update_queue.get(), timeout=self.task_check_interval)]
             except asyncio.TimeoutError:
                 continue
-            except Exception as e:
-                logger.error(f"Error in update_task_worker: {e}")
+
+            deadline = loop.time() + self.update_flush_interval
+            while len(batch) < self.update_batch_size:
+                if not self.update_queue.empty():
+                    batch.append(self.update_queue.get_nowait())
+                    continue
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.update_queue.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._flush_update_batch(batch)
+
+    async def _flush_update_batch(self, batch: List[tuple]):
+        """
+        合并并提交一批任务字段更新
+
+        Args:
+            batch: (task_id, 字段, 等待提交的future) 列表，按提交顺序排列
+        """
+        merged: Dict[Any, Dict[str, Any]] = {}
+        for task_id, fields, _ in batch:
+            merged.setdefault(task_id, {}).update(fields)
+
+        success = False
+        try:
+            success = await self.db_manager.update_tasks_bulk(merged)
+        except Exception as e:
+            logger.error(f"Error in update_task_worker: {e}")
+        finally:
+            for _, _, future in batch:
+                if future is not None and not future.done():
+                    future.set_result(success)
+
+        self.write_behind_stats["batches"] += 1
+        self.write_behind_stats["updates"] += len(batch)
+        self.write_behind_stats["task_writes"] += len(merged)
+        if not success:
+            self.write_behind_stats["failed_batches"] += 1
+        logger.debug(f"Flushed {len(batch)} task updates for {len(merged)} tasks (success: {success})")
 
     async def _cleanup_worker(self):
         """资源清理工作协程 - 只清理临时文件，保留input和output"""
@@ -910,13 +1558,20 @@ class EnhancedTaskProcessor:
         return {
             **self.stats,
             "is_running": self.is_running,
+            "instance_id": self.instance_id,
+            "leased_tasks": len(self.leased_tasks),
+            "unsaved_task_states": len(self.unsaved_task_states),
             "max_concurrent_tasks": self.max_concurrent_tasks,
+            "inference_executor": self.inference_executor.get_stats(),
+            "inference_batcher": self.inference_batcher.get_stats(),
+            "libreoffice_pool": self.libreoffice_pool.get_stats() if self.libreoffice_pool is not None else None,
+            "conversion_cache": self.conversion_cache.get_stats(),
+            "task_updates": self.task_updates.get_stats() if self.task_updates else None,
+            "write_behind": dict(self.write_behind_stats),
             "queue_sizes": {
                 "fetch_queue": self.fetch_queue.qsize(),
+                "claimed_tasks": self.claimed_tasks,
                 "task_processing_queue": self.task_processing_queue.qsize(),
-                "high_priority_queue": self.high_priority_queue.qsize(),
-                "normal_priority_queue": self.normal_priority_queue.qsize(),
-                "low_priority_queue": self.low_priority_queue.qsize(),
                 "update_queue": self.update_queue.qsize(),
                 "cleanup_queue": self.cleanup_queue.qsize(),
                 "callback_queue": self.callback_queue.qsize()
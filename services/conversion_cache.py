@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+转换结果缓存
+以 输入文件SHA-256 + 任务类型 + MinerU流水线参数 + 引擎版本 为键，
+在本地目录中保存Markdown、JSON和图片；同一文档从不同bucket/路径重复提交时直接恢复结果，
+总大小超过上限时按最近最少使用(LRU)淘汰。
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from utils.logging_utils import configure_logging
+
+logger = configure_logging(name=__name__)
+
+# 可缓存的任务类型（都经过MinerU流水线；office_to_pdf 由常驻LibreOffice完成，重新转换的代价很低）
+CACHEABLE_TASK_TYPES = {'pdf_to_markdown', 'office_to_markdown', 'image_to_markdown'}
+
+_META_FILE = "meta.json"
+
+
+def get_engine_version() -> str:
+    """获取MinerU版本号，作为缓存键的一部分（升级引擎后旧结果自动失效）"""
+    try:
+        from mineru.version import __version__
+        return f"mineru-{__version__}"
+    except Exception:
+        return "mineru-unknown"
+
+
+def compute_file_sha256(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    分块计算文件SHA-256
+
+    Args:
+        file_path: 文件路径
+        chunk_size: 每次读取的字节数
+
+    Returns:
+        十六进制摘要
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _link_or_copy(src: Path, dst: Path):
+    """优先创建硬链接，跨文件系统等情况下退回复制"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def _copy_tree(src: Path, dst: Path):
+    """以硬链接优先的方式复制目录"""
+    shutil.copytree(src, dst, copy_function=lambda s, d: _link_or_copy(Path(s), Path(d)))
+
+
+def _tree_size(path: Path) -> int:
+    """统计目录下所有文件大小"""
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+class ConversionCache:
+    """
+    内容寻址的转换结果缓存
+
+    每个条目是 cache_dir/<key前两位>/<key>/ 目录，包含 result.md、result.json、images/ 和 meta.json。
+    条目先写入临时目录再原子重命名。Markdown和JSON可能被后续转换原地覆盖，始终复制；
+    图片目录在输出时整体替换，优先使用硬链接恢复，避免复制大量图片。
+    所有方法都是同步的，由调用方放到线程中执行。
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_size_mb: Optional[int] = None):
+        """
+        初始化转换结果缓存
+
+        Args:
+            cache_dir: 缓存目录，默认读取 CONVERSION_CACHE_DIR
+            max_size_mb: 缓存总大小上限(MB)，默认读取 CONVERSION_CACHE_MAX_SIZE_MB，0表示关闭缓存
+        """
+        self.cache_dir = Path(cache_dir or os.getenv("CONVERSION_CACHE_DIR", "/app/conversion_cache"))
+        if max_size_mb is None:
+            max_size_mb = int(os.getenv("CONVERSION_CACHE_MAX_SIZE_MB", "10240"))
+        self.max_size = max_size_mb * 1024 * 1024
+        self.engine_version = get_engine_version()
+
+        # key -> 条目大小，按最近使用顺序排列（末尾为最新）
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total_size = 0
+        self._lock = threading.Lock()
+
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "errors": 0
+        }
+
+        if self.enabled:
+            self._load_index()
+            logger.info(f"ConversionCache initialized - Dir: {self.cache_dir}, Max size: {max_size_mb}MB, "
+                        f"Entries: {len(self._entries)}, Engine: {self.engine_version}")
+
+    @property
+    def enabled(self) -> bool:
+        """是否启用缓存"""
+        return self.max_size > 0
+
+    def _load_index(self):
+        """扫描缓存目录重建LRU索引（按meta.json的修改时间排序）"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        found = []
+        for meta_file in self.cache_dir.glob(f"*/*/{_META_FILE}"):
+            try:
+                meta = json.loads(meta_file.read_text(encoding='utf-8'))
+                found.append((meta_file.stat().st_mtime, meta['key'], int(meta['size'])))
+            except Exception as e:
+                logger.warning(f"Removing unreadable cache entry {meta_file.parent}: {e}")
+                shutil.rmtree(meta_file.parent, ignore_errors=True)
+
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._total_size += size
+
+        # 清理上次异常退出时残留的临时目录
+        for tmp_dir in self.cache_dir.glob("*/.tmp-*"):
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        self._evict()
+
+    def _entry_dir(self, key: str) -> Path:
+        """条目目录"""
+        return self.cache_dir / key[:2] / key
+
+    def build_key(self, input_sha256: str, task_type: str, options: Dict[str, Any]) -> str:
+        """
+        生成缓存键
+
+        Args:
+            input_sha256: 输入文件SHA-256，必须由服务端计算（上传暂存时的哈希或对输入文件计算），不能取自任务参数
+            task_type: 任务类型
+            options: 影响输出的流水线参数（lang / parse_method / formula_enable / table_enable）
+
+        Returns:
+            缓存键（十六进制SHA-256）
+        """
+        material = json.dumps({
+            'input': input_sha256,
+            'task_type': task_type,
+            'options': options,
+            'engine': self.engine_version
+        }, sort_keys=True, ensure_ascii=True)
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def restore(self, key: str, output_path: str, json_name: str) -> Optional[Dict[str, Any]]:
+        """
+        命中时把缓存结果恢复到输出目录
+
+        Args:
+            key: 缓存键
+            output_path: 输出Markdown路径
+            json_name: 输出JSON文件名
+
+        Returns:
+            恢复的文件信息（markdown_file / json_file / images_dir / image_files / page_count），未命中返回None
+        """
+        with self._lock:
+            if key not in self._entries:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+
+        entry_dir = self._entry_dir(key)
+        try:
+            meta = json.loads((entry_dir / _META_FILE).read_text(encoding='utf-8'))
+            output_file = Path(output_path)
+            output_file.parent.mkdir(parents=True, exist_ok=True)
+
+            shutil.copy2(entry_dir / "result.md", output_file)
+
+            json_file = None
+            if (entry_dir / "result.json").exists():
+                json_file = output_file.parent / json_name
+                shutil.copy2(entry_dir / "result.json", json_file)
+
+            images_dir = None
+            image_files = []
+            if (entry_dir / "images").exists():
+                images_dir = output_file.parent / "images"
+                if images_dir.exists():
+                    shutil.rmtree(images_dir)
+                _copy_tree(entry_dir / "images", images_dir)
+                image_files = [str(f) for f in images_dir.rglob("*") if f.is_file()]
+
+            # 更新修改时间，使重启后重建的LRU顺序保持一致
+            os.utime(entry_dir / _META_FILE)
+        except Exception as e:
+            # 条目在读取时被淘汰或已损坏，按未命中处理
+            logger.warning(f"Failed to restore cache entry {key}: {e}")
+            with self._lock:
+                self.stats["errors"] += 1
+                self.stats["misses"] += 1
+            self._remove(key)
+            return None
+
+        with self._lock:
+            self.stats["hits"] += 1
+        return {
+            'markdown_file': str(output_file),
+            'json_file': str(json_file) if json_file else None,
+            'images_dir': str(images_dir) if images_dir else None,
+            'image_files': image_files,
+            'page_count': meta.get('page_count')
+        }
+
+    def store(self,
+              key: str,
+              markdown_file: str,
+              json_file: Optional[str] = None,
+              images_dir: Optional[str] = None,
+              page_count: Optional[int] = None) -> bool:
+        """
+        保存转换结果
+
+        Args:
+            key: 缓存键
+            markdown_file: 输出Markdown路径
+            json_file: 输出JSON路径
+            images_dir: 输出图片目录
+            page_count: 页数
+
+        Returns:
+            是否保存成功
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return True
+
+        entry_dir = self._entry_dir(key)
+        tmp_dir = entry_dir.parent / f".tmp-{uuid.uuid4().hex}"
+        try:
+            tmp_dir.mkdir(parents=True)
+            shutil.copy2(markdown_file, tmp_dir / "result.md")
+            if json_file and Path(json_file).exists():
+                shutil.copy2(json_file, tmp_dir / "result.json")
+            if images_dir and Path(images_dir).exists():
+                _copy_tree(Path(images_dir), tmp_dir / "images")
+
+            size = _tree_size(tmp_dir)
+            if size > self.max_size:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                return False
+
+            meta = {
+                'key': key,
+                'size': size,
+                'page_count': page_count,
+                'engine': self.engine_version,
+                'created_at': time.time()
+            }
+            (tmp_dir / _META_FILE).write_text(json.dumps(meta), encoding='utf-8')
+
+            try:
+                os.rename(tmp_dir, entry_dir)
+            except OSError:
+                # 其他任务已写入同一条目
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                return entry_dir.exists()
+        except Exception as e:
+            logger.warning(f"Failed to store cache entry {key}: {e}")
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            with self._lock:
+                self.stats["errors"] += 1
+            return False
+
+        with self._lock:
+            self._entries[key] = size
+            self._total_size += size
+            self.stats["stores"] += 1
+        self._evict()
+        return True
+
+    def _remove(self, key: str):
+        """删除条目"""
+        with self._lock:
+            size = self._entries.pop(key, None)
+            if size is not None:
+                self._total_size -= size
+        shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+
+    def _evict(self):
+        """淘汰最久未使用的条目直到总大小不超过上限"""
+        while True:
+            with self._lock:
+                if self._total_size <= self.max_size or not self._entries:
+                    return
+                key, size = self._entries.popitem(last=False)
+                self._total_size -= size
+                self.stats["evictions"] += 1
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+            logger.debug(f"Evicted cache entry {key} ({size} bytes)")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "total_size": self._total_size,
+                "max_size": self.max_size,
+                "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+                "engine_version": self.engine_version
+            }
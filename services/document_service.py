@@ -7,22 +7,32 @@
 """
 
 import asyncio
+import inspect
 import os
 import subprocess
 import shutil
+import tempfile
 import time
+import uuid
 from pathlib import Path
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Callable, List, Optional
 import logging
-# MinerU Python API
-from pathlib import Path as PathlibPath
-from mineru.cli.common import read_fn
-from mineru.backend.pipeline.pipeline_analyze import doc_analyze as pipeline_doc_analyze
-from mineru.backend.pipeline.pipeline_middle_json_mkcontent import union_make as pipeline_union_make
-from mineru.backend.pipeline.model_json_to_middle_json import result_to_middle_json as pipeline_result_to_middle_json
-from mineru.data.data_reader_writer import FileBasedDataWriter
-from mineru.cli.common import prepare_env
-from mineru.utils.enum_class import MakeMode
+
+from services.inference_executor import InferenceExecutor
+from services.inference_batcher import InferenceBatcher
+from services.libreoffice_pool import LibreOfficePool
+from services.mineru_pipeline import (
+    run_pdf_to_markdown, run_image_to_markdown, resolve_pipeline_options,
+    count_pdf_pages, plan_page_shards, analyze_pdf_shard, merge_shard_middle_json, write_document_outputs,
+    emit_markdown_pages
+)
+from services.pdf_text_extractor import resolve_fast_path, classify_pdf, extract_text_to_markdown
+
+# 中间PDF暂存目录的剩余空间至少为Office文件大小的倍数，否则写入磁盘上的temp目录
+PDF_STAGING_SPACE_FACTOR = 10
+
+# 推理尝试目录中MinerU临时输出的子目录名（不移入输出目录）
+ATTEMPT_TEMP_DIR_NAME = "temp_mineru_output"
 
 
 class DocumentService:
@@ -35,15 +45,27 @@ class DocumentService:
     """
     
     def __init__(self,
-                 libreoffice_path: str = "/usr/bin/libreoffice"):
+                 libreoffice_path: str = "/usr/bin/libreoffice",
+                 inference_executor: Optional[InferenceExecutor] = None,
+                 inference_batcher: Optional[InferenceBatcher] = None,
+                 libreoffice_pool: Optional[LibreOfficePool] = None):
         """
         初始化文档转换服务
 
         Args:
             libreoffice_path: LibreOffice可执行文件路径
+            inference_executor: MinerU推理执行器，为None时按环境变量创建
+            inference_batcher: 跨文档推理微批处理器，为None时PDF逐个提交到推理执行器
+            libreoffice_pool: 常驻LibreOffice进程池，为None时每个文件启动一次LibreOffice
         """
         self.logger = logging.getLogger(__name__)
         self.libreoffice_path = libreoffice_path
+        self.inference_executor = inference_executor or InferenceExecutor()
+        self.inference_batcher = inference_batcher
+        self.libreoffice_pool = libreoffice_pool
+
+        # Office转Markdown中间PDF的暂存目录（默认内存文件系统），为空时写入任务temp目录
+        self.pdf_staging_dir = os.getenv("OFFICE_PDF_STAGING_DIR", "/dev/shm")
         
         # 支持的文件格式
         self.office_formats = {
@@ -144,6 +166,21 @@ class DocumentService:
         
         # 确保输出目录存在
         output_file.parent.mkdir(parents=True, exist_ok=True)
+
+        # 优先使用常驻LibreOffice进程池，避免每个文件的启动开销
+        if self.libreoffice_pool is not None:
+            pool_result = await self.libreoffice_pool.convert_to_pdf(
+                str(input_file), str(output_file), timeout=params.get('timeout')
+            )
+            return {
+                'success': True,
+                'input_path': input_path,
+                'output_path': str(output_file),
+                'file_size': output_file.stat().st_size,
+                'conversion_type': 'office_to_pdf',
+                'libreoffice_instance': pool_result['instance'],
+                'duration': pool_result['duration']
+            }
         
         # 构建LibreOffice命令
         cmd = [
@@ -187,8 +224,9 @@ class DocumentService:
     async def _convert_pdf_to_markdown(self, 
                                      input_path: str, 
                                      output_path: str, 
-                                     params: Dict[str, Any]) -> Dict[str, Any]:
-        """PDF转Markdown"""
+                                     params: Dict[str, Any],
+                                     progress_callback: Optional[Callable[[Dict[str, Any]], Any]] = None) -> Dict[str, Any]:
+        """PDF转Markdown（progress_callback 在每次有新页面写入Markdown后调用）"""
         import shutil  # 在方法开始时导入shutil，避免在finally块中未定义
         
         self.logger.info(f"Converting PDF to Markdown: {input_path} -> {output_path}")
@@ -219,117 +257,84 @@ class DocumentService:
                 'skipped': True
             }
         
+        # 原生数字PDF走文本层快速通道，其余文档走完整流水线
+        routing = None
+        if resolve_fast_path(params):
+            routing = await self._classify_pdf_route(input_file)
+            if routing['route'] == 'text':
+                fast_path_result = await self._convert_pdf_text_layer(input_file, output_file, routing)
+                if fast_path_result is not None:
+                    await self._report_page_progress(progress_callback, output_file,
+                                                     fast_path_result['page_count'], fast_path_result['page_count'])
+                    return fast_path_result
+
         # 使用MinerU 2.0 Python API进行PDF转Markdown
-        temp_output_dir = output_file.parent / "temp_mineru_output"
+        # 本次尝试写入独立目录，成功后再移入输出目录（超时后仍在运行的旧作业不会覆盖重试的输出）
+        attempt_dir = self._create_attempt_dir(output_file)
+        attempt_output_file = attempt_dir / output_file.name
+        temp_output_dir = attempt_dir / ATTEMPT_TEMP_DIR_NAME
         temp_output_dir.mkdir(parents=True, exist_ok=True)
+        pipeline_start = time.monotonic()
 
         try:
             self.logger.info(f"Using MinerU 2.0 Python API to convert PDF: {input_file}")
 
-            # 清理GPU内存
-            self._clear_gpu_memory()
-
-            # 读取PDF文件
-            pdf_bytes = read_fn(str(input_file))
-            pdf_file_name = input_file.stem
+            pipeline_options = resolve_pipeline_options(params)
 
-            self.logger.info(f"PDF file loaded: {pdf_file_name}, size: {len(pdf_bytes)} bytes")
-
-            # 使用pipeline模式进行分析
-            self.logger.info("Starting MinerU pipeline analysis...")
-            infer_results, all_image_lists, all_pdf_docs, lang_list, ocr_enabled_list = pipeline_doc_analyze(
-                [pdf_bytes],
-                ["ch"],  # 中文语言
-                parse_method="auto",
-                formula_enable=True,
-                table_enable=True
-            )
+            # 超过页数阈值的大文档按页段拆分，在推理执行器中并行分析，并逐段写出Markdown和页面进度
+            shard_pages, shard_min_pages = self._resolve_sharding(params)
+            page_count = await asyncio.to_thread(count_pdf_pages, str(input_file)) if shard_pages > 0 else 0
 
-            self.logger.info(f"MinerU analysis completed, processing results...")
-
-            # 处理结果
-            if infer_results and len(infer_results) > 0:
-                model_list = infer_results[0]
-                images_list = all_image_lists[0] if all_image_lists and len(all_image_lists) > 0 else []
-                pdf_doc = all_pdf_docs[0] if all_pdf_docs and len(all_pdf_docs) > 0 else None
-                _lang = lang_list[0] if lang_list and len(lang_list) > 0 else "ch"
-                _ocr_enable = ocr_enabled_list[0] if ocr_enabled_list and len(ocr_enabled_list) > 0 else True
-
-                # 准备输出环境
-                local_image_dir, local_md_dir = prepare_env(str(temp_output_dir), pdf_file_name, "auto")
-                image_writer = FileBasedDataWriter(local_image_dir)
-
-                # 转换为中间JSON格式
-                middle_json = pipeline_result_to_middle_json(
-                    model_list, images_list, pdf_doc, image_writer, _lang, _ocr_enable, True
+            if shard_pages > 0 and page_count > shard_min_pages:
+                pipeline_result = await self._run_sharded_pipeline(
+                    input_file, attempt_output_file, temp_output_dir, pipeline_options, page_count, shard_pages,
+                    progress_callback
+                )
+            elif self.inference_batcher is not None and self.inference_batcher.enabled:
+                # 与同时到达的其他PDF合并为一次批量推理
+                pipeline_result = await self.inference_batcher.submit(
+                    str(input_file),
+                    str(attempt_output_file),
+                    str(temp_output_dir),
+                    pipeline_options
                 )
-
-                # 检查middle_json是否有效
-                if middle_json and "pdf_info" in middle_json:
-                    # 生成Markdown内容
-                    pdf_info = middle_json["pdf_info"]
-                    image_dir = str(os.path.basename(local_image_dir))
-                    md_content_str = pipeline_union_make(pdf_info, MakeMode.MM_MD, image_dir)
-
-                    # 写入输出文件
-                    with open(output_file, 'w', encoding='utf-8') as f:
-                        f.write(md_content_str)
-
-                    self.logger.info(f"MinerU conversion completed successfully: {output_file}")
-
-                    # 保存JSON结构文件
-                    json_output_path = output_file.parent / f"{pdf_file_name}.json"
-                    try:
-                        import json
-                        with open(json_output_path, 'w', encoding='utf-8') as f:
-                            json.dump(middle_json, f, ensure_ascii=False, indent=2)
-                        self.logger.info(f"JSON structure saved: {json_output_path}")
-                    except Exception as json_error:
-                        self.logger.warning(f"Failed to save JSON structure: {json_error}")
-
-                    # 移动图片文件到输出目录
-                    images_output_dir = output_file.parent / "images"
-                    images_moved = []
-                    try:
-                        if Path(local_image_dir).exists():
-                            if images_output_dir.exists():
-                                shutil.rmtree(images_output_dir)
-                            shutil.move(local_image_dir, images_output_dir)
-
-                            # 统计移动的图片文件
-                            for img_file in images_output_dir.rglob("*"):
-                                if img_file.is_file() and img_file.suffix.lower() in ['.png', '.jpg', '.jpeg', '.gif', '.bmp']:
-                                    images_moved.append(str(img_file))
-
-                            self.logger.info(f"Moved {len(images_moved)} images to: {images_output_dir}")
-                    except Exception as move_error:
-                        self.logger.warning(f"Failed to move images: {move_error}")
-
-                    # 清理剩余的临时目录
-                    try:
-                        if temp_output_dir.exists():
-                            shutil.rmtree(temp_output_dir)
-                            self.logger.debug(f"Cleaned up temp directory: {temp_output_dir}")
-                    except Exception as cleanup_error:
-                        self.logger.warning(f"Failed to cleanup temp directory: {cleanup_error}")
-
-                    # 返回成功结果，包含所有生成的文件
-                    return {
-                        'success': True,
-                        'input_path': str(input_file),
-                        'output_path': str(output_file),
-                        'markdown_files': [str(output_file)],
-                        'json_files': [str(json_output_path)] if json_output_path.exists() else [],
-                        'image_files': images_moved,
-                        'images_dir': str(images_output_dir) if images_output_dir.exists() else None,
-                        'file_count': 1,
-                        'conversion_type': 'pdf_to_markdown'
-                    }
-                else:
-                    raise RuntimeError("MinerU middle_json generation failed")
             else:
-                raise RuntimeError("MinerU analysis returned no results")
+                # 在推理执行器中运行MinerU流水线，避免阻塞事件循环
+                pipeline_result = await self.inference_executor.run(
+                    run_pdf_to_markdown,
+                    str(input_file),
+                    str(attempt_output_file),
+                    str(temp_output_dir),
+                    pipeline_options
+                )
 
+            pipeline_result = await asyncio.to_thread(
+                self._promote_attempt_outputs, attempt_dir, output_file, pipeline_result
+            )
+            json_output_path = pipeline_result.get('json_output_path')
+            images_output_dir = pipeline_result.get('images_output_dir')
+            # 未分段时整篇文档一次写出；分段时Markdown已逐段推送，这里把进度指向移入输出目录后的文件
+            pages = pipeline_result.get('page_count') or 0
+            await self._report_page_progress(progress_callback, output_file, pages, pages)
+            if routing is not None:
+                routing['pipeline_time'] = round(time.monotonic() - pipeline_start, 3)
+
+            # 返回成功结果，包含所有生成的文件
+            return {
+                'success': True,
+                'input_path': str(input_file),
+                'output_path': str(output_file),
+                'markdown_files': [str(output_file)],
+                'json_files': [json_output_path] if json_output_path else [],
+                'image_files': pipeline_result.get('images_moved', []),
+                'images_dir': images_output_dir,
+                'file_count': 1,
+                'page_count': pipeline_result.get('page_count'),
+                'shard_count': pipeline_result.get('shard_count', 1),
+                'conversion_route': 'pipeline',
+                'routing': routing,
+                'conversion_type': 'pdf_to_markdown'
+            }
 
         except Exception as e:
             self.logger.error(f"MinerU Python API conversion failed: {e}")
@@ -383,13 +388,247 @@ class DocumentService:
             }
 
         finally:
-            # 清理GPU内存
-            self._clear_gpu_memory()
+            # 清理本次尝试的目录（超时后仍在运行的旧作业可能还在写入，忽略删除错误）
+            if attempt_dir.exists():
+                shutil.rmtree(str(attempt_dir), ignore_errors=True)
+                self.logger.info(f"Cleaned up attempt directory: {attempt_dir}")
+
+    @staticmethod
+    def _resolve_sharding(params: Dict[str, Any]) -> tuple:
+        """
+        解析页段拆分参数
+
+        任务参数 shard_pages 指定时，超过该页数的文档按该页数拆分；否则超过 PDF_SHARD_MIN_PAGES 页的文档
+        按 PDF_SHARD_PAGES 页拆分（PDF_SHARD_PAGES=0 关闭自动拆分）。
+
+        Args:
+            params: 任务参数
+
+        Returns:
+            (每段页数, 触发拆分的最小页数)，每段页数为0表示不拆分
+        """
+        if params.get('shard_pages'):
+            shard_pages = int(params['shard_pages'])
+            return shard_pages, shard_pages
+        shard_pages = int(os.getenv('PDF_SHARD_PAGES', '50'))
+        return shard_pages, max(shard_pages, int(os.getenv('PDF_SHARD_MIN_PAGES', '100')))
 
-            # 清理临时目录
-            if temp_output_dir.exists():
-                shutil.rmtree(str(temp_output_dir))
-                self.logger.info(f"Cleaned up temporary directory: {temp_output_dir}")
+    def _create_attempt_dir(self, output_file: Path) -> Path:
+        """
+        为一次推理尝试创建独立的输出目录
+
+        线程/进程模式下推理作业超时后不会被中断，仍会继续写文件。每次尝试写入自己的目录，
+        成功后才移入输出目录，遗留作业只会写入已放弃的目录。目录与输出目录同级（同一文件系统，
+        可以直接重命名），不会随输出目录一起上传。
+
+        Args:
+            output_file: 最终输出Markdown路径
+
+        Returns:
+            尝试目录
+        """
+        output_dir = output_file.parent
+        attempt_dir = output_dir.parent / f".{output_dir.name}.attempt-{uuid.uuid4().hex[:12]}"
+        attempt_dir.mkdir(parents=True)
+        return attempt_dir
+
+    def _promote_attempt_outputs(self,
+                                 attempt_dir: Path,
+                                 output_file: Path,
+                                 pipeline_result: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        把成功尝试的输出（Markdown、中间JSON、images目录）移入输出目录
+
+        Args:
+            attempt_dir: 尝试目录
+            output_file: 最终输出Markdown路径
+            pipeline_result: 流水线结果，其中的路径指向尝试目录
+
+        Returns:
+            路径改为输出目录后的流水线结果
+        """
+        output_dir = output_file.parent
+        output_dir.mkdir(parents=True, exist_ok=True)
+        for item in attempt_dir.iterdir():
+            if item.name == ATTEMPT_TEMP_DIR_NAME:
+                continue
+            target = output_dir / item.name
+            if item.is_dir() and target.exists():
+                shutil.rmtree(target)
+            os.replace(item, target)
+
+        def relocate(path):
+            if path and Path(path).is_relative_to(attempt_dir):
+                return str(output_dir / Path(path).relative_to(attempt_dir))
+            return path
+
+        result = dict(pipeline_result)
+        for key in ('json_output_path', 'images_output_dir'):
+            result[key] = relocate(result.get(key))
+        result['images_moved'] = [relocate(path) for path in result.get('images_moved', [])]
+        return result
+
+    async def _classify_pdf_route(self, input_file: Path) -> Dict[str, Any]:
+        """
+        预分类PDF：判断走文本层快速通道还是完整MinerU流水线
+
+        Args:
+            input_file: 输入PDF路径
+
+        Returns:
+            分类结果（见 classify_pdf），附带 classify_time；分类失败时路由到完整流水线
+        """
+        start_time = time.monotonic()
+        try:
+            routing = await asyncio.to_thread(classify_pdf, str(input_file))
+        except Exception as e:
+            self.logger.warning(f"PDF pre-classification failed for {input_file.name}: {e}")
+            routing = {'route': 'pipeline', 'reason': f"classification failed: {e}"}
+        routing['classify_time'] = round(time.monotonic() - start_time, 3)
+        self.logger.info(f"PDF route for {input_file.name}: {routing['route']} ({routing['reason']})")
+        return routing
+
+    async def _convert_pdf_text_layer(self,
+                                      input_file: Path,
+                                      output_file: Path,
+                                      routing: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        从文本层直接生成Markdown（不加载MinerU模型）
+
+        Args:
+            input_file: 输入PDF路径
+            output_file: 输出Markdown路径
+            routing: 预分类结果，会补充 text_layer_time
+
+        Returns:
+            转换结果字典；提取失败时返回None，由调用方退回完整流水线
+        """
+        start_time = time.monotonic()
+        try:
+            extract_result = await asyncio.to_thread(extract_text_to_markdown, str(input_file), str(output_file))
+        except Exception as e:
+            self.logger.warning(f"Text layer extraction failed for {input_file.name}, falling back to MinerU: {e}")
+            routing['route'] = 'pipeline'
+            routing['reason'] = f"text layer extraction failed: {e}"
+            return None
+        routing['text_layer_time'] = round(time.monotonic() - start_time, 3)
+
+        return {
+            'success': True,
+            'input_path': str(input_file),
+            'output_path': str(output_file),
+            'markdown_files': [str(output_file)],
+            'json_files': [],
+            'image_files': [],
+            'images_dir': None,
+            'file_count': 1,
+            'page_count': extract_result['page_count'],
+            'char_count': extract_result['char_count'],
+            'conversion_route': 'text_layer',
+            'routing': routing,
+            'conversion_type': 'pdf_to_markdown'
+        }
+
+    async def _run_sharded_pipeline(self,
+                                    input_file: Path,
+                                    output_file: Path,
+                                    temp_output_dir: Path,
+                                    pipeline_options: Dict[str, Any],
+                                    page_count: int,
+                                    shard_pages: int,
+                                    progress_callback: Optional[Callable[[Dict[str, Any]], Any]] = None) -> Dict[str, Any]:
+        """
+        按页段并行分析PDF，页段完成后按页序逐段写出Markdown，最后合并输出JSON
+
+        Args:
+            input_file: 输入PDF路径
+            output_file: 输出Markdown路径
+            temp_output_dir: MinerU临时输出目录
+            pipeline_options: 流水线参数
+            page_count: 总页数
+            shard_pages: 每个页段的页数
+            progress_callback: 每写出一段页面后调用
+
+        Returns:
+            结果字典，格式同 run_pdf_to_markdown，并附带 shard_count
+        """
+        shards = plan_page_shards(page_count, shard_pages)
+        # 所有页段共用一个图片目录，合并后的中间JSON直接引用其中的图片
+        local_image_dir = temp_output_dir / input_file.stem / "images"
+        local_image_dir.mkdir(parents=True, exist_ok=True)
+
+        self.logger.info(f"Sharding {input_file.name} ({page_count} pages) into {len(shards)} shards of {shard_pages} pages")
+
+        async def run_shard(index: int, start_page: int, end_page: int):
+            return index, await self.inference_executor.run(
+                analyze_pdf_shard, str(input_file), start_page, end_page, str(local_image_dir), pipeline_options,
+                wait_on_cancel=True
+            )
+
+        pending = [asyncio.ensure_future(run_shard(index, start_page, end_page))
+                   for index, (start_page, end_page) in enumerate(shards)]
+        shard_results: List[Optional[Dict[str, Any]]] = [None] * len(shards)
+        next_index = 0
+        try:
+            for finished in asyncio.as_completed(pending):
+                index, shard_json = await finished
+                shard_results[index] = shard_json
+
+                # 前面的页段都已完成时按页序写出，后面页段完成前客户端即可读取
+                while next_index < len(shards) and shard_results[next_index] is not None:
+                    emitted = await asyncio.to_thread(
+                        emit_markdown_pages, shard_results[next_index], str(output_file), str(local_image_dir),
+                        next_index == 0
+                    )
+                    await self._report_page_progress(progress_callback, output_file, shards[next_index][1] + 1,
+                                                     page_count, emitted['markdown_bytes'])
+                    next_index += 1
+        except BaseException:
+            # 任一页段失败时取消其余页段，并等待已开始的页段作业结束，之后调用方才能清理尝试目录
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            raise
+
+        middle_json = merge_shard_middle_json(shard_results)
+        pipeline_result = await asyncio.to_thread(
+            write_document_outputs, middle_json, input_file.stem, str(output_file), str(local_image_dir),
+            pipeline_options, True
+        )
+        pipeline_result['shard_count'] = len(shards)
+        return pipeline_result
+
+    async def _report_page_progress(self,
+                                    progress_callback: Optional[Callable[[Dict[str, Any]], Any]],
+                                    output_file: Path,
+                                    pages_processed: int,
+                                    page_count: int,
+                                    markdown_bytes: Optional[int] = None):
+        """
+        调用页面进度回调（同步或异步函数均可），回调异常只记录日志
+
+        Args:
+            progress_callback: 进度回调
+            output_file: 输出Markdown路径
+            pages_processed: 已写入Markdown的页数
+            page_count: 总页数
+            markdown_bytes: Markdown中已完整写出的字节数，默认取文件大小
+        """
+        if progress_callback is None:
+            return
+        try:
+            if markdown_bytes is None:
+                markdown_bytes = output_file.stat().st_size if output_file.exists() else 0
+            callback_result = progress_callback({
+                'pages_processed': pages_processed,
+                'page_count': page_count,
+                'markdown_path': str(output_file),
+                'markdown_bytes': markdown_bytes
+            })
+            if inspect.isawaitable(callback_result):
+                await callback_result
+        except Exception as e:
+            self.logger.warning(f"Page progress callback failed: {e}")
 
     def _analyze_mineru_python_error(self, error_str: str, traceback_str: str) -> str:
         """分析MinerU Python API错误信息"""
@@ -592,11 +831,14 @@ class DocumentService:
         """Office文档转PDF公共接口"""
         return await self._convert_office_to_pdf(input_path, output_path, params or {})
     
-    async def convert_pdf_to_markdown(self, input_path: str, output_path: str, params: Dict[str, Any] = None) -> Dict[str, Any]:
+    async def convert_pdf_to_markdown(self, input_path: str, output_path: str, params: Dict[str, Any] = None,
+                                      progress_callback: Optional[Callable[[Dict[str, Any]], Any]] = None) -> Dict[str, Any]:
         """PDF转Markdown公共接口"""
-        return await self._convert_pdf_to_markdown(input_path, output_path, params or {})
+        return await self._convert_pdf_to_markdown(input_path, output_path, params or {}, progress_callback)
     
-    async def convert_office_to_markdown(self, input_path: str, output_path: str, params: Dict[str, Any] = None) -> Dict[str, Any]:
+    async def convert_office_to_markdown(self, input_path: str, output_path: str, params: Dict[str, Any] = None,
+                                         progress_callback: Optional[Callable[[Dict[str, Any]], Any]] = None,
+                                         temp_dir: Optional[str] = None) -> Dict[str, Any]:
         """Office文档直接转Markdown公共接口
         
         将Office文档先转换为PDF，再将PDF转换为Markdown，对用户透明化中间PDF过程
@@ -604,7 +846,9 @@ class DocumentService:
         Args:
             input_path: 输入Office文档路径
             output_path: 输出Markdown文件路径
-            params: 转换参数
+            params: 转换参数，keep_pdf为True时把中间PDF保留在输出目录中随结果一起上传
+            progress_callback: 页面写入Markdown后的进度回调
+            temp_dir: 内存暂存目录不可用时存放中间PDF的磁盘目录（任务temp目录），默认使用系统临时目录
             
         Returns:
             转换结果字典
@@ -612,33 +856,10 @@ class DocumentService:
         params = params or {}
         
         try:
-            # 创建临时PDF文件路径
-            input_file = Path(input_path)
-            temp_dir = Path(output_path).parent / "temp"
-            temp_dir.mkdir(parents=True, exist_ok=True)
-            temp_pdf_path = str(temp_dir / f"{input_file.stem}.pdf")
-            
-            # 第一步：Office转PDF
-            pdf_result = await self._convert_office_to_pdf(input_path, temp_pdf_path, params)
-            if not pdf_result['success']:
-                raise RuntimeError(f"Office to PDF conversion failed: {pdf_result.get('error', 'Unknown error')}")
-            
-            # 第二步：PDF转Markdown
-            md_result = await self._convert_pdf_to_markdown(temp_pdf_path, output_path, params)
-            if not md_result or not md_result.get('success', False):
-                error_msg = md_result.get('error', 'Unknown error') if md_result else 'No result returned'
-                raise RuntimeError(f"PDF to Markdown conversion failed: {error_msg}")
-
-            # 合并结果
-            return {
-                'success': True,
-                'input_path': input_path,
-                'output_path': output_path,
-                'temp_pdf_path': temp_pdf_path,
-                'markdown_files': md_result.get('markdown_files', [output_path]) if md_result else [output_path],
-                'file_count': 1,
-                'conversion_type': 'office_to_markdown'
-            }
+            result = await self._convert_office_to_markdown(input_path, output_path, params, progress_callback, temp_dir)
+            if not result.get('success', False):
+                raise RuntimeError(f"PDF to Markdown conversion failed: {result.get('error', 'Unknown error')}")
+            return result
             
         except Exception as e:
             self.logger.error(f"Office to Markdown conversion failed: {e}")
@@ -802,26 +1023,100 @@ class DocumentService:
     async def _convert_office_to_markdown(self,
                                         input_path: str,
                                         output_path: str,
-                                        params: Dict[str, Any]) -> Dict[str, Any]:
+                                        params: Dict[str, Any],
+                                        progress_callback: Optional[Callable[[Dict[str, Any]], Any]] = None,
+                                        temp_dir: Optional[str] = None) -> Dict[str, Any]:
         """Office文档直接转Markdown"""
         self.logger.info(f"Converting Office document to Markdown: {input_path} -> {output_path}")
 
-        # 先转换为PDF
-        temp_pdf_dir = Path(output_path).parent / "temp"
-        temp_pdf_dir.mkdir(exist_ok=True)
-
         input_file = Path(input_path)
-        temp_pdf_path = temp_pdf_dir / f"{input_file.stem}.pdf"
+        output_file = Path(output_path)
+        keep_pdf = bool(params.get('keep_pdf', False))
+        kept_pdf_path = output_file.parent / f"{input_file.stem}.pdf"
 
-        # Office -> PDF
-        pdf_result = await self._convert_office_to_pdf(input_path, str(temp_pdf_path), params)
-        if not pdf_result.get('success', False):
-            return pdf_result
+        # 输出已存在且不强制重新处理时，连LibreOffice转换也跳过
+        if (output_file.exists() and not params.get('force_reprocess', False)
+                and (not keep_pdf or kept_pdf_path.exists())):
+            self.logger.info(f"Output file already exists, skipping: {output_path}")
+            return {
+                'success': True,
+                'input_path': input_path,
+                'output_path': output_path,
+                'markdown_files': [output_path],
+                'pdf_path': str(kept_pdf_path) if keep_pdf else None,
+                'file_count': 1,
+                'conversion_type': 'office_to_markdown',
+                'skipped': True
+            }
+
+        pdf_path = self._get_pdf_staging_path(input_file, temp_dir)
+        pdf_path.parent.mkdir(parents=True, exist_ok=True)
+
+        try:
+            # Office -> PDF
+            pdf_result = await self._convert_office_to_pdf(input_path, str(pdf_path), params)
+            if not pdf_result.get('success', False):
+                return pdf_result
 
-        # PDF -> Markdown
-        markdown_result = await self._convert_pdf_to_markdown(str(temp_pdf_path), output_path, params)
+            # PDF -> Markdown，MinerU直接从暂存位置读取中间PDF
+            markdown_result = await self._convert_pdf_to_markdown(str(pdf_path), output_path, params, progress_callback)
+            if not markdown_result.get('success', False):
+                return markdown_result
 
-        return markdown_result
+            if keep_pdf:
+                # 作为正式产物放入输出目录，随转换结果一起上传
+                await asyncio.to_thread(shutil.move, str(pdf_path), str(kept_pdf_path))
+
+            return {
+                'success': True,
+                'input_path': input_path,
+                'output_path': output_path,
+                'markdown_files': markdown_result.get('markdown_files', [output_path]),
+                'json_files': markdown_result.get('json_files', []),
+                'image_files': markdown_result.get('image_files', []),
+                'images_dir': markdown_result.get('images_dir'),
+                'pdf_path': str(kept_pdf_path) if keep_pdf else None,
+                'pdf_size': pdf_result.get('file_size'),
+                'page_count': markdown_result.get('page_count'),
+                'shard_count': markdown_result.get('shard_count', 1),
+                'conversion_route': markdown_result.get('conversion_route'),
+                'routing': markdown_result.get('routing'),
+                'file_count': 1,
+                'conversion_type': 'office_to_markdown'
+            }
+
+        finally:
+            # 中间PDF连同所在的单次转换目录用完即删，不再留给定期清理
+            shutil.rmtree(pdf_path.parent, ignore_errors=True)
+
+    def _get_pdf_staging_path(self, input_file: Path, temp_dir: Optional[str] = None) -> Path:
+        """
+        选择Office转Markdown中间PDF的存放位置
+
+        优先放在内存文件系统中：LibreOffice写出和MinerU读入都不落盘，推理在子进程中执行时也只需传递路径。
+        暂存目录不可用或剩余空间不足时退回任务temp目录（未指定时为系统临时目录），不写入会被上传的输出目录。
+        每次转换使用独立的子目录，文件名保持原始文件名，输出的JSON和图片按它命名。
+
+        Args:
+            input_file: 输入Office文件路径
+            temp_dir: 磁盘上的临时目录
+
+        Returns:
+            中间PDF路径
+        """
+        if self.pdf_staging_dir:
+            staging_dir = Path(self.pdf_staging_dir)
+            try:
+                if staging_dir.is_dir() and os.access(staging_dir, os.W_OK):
+                    required = input_file.stat().st_size * PDF_STAGING_SPACE_FACTOR
+                    if shutil.disk_usage(staging_dir).free >= required:
+                        return staging_dir / f"office-{uuid.uuid4().hex}" / f"{input_file.stem}.pdf"
+                    self.logger.info(f"Not enough space in {staging_dir} for intermediate PDF, using disk")
+            except OSError as e:
+                self.logger.warning(f"PDF staging directory {staging_dir} unavailable: {e}")
+
+        fallback_dir = Path(temp_dir) if temp_dir else Path(tempfile.gettempdir())
+        return fallback_dir / f"office-{uuid.uuid4().hex}" / f"{input_file.stem}.pdf"
 
     async def _convert_image_to_markdown(self,
                                        input_path: str,
@@ -844,57 +1139,40 @@ class DocumentService:
         # 确保输出目录存在
         output_file.parent.mkdir(parents=True, exist_ok=True)
 
-        try:
-            # 使用MinerU命令行工具处理图片
-            temp_output_dir = output_file.parent / "mineru_temp"
-            temp_output_dir.mkdir(exist_ok=True)
-
-            # 清理GPU内存
-            self._clear_gpu_memory()
+        # 与PDF相同，每次尝试写入独立目录，成功后再移入输出目录
+        attempt_dir = self._create_attempt_dir(output_file)
+        temp_output_dir = attempt_dir / ATTEMPT_TEMP_DIR_NAME
+        temp_output_dir.mkdir()
 
+        try:
             self.logger.info(f"Image file loaded: {input_file.name}, size: {input_file.stat().st_size} bytes")
             self.logger.info("Starting MinerU OCR analysis for image...")
 
-            # 构建MinerU命令
-            cmd = [
-                "mineru",
-                "-p", str(input_file),
-                "-o", str(temp_output_dir)
-            ]
-
-            # 执行MinerU命令
-            import subprocess
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
-
-            if result.returncode != 0:
-                raise RuntimeError(f"MinerU command failed: {result.stderr}")
-
-            self.logger.info("MinerU OCR analysis completed, processing results...")
-
-            # 查找生成的markdown文件
-            markdown_files = list(temp_output_dir.rglob("*.md"))
-            if not markdown_files:
-                raise RuntimeError("MinerU OCR conversion failed: No markdown file generated")
-
-            # 复制第一个markdown文件到目标位置
-            source_md = markdown_files[0]
-            import shutil
-            shutil.copy2(source_md, output_file)
-
-            # 清理临时目录
-            shutil.rmtree(temp_output_dir, ignore_errors=True)
+            # 与PDF共用进程内流水线（warm模式下复用已加载的模型），不再调用mineru命令行
+            pipeline_result = await self.inference_executor.run(
+                run_image_to_markdown,
+                str(input_file),
+                str(attempt_dir / output_file.name),
+                str(temp_output_dir),
+                resolve_pipeline_options(params)
+            )
+            pipeline_result = await asyncio.to_thread(
+                self._promote_attempt_outputs, attempt_dir, output_file, pipeline_result
+            )
 
             output_size = output_file.stat().st_size
             self.logger.info(f"MinerU OCR conversion completed successfully: {output_file}")
 
-            # 清理GPU内存
-            self._clear_gpu_memory()
+            json_output_path = pipeline_result.get('json_output_path')
 
             return {
                 'success': True,
                 'input_path': input_path,
                 'output_path': output_path,
                 'markdown_files': [output_path],
+                'json_files': [json_output_path] if json_output_path else [],
+                'image_files': pipeline_result.get('images_moved', []),
+                'images_dir': pipeline_result.get('images_output_dir'),
                 'file_count': 1,
                 'conversion_type': 'image_to_markdown',
                 'output_size': output_size
@@ -902,9 +1180,10 @@ class DocumentService:
 
         except Exception as e:
             self.logger.error(f"Image to Markdown conversion failed: {e}")
-            # 清理GPU内存
-            self._clear_gpu_memory()
             raise
+        finally:
+            # 清理本次尝试的目录
+            shutil.rmtree(attempt_dir, ignore_errors=True)
 
     async def _batch_convert_image_to_markdown(self,
                                              input_path: str,
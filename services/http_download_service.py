@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+HTTP(S)下载服务
+为 file_url 输入提供共享连接池的异步下载：大块流式写入磁盘，
+下载中断后重试时通过Range从 .part 文件续传，并限制最大文件大小和超时时间。
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import aiofiles
+import httpx
+
+from utils.logging_utils import configure_logging
+
+logger = configure_logging(name=__name__)
+
+
+class HttpDownloadError(Exception):
+    """HTTP下载失败"""
+    pass
+
+
+class HttpDownloadTooLargeError(HttpDownloadError):
+    """文件超过大小上限"""
+    pass
+
+
+class HttpDownloadService:
+    """
+    HTTP(S)下载服务
+
+    所有下载共享一个 httpx.AsyncClient（连接池 + keep-alive）。
+    下载先写入 <目标文件>.part，并在 <目标文件>.part.json 中记录服务器返回的 ETag / Last-Modified；
+    重试时以 Range + If-Range 续传，服务器不支持范围请求或文件已变化时从头下载。
+    """
+
+    def __init__(self,
+                 max_connections: Optional[int] = None,
+                 chunk_size: Optional[int] = None,
+                 max_size: Optional[int] = None,
+                 connect_timeout: Optional[float] = None,
+                 read_timeout: Optional[float] = None):
+        """
+        初始化HTTP下载服务
+
+        Args:
+            max_connections: 连接池最大连接数，默认读取 HTTP_DOWNLOAD_MAX_CONNECTIONS
+            chunk_size: 写盘块大小(字节)，默认读取 HTTP_DOWNLOAD_CHUNK_SIZE_KB
+            max_size: 最大文件大小(字节)，默认读取 HTTP_DOWNLOAD_MAX_SIZE_MB
+            connect_timeout: 连接超时(秒)，默认读取 HTTP_DOWNLOAD_CONNECT_TIMEOUT
+            read_timeout: 读取超时(秒)，默认读取 HTTP_DOWNLOAD_READ_TIMEOUT
+        """
+        self.max_connections = int(max_connections or os.getenv("HTTP_DOWNLOAD_MAX_CONNECTIONS", "20"))
+        self.chunk_size = int(chunk_size or int(os.getenv("HTTP_DOWNLOAD_CHUNK_SIZE_KB", "1024")) * 1024)
+        self.max_size = int(max_size or int(os.getenv("HTTP_DOWNLOAD_MAX_SIZE_MB", "1024")) * 1024 * 1024)
+        self.connect_timeout = float(connect_timeout or os.getenv("HTTP_DOWNLOAD_CONNECT_TIMEOUT", "10"))
+        self.read_timeout = float(read_timeout or os.getenv("HTTP_DOWNLOAD_READ_TIMEOUT", "60"))
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """获取（必要时创建）共享的异步HTTP客户端"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                follow_redirects=True,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                ),
+                timeout=httpx.Timeout(
+                    connect=self.connect_timeout,
+                    read=self.read_timeout,
+                    write=self.read_timeout,
+                    pool=self.connect_timeout
+                )
+            )
+        return self._client
+
+    async def close(self):
+        """关闭HTTP客户端"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def download_file(self, url: str, local_file_path: str) -> Dict[str, Any]:
+        """
+        下载URL到本地文件（支持断点续传）
+
+        Args:
+            url: HTTP(S) 地址
+            local_file_path: 本地文件保存路径
+
+        Returns:
+            下载结果字典，包含 file_size / download_time / throughput / resumed_bytes / content_type
+        """
+        start_time = time.monotonic()
+        local_path = Path(local_file_path)
+        part_path = local_path.with_name(local_path.name + ".part")
+        meta_path = local_path.with_name(local_path.name + ".part.json")
+
+        try:
+            if not url.lower().startswith(("http://", "https://")):
+                raise HttpDownloadError(f"Unsupported URL scheme: {url}")
+
+            local_path.parent.mkdir(parents=True, exist_ok=True)
+
+            # 读取上次中断时的进度和校验信息
+            resume_from = part_path.stat().st_size if part_path.exists() else 0
+            validator = None
+            if resume_from and meta_path.exists():
+                try:
+                    validator = json.loads(meta_path.read_text(encoding='utf-8')).get('validator')
+                except Exception:
+                    validator = None
+            if resume_from and not validator:
+                # 无法确认服务器文件未变化，不续传
+                resume_from = 0
+
+            # 按原始字节下载，保证写入大小与Content-Length/Range一致
+            headers = {'Accept-Encoding': 'identity'}
+            if resume_from:
+                headers['Range'] = f"bytes={resume_from}-"
+                headers['If-Range'] = validator
+
+            logger.info(f"Starting HTTP download from {url}" + (f" (resume at {resume_from} bytes)" if resume_from else ""))
+
+            client = self._get_client()
+            async with client.stream("GET", url, headers=headers) as response:
+                if response.status_code == 416 and resume_from:
+                    # .part 已经是完整文件
+                    total_size = self._parse_total_size(response.headers.get('content-range'))
+                    if total_size != resume_from:
+                        part_path.unlink()
+                        raise HttpDownloadError(f"Range not satisfiable at {resume_from} bytes (total: {total_size})")
+                    content_type = response.headers.get('content-type')
+                    written = 0
+                elif response.status_code in (200, 206):
+                    if response.status_code == 200:
+                        # 服务器忽略了Range或文件已变化，从头下载
+                        resume_from = 0
+                        total_size = self._parse_int(response.headers.get('content-length'))
+                    else:
+                        total_size = self._parse_total_size(response.headers.get('content-range'))
+
+                    if total_size is not None and total_size > self.max_size:
+                        raise HttpDownloadTooLargeError(f"File too large: {total_size} bytes (limit: {self.max_size})")
+
+                    content_type = response.headers.get('content-type')
+                    new_validator = response.headers.get('etag') or response.headers.get('last-modified')
+                    if new_validator:
+                        meta_path.write_text(json.dumps({'url': url, 'validator': new_validator}), encoding='utf-8')
+                    elif meta_path.exists():
+                        meta_path.unlink()
+
+                    written = await self._write_stream(response, part_path, resume_from)
+
+                    if total_size is not None and resume_from + written != total_size:
+                        raise HttpDownloadError(
+                            f"Incomplete download: got {resume_from + written} of {total_size} bytes"
+                        )
+                else:
+                    raise HttpDownloadError(f"HTTP {response.status_code} from {url}")
+
+            os.replace(part_path, local_path)
+            if meta_path.exists():
+                meta_path.unlink()
+
+            file_size = local_path.stat().st_size
+            download_time = time.monotonic() - start_time
+            throughput = written / download_time if download_time > 0 else 0.0
+
+            logger.info(f"Successfully downloaded {file_size} bytes in {download_time:.2f}s "
+                        f"({throughput / 1024 / 1024:.2f} MB/s, resumed: {resume_from} bytes)")
+
+            return {
+                'success': True,
+                'local_path': str(local_path),
+                'url': url,
+                'file_size': file_size,
+                'downloaded_bytes': written,
+                'resumed_bytes': resume_from,
+                'download_time': download_time,
+                'throughput': throughput,
+                'content_type': content_type
+            }
+
+        except HttpDownloadError as e:
+            if isinstance(e, HttpDownloadTooLargeError):
+                # 超限文件不再续传
+                for path in (part_path, meta_path):
+                    if path.exists():
+                        path.unlink()
+            logger.error(f"HTTP download failed: {e}")
+            return {
+                'success': False,
+                'error': str(e),
+                'error_type': 'HttpDownloadError'
+            }
+        except httpx.HTTPError as e:
+            # 网络错误时保留 .part 文件，下次重试续传
+            logger.error(f"HTTP error during download from {url}: {e}")
+            return {
+                'success': False,
+                'error': f"HTTP error: {e}",
+                'error_type': type(e).__name__
+            }
+        except Exception as e:
+            logger.error(f"Unexpected error during HTTP download: {e}")
+            return {
+                'success': False,
+                'error': str(e),
+                'error_type': type(e).__name__
+            }
+
+    async def _write_stream(self, response: httpx.Response, part_path: Path, resume_from: int) -> int:
+        """
+        把响应体按块写入 .part 文件
+
+        Args:
+            response: 流式响应
+            part_path: .part 文件路径
+            resume_from: 续传起点，0表示覆盖写入
+
+        Returns:
+            本次写入的字节数
+        """
+        written = 0
+        mode = 'ab' if resume_from else 'wb'
+        async with aiofiles.open(part_path, mode) as f:
+            async for chunk in response.aiter_bytes(self.chunk_size):
+                written += len(chunk)
+                if resume_from + written > self.max_size:
+                    raise HttpDownloadTooLargeError(f"File exceeds size limit of {self.max_size} bytes")
+                await f.write(chunk)
+        return written
+
+    @staticmethod
+    def _parse_int(value: Optional[str]) -> Optional[int]:
+        """解析整数响应头"""
+        try:
+            return int(value) if value is not None else None
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _parse_total_size(content_range: Optional[str]) -> Optional[int]:
+        """从 Content-Range（bytes a-b/total 或 bytes */total）中解析总大小"""
+        if not content_range or '/' not in content_range:
+            return None
+        total = content_range.rsplit('/', 1)[1].strip()
+        return int(total) if total.isdigit() else None
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+跨文档推理微批处理
+将短时间内到达、流水线参数相同的多个PDF转换请求合并为一次 doc_analyze 调用，
+批量执行版面/OCR推理后再把结果分发回各自的任务，提高每秒处理页数。
+"""
+
+import asyncio
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.logging_utils import configure_logging
+from services.inference_executor import InferenceExecutor, InferenceTimeoutError
+from services.mineru_pipeline import run_pdf_batch_to_markdown, count_pdf_pages, resolve_output_options
+
+logger = configure_logging(name=__name__)
+
+
+class _PendingBatch:
+    """正在收集中的批次"""
+
+    def __init__(self):
+        self.items: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+        self.pages = 0
+        self.bytes = 0
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class InferenceBatcher:
+    """
+    推理微批处理器
+
+    同一批次内的文档必须共享 parse_method / formula_enable / table_enable，
+    lang 可以按文档不同。批次在达到文档数、页数或字节预算，或等待超过 max_wait_ms 时提交。
+    """
+
+    def __init__(self,
+                 inference_executor: InferenceExecutor,
+                 max_batch_docs: Optional[int] = None,
+                 max_batch_pages: Optional[int] = None,
+                 max_batch_bytes: Optional[int] = None,
+                 max_wait_ms: Optional[int] = None):
+        """
+        初始化微批处理器
+
+        Args:
+            inference_executor: 执行批次的推理执行器
+            max_batch_docs: 单批最大文档数，默认读取 INFERENCE_BATCH_MAX_DOCS，1表示关闭批处理
+            max_batch_pages: 单批最大页数，默认读取 INFERENCE_BATCH_MAX_PAGES
+            max_batch_bytes: 单批最大字节数，默认读取 INFERENCE_BATCH_MAX_BYTES
+            max_wait_ms: 批次最长等待时间(毫秒)，默认读取 INFERENCE_BATCH_MAX_WAIT_MS
+        """
+        self.inference_executor = inference_executor
+        self.max_batch_docs = max(1, int(max_batch_docs or os.getenv("INFERENCE_BATCH_MAX_DOCS", "4")))
+        self.max_batch_pages = int(max_batch_pages or os.getenv("INFERENCE_BATCH_MAX_PAGES", "200"))
+        self.max_batch_bytes = int(max_batch_bytes or os.getenv("INFERENCE_BATCH_MAX_BYTES", str(100 * 1024 * 1024)))
+        self.max_wait = int(max_wait_ms or os.getenv("INFERENCE_BATCH_MAX_WAIT_MS", "200")) / 1000
+
+        self._groups: Dict[Tuple, _PendingBatch] = {}
+        self._running: set = set()
+
+        self.stats = {
+            "batches": 0,
+            "batched_documents": 0,
+            "max_batch_size": 0,
+            "flush_by_size": 0,
+            "flush_by_budget": 0,
+            "flush_by_timeout": 0
+        }
+
+        logger.info(f"InferenceBatcher initialized - Docs: {self.max_batch_docs}, Pages: {self.max_batch_pages}, "
+                    f"Bytes: {self.max_batch_bytes}, Wait: {self.max_wait * 1000:.0f}ms")
+
+    @property
+    def enabled(self) -> bool:
+        """是否启用批处理"""
+        return self.max_batch_docs > 1
+
+    async def submit(self,
+                     input_path: str,
+                     output_path: str,
+                     temp_output_dir: str,
+                     options: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        提交单个PDF，等待所在批次完成后返回该文档的结果
+
+        Args:
+            input_path: 输入PDF路径
+            output_path: 输出Markdown路径
+            temp_output_dir: MinerU临时输出目录
+            options: 流水线参数（见 resolve_pipeline_options）
+
+        Returns:
+            结果字典，格式同 run_pdf_to_markdown
+        """
+        loop = asyncio.get_running_loop()
+        pages = await asyncio.to_thread(count_pdf_pages, input_path)
+        size = os.path.getsize(input_path)
+
+        key = (options['parse_method'], options['formula_enable'], options['table_enable'])
+        job = {
+            'input_path': input_path,
+            'output_path': output_path,
+            'temp_output_dir': temp_output_dir,
+            'lang': options['lang'],
+            'output_options': resolve_output_options(options)
+        }
+        future = loop.create_future()
+
+        group = self._groups.get(key)
+        # 加入后会超出预算时，先提交已收集的批次
+        if group is not None and group.items and (group.pages + pages > self.max_batch_pages or
+                                                  group.bytes + size > self.max_batch_bytes):
+            self._flush(key, "flush_by_budget")
+            group = None
+
+        if group is None:
+            group = self._groups[key] = _PendingBatch()
+            group.timer = loop.call_later(self.max_wait, self._flush, key, "flush_by_timeout")
+
+        group.items.append((job, future))
+        group.pages += pages
+        group.bytes += size
+
+        if len(group.items) >= self.max_batch_docs:
+            self._flush(key, "flush_by_size")
+        elif group.pages >= self.max_batch_pages or group.bytes >= self.max_batch_bytes:
+            self._flush(key, "flush_by_budget")
+
+        return await future
+
+    def _flush(self, key: Tuple, reason: str):
+        """提交指定参数组中已收集的批次"""
+        group = self._groups.pop(key, None)
+        if group is None:
+            return
+        if group.timer is not None:
+            group.timer.cancel()
+
+        self.stats[reason] += 1
+        task = asyncio.create_task(self._run_batch(key, group.items))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run_batch(self, key: Tuple, items: List[Tuple[Dict[str, Any], asyncio.Future]]):
+        """执行批次并将结果分发给各文档"""
+        parse_method, formula_enable, table_enable = key
+        options = {
+            'lang': items[0][0]['lang'],
+            'parse_method': parse_method,
+            'formula_enable': formula_enable,
+            'table_enable': table_enable
+        }
+        jobs = [job for job, _ in items]
+
+        self.stats["batches"] += 1
+        self.stats["batched_documents"] += len(jobs)
+        self.stats["max_batch_size"] = max(self.stats["max_batch_size"], len(jobs))
+        logger.info(f"Running inference batch of {len(jobs)} document(s)")
+
+        try:
+            results = await self.inference_executor.run(run_pdf_batch_to_markdown, jobs, options)
+        except Exception as e:
+            if len(items) == 1 or isinstance(e, InferenceTimeoutError):
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            # 批次整体失败时逐个重试，避免单个异常文档拖累同批次其他文档
+            logger.warning(f"Inference batch failed ({e}), retrying {len(items)} documents individually")
+            await asyncio.gather(*[self._run_batch(key, [item]) for item in items])
+            return
+
+        for (job, future), result in zip(items, results):
+            if future.done():
+                continue
+            if 'error' in result:
+                future.set_exception(RuntimeError(result['error']))
+            else:
+                future.set_result(result)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取批处理统计信息"""
+        return {
+            **self.stats,
+            "enabled": self.enabled,
+            "pending_documents": sum(len(group.items) for group in self._groups.values()),
+            "running_batches": len(self._running)
+        }
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+推理执行器
+所有MinerU同步调用统一经由该执行器在独立的线程池/进程池中运行，
+避免阻塞FastAPI事件循环，并对排队深度和单个作业耗时进行约束
+"""
+
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from utils.logging_utils import configure_logging
+from services.model_worker_pool import ModelWorkerPool, ModelWorkerTimeoutError
+
+logger = configure_logging(name=__name__)
+
+
+class InferenceTimeoutError(RuntimeError):
+    """推理作业超时"""
+
+
+class InferenceExecutor:
+    """
+    推理执行器
+
+    支持三种运行模式：
+    1. warm（默认）: 常驻模型工作进程，启动时预热模型，后续作业复用已加载的模型，超时作业会被强制终止
+    2. thread: 线程池，所有作业共享进程内的一份模型，适合显存只够加载一份模型的部署
+    3. process: 进程池（spawn方式启动），适合CPU推理，避免GIL争用
+    """
+
+    def __init__(self,
+                 mode: Optional[str] = None,
+                 max_workers: Optional[int] = None,
+                 max_queue_size: Optional[int] = None,
+                 job_timeout: Optional[float] = None,
+                 warmup_options: Optional[Dict[str, Any]] = None):
+        """
+        初始化推理执行器
+
+        Args:
+            mode: 运行模式 ("warm" / "thread" / "process")，默认读取 INFERENCE_EXECUTOR_MODE
+            max_workers: 并发推理作业数，默认读取 INFERENCE_MAX_WORKERS
+            max_queue_size: 等待执行的最大作业数，默认读取 INFERENCE_MAX_QUEUE_SIZE
+            job_timeout: 单个作业超时时间(秒)，默认读取 INFERENCE_JOB_TIMEOUT；只有warm模式会终止超时的作业
+            warmup_options: warm模式下工作进程预热使用的流水线参数
+        """
+        self.mode = (mode or os.getenv("INFERENCE_EXECUTOR_MODE", "warm")).lower()
+        if self.mode not in ("thread", "process", "warm"):
+            raise ValueError(f"Unsupported inference executor mode: {self.mode}")
+
+        self.max_workers = max(1, int(max_workers or os.getenv("INFERENCE_MAX_WORKERS", "1")))
+        self.max_queue_size = max(0, int(max_queue_size if max_queue_size is not None
+                                         else os.getenv("INFERENCE_MAX_QUEUE_SIZE", str(self.max_workers * 2))))
+        self.job_timeout = float(job_timeout or os.getenv("INFERENCE_JOB_TIMEOUT", "3600"))
+
+        self._pool: Optional[Executor] = None
+        self._worker_pool: Optional[ModelWorkerPool] = None
+        self._started = False
+        self._start_lock = asyncio.Lock()
+        if self.mode == "warm":
+            self._worker_pool = ModelWorkerPool(num_workers=self.max_workers, warmup_options=warmup_options)
+        # 已提交到池中（运行中+排队中）的作业上限，超出时调用方等待
+        self._slots = asyncio.Semaphore(self.max_workers + self.max_queue_size)
+
+        # 统计信息
+        self.stats = {
+            "submitted_jobs": 0,
+            "completed_jobs": 0,
+            "failed_jobs": 0,
+            "timed_out_jobs": 0,
+            "inflight_jobs": 0
+        }
+
+        logger.info(f"InferenceExecutor initialized - Mode: {self.mode}, Workers: {self.max_workers}, "
+                    f"Queue: {self.max_queue_size}, Timeout: {self.job_timeout}s")
+
+    def _get_pool(self) -> Executor:
+        """获取（必要时创建）底层执行池"""
+        if self._pool is None:
+            if self.mode == "process":
+                # 使用spawn避免fork后CUDA上下文不可用
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="inference"
+                )
+        return self._pool
+
+    async def run(self, func: Callable[..., Any], *args, timeout: Optional[float] = None,
+                  wait_on_cancel: bool = False, **kwargs) -> Any:
+        """
+        在执行池中运行同步函数
+
+        Args:
+            func: 同步函数（进程模式下必须是可序列化的顶层函数）
+            *args: 位置参数
+            timeout: 本次作业的超时时间(秒)，默认使用 job_timeout
+            wait_on_cancel: 调用被取消时，等待已开始的作业结束（最多到作业超时）后再传递取消，
+                调用方随后清理作业的输出目录时不会与作业的写入冲突（warm模式下作业进程直接被终止）
+            **kwargs: 关键字参数
+
+        Returns:
+            函数返回值
+
+        Raises:
+            InferenceTimeoutError: 作业超时
+        """
+        loop = asyncio.get_running_loop()
+        job_timeout = timeout or self.job_timeout
+
+        # 队列已满时在此等待，形成对上游任务的背压
+        await self._slots.acquire()
+
+        if self._worker_pool is not None:
+            return await self._run_on_worker_pool(func, args, kwargs, job_timeout)
+
+        try:
+            future = self._get_pool().submit(func, *args, **kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+
+        self.stats["submitted_jobs"] += 1
+        self.stats["inflight_jobs"] += 1
+
+        def _on_done(_):
+            # 只有底层作业真正结束才释放名额，超时但仍在运行的作业继续占用名额
+            loop.call_soon_threadsafe(self._release_slot)
+
+        future.add_done_callback(_on_done)
+        deadline = loop.time() + job_timeout
+
+        try:
+            result = await asyncio.wait_for(asyncio.wrap_future(future, loop=loop), timeout=job_timeout)
+            self.stats["completed_jobs"] += 1
+            return result
+        except asyncio.TimeoutError:
+            # 线程/进程池无法中断已开始的作业：未开始的作业被取消，已开始的作业在后台运行到结束并继续占用名额，
+            # 其输出写入调用方已放弃的尝试目录。需要强制终止超时作业时使用warm模式。
+            started = not future.cancel()
+            self.stats["timed_out_jobs"] += 1
+            job_name = getattr(func, '__name__', func)
+            if started:
+                logger.warning(f"Inference job {job_name} timed out after {job_timeout}s; {self.mode} mode cannot "
+                               f"interrupt it, it keeps running in the background and its output is discarded")
+            raise InferenceTimeoutError(f"Inference job {job_name} timed out after {job_timeout}s")
+        except asyncio.CancelledError:
+            if wait_on_cancel and not future.done():
+                # 已开始的作业无法中断，等它结束后再把取消传给调用方
+                await asyncio.wait([asyncio.wrap_future(future, loop=loop)],
+                                   timeout=max(0.0, deadline - loop.time()))
+            raise
+        except Exception:
+            self.stats["failed_jobs"] += 1
+            raise
+
+    async def _run_on_worker_pool(self, func: Callable[..., Any], args: tuple, kwargs: dict, job_timeout: float) -> Any:
+        """在常驻模型工作进程中运行作业（调用方已获取名额，无论成功与否都在此释放）"""
+        self.stats["submitted_jobs"] += 1
+        self.stats["inflight_jobs"] += 1
+        try:
+            if not self._started:
+                # 未经处理器启动的执行器（如单独使用DocumentService）在首个作业时启动工作进程
+                await self.start()
+            result = await self._worker_pool.run(func, *args, timeout=job_timeout, **kwargs)
+            self.stats["completed_jobs"] += 1
+            return result
+        except ModelWorkerTimeoutError as e:
+            # 超时的工作进程已被强制重启，名额可以立即释放
+            self.stats["timed_out_jobs"] += 1
+            raise InferenceTimeoutError(str(e))
+        except Exception:
+            self.stats["failed_jobs"] += 1
+            raise
+        finally:
+            self._release_slot()
+
+    def _release_slot(self):
+        """释放一个作业名额"""
+        self.stats["inflight_jobs"] -= 1
+        self._slots.release()
+
+    async def start(self):
+        """预先创建执行池（warm模式下启动并预热模型工作进程）"""
+        async with self._start_lock:
+            # 并发的首批调用方等待同一次启动完成，启动失败时下一次调用重新尝试
+            if self._started:
+                return
+            if self._worker_pool is not None:
+                await self._worker_pool.start()
+            else:
+                self._get_pool()
+            self._started = True
+
+    async def shutdown(self, wait: bool = True):
+        """关闭执行池"""
+        if self._worker_pool is not None:
+            await self._worker_pool.shutdown()
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            await asyncio.get_running_loop().run_in_executor(None, lambda: pool.shutdown(wait=wait, cancel_futures=True))
+            logger.info("InferenceExecutor shut down")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取执行器统计信息"""
+        return {
+            **self.stats,
+            "mode": self.mode,
+            "max_workers": self.max_workers,
+            "max_queue_size": self.max_queue_size,
+            "job_timeout": self.job_timeout,
+            "worker_pool": self._worker_pool.get_stats() if self._worker_pool is not None else None
+        }
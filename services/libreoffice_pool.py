@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+LibreOffice转换进程池
+维护N个常驻的soffice实例，每个实例使用独立的用户配置目录(-env:UserInstallation)
+并监听独立的socket端口，通过UNO接口接收转换作业，避免每个文件都重新启动LibreOffice。
+应用Python环境没有UNO绑定时，由安装了python3-uno的系统Python执行UNO客户端脚本连接常驻实例；
+两者都不可用时，退化为每个槽位使用独立配置目录的命令行转换。
+"""
+
+import asyncio
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from services.uno_convert import UNO_AVAILABLE, convert_to_pdf as _uno_convert_to_pdf
+from utils.logging_utils import configure_logging
+
+logger = configure_logging(name=__name__)
+
+
+class LibreOfficeTimeoutError(RuntimeError):
+    """LibreOffice转换超时"""
+
+
+# 连接常驻实例的三种方式：应用Python环境内直接调用UNO / 由系统Python执行UNO客户端脚本 / 每个文件启动一次命令行转换
+MODE_UNO = "uno"
+MODE_UNO_CLIENT = "uno-client"
+MODE_CLI = "cli"
+PERSISTENT_MODES = (MODE_UNO, MODE_UNO_CLIENT)
+
+UNO_CLIENT_SCRIPT = str(Path(__file__).with_name("uno_convert.py"))
+
+
+def detect_uno_mode(uno_python: Optional[str]) -> str:
+    """
+    选择连接常驻soffice实例的方式
+
+    应用运行在独立的虚拟环境中时通常不能导入系统包python3-uno，这时使用系统Python执行UNO客户端脚本。
+
+    Args:
+        uno_python: 安装了python3-uno的Python解释器路径
+
+    Returns:
+        MODE_UNO / MODE_UNO_CLIENT / MODE_CLI
+    """
+    if UNO_AVAILABLE:
+        return MODE_UNO
+    if uno_python and shutil.which(uno_python):
+        try:
+            result = subprocess.run([uno_python, "-c", "import uno"], capture_output=True, timeout=30)
+            if result.returncode == 0:
+                return MODE_UNO_CLIENT
+        except (OSError, subprocess.SubprocessError):
+            pass
+    return MODE_CLI
+
+
+class LibreOfficeInstance:
+    """单个soffice实例（一个转换槽位）"""
+
+    def __init__(self, index: int, soffice_path: str, profile_dir: Path, port: int,
+                 mode: str = MODE_CLI, uno_python: Optional[str] = None):
+        self.index = index
+        self.soffice_path = soffice_path
+        self.profile_dir = profile_dir
+        self.port = port
+        self.mode = mode
+        self.uno_python = uno_python
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.jobs_done = 0
+        self.restarts = 0
+
+    @property
+    def profile_url(self) -> str:
+        """用户配置目录的file URL"""
+        return self.profile_dir.resolve().as_uri()
+
+    def is_alive(self) -> bool:
+        """常驻进程是否存活（命令行模式下始终视为可用）"""
+        if self.mode not in PERSISTENT_MODES:
+            return True
+        return self.process is not None and self.process.returncode is None
+
+    async def start(self, startup_timeout: float):
+        """启动常驻soffice实例并等待端口可连接"""
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        self.jobs_done = 0
+        if self.mode not in PERSISTENT_MODES:
+            return
+
+        self.process = await asyncio.create_subprocess_exec(
+            self.soffice_path,
+            f"-env:UserInstallation={self.profile_url}",
+            "--headless", "--invisible", "--nologo", "--nodefault", "--norestore", "--nolockcheck",
+            f"--accept=socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext",
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL,
+            # 独立进程组，便于连同soffice.bin子进程一起结束
+            start_new_session=True
+        )
+
+        deadline = time.monotonic() + startup_timeout
+        while time.monotonic() < deadline:
+            if self.process.returncode is not None:
+                raise RuntimeError(f"soffice instance {self.index} exited during startup "
+                                   f"(code {self.process.returncode})")
+            if await asyncio.to_thread(self._port_open):
+                logger.info(f"LibreOffice instance {self.index} ready on port {self.port} (pid={self.process.pid})")
+                return
+            await asyncio.sleep(0.5)
+
+        await self.kill()
+        raise LibreOfficeTimeoutError(f"soffice instance {self.index} did not open port {self.port} in {startup_timeout}s")
+
+    def _port_open(self) -> bool:
+        """检查监听端口是否可连接"""
+        try:
+            with socket.create_connection(("127.0.0.1", self.port), timeout=1):
+                return True
+        except OSError:
+            return False
+
+    async def convert_to_pdf(self, input_path: str, output_path: str, timeout: float) -> None:
+        """
+        转换单个文档为PDF
+
+        Args:
+            input_path: 输入文件路径
+            output_path: 输出PDF路径
+            timeout: 超时时间(秒)
+
+        Raises:
+            LibreOfficeTimeoutError: 转换超时
+            RuntimeError: 转换失败
+        """
+        if self.mode == MODE_UNO:
+            try:
+                await asyncio.wait_for(
+                    asyncio.to_thread(_uno_convert_to_pdf, self.port, input_path, output_path), timeout=timeout
+                )
+            except asyncio.TimeoutError:
+                raise LibreOfficeTimeoutError(f"LibreOffice conversion timed out after {timeout}s: {input_path}")
+        elif self.mode == MODE_UNO_CLIENT:
+            await self._client_convert_to_pdf(input_path, output_path, timeout)
+        else:
+            await self._cli_convert_to_pdf(input_path, output_path, timeout)
+
+        self.jobs_done += 1
+        if not Path(output_path).exists():
+            raise RuntimeError("PDF file was not created")
+
+    async def _client_convert_to_pdf(self, input_path: str, output_path: str, timeout: float) -> None:
+        """由系统Python执行UNO客户端脚本，在常驻实例中转换（只启动轻量的客户端进程，不启动LibreOffice）"""
+        process = await asyncio.create_subprocess_exec(
+            self.uno_python, UNO_CLIENT_SCRIPT, str(self.port), input_path, output_path,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            _, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise LibreOfficeTimeoutError(f"LibreOffice conversion timed out after {timeout}s: {input_path}")
+
+        if process.returncode != 0:
+            error_msg = stderr.decode('utf-8', errors='replace').strip() if stderr else 'Unknown error'
+            raise RuntimeError(f"LibreOffice conversion failed: {error_msg}")
+
+    async def _cli_convert_to_pdf(self, input_path: str, output_path: str, timeout: float) -> None:
+        """使用本槽位的独立配置目录执行命令行转换"""
+        output_file = Path(output_path)
+        process = await asyncio.create_subprocess_exec(
+            self.soffice_path,
+            f"-env:UserInstallation={self.profile_url}",
+            "--headless", "--norestore", "--nolockcheck",
+            "--convert-to", "pdf",
+            "--outdir", str(output_file.parent),
+            input_path,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
+        except asyncio.TimeoutError:
+            self._kill_group(process)
+            await process.wait()
+            raise LibreOfficeTimeoutError(f"LibreOffice conversion timed out after {timeout}s: {input_path}")
+
+        if process.returncode != 0:
+            error_msg = stderr.decode('utf-8') if stderr else 'Unknown error'
+            raise RuntimeError(f"LibreOffice conversion failed: {error_msg}")
+
+        # 命令行转换输出为 <outdir>/<stem>.pdf
+        expected_output = output_file.parent / f"{Path(input_path).stem}.pdf"
+        if expected_output.exists() and expected_output != output_file:
+            shutil.move(str(expected_output), str(output_file))
+
+    @staticmethod
+    def _kill_group(process: asyncio.subprocess.Process):
+        """结束进程及其所在进程组"""
+        if process.returncode is not None:
+            return
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            process.kill()
+
+    async def kill(self):
+        """强制结束常驻实例"""
+        if self.process is not None:
+            self._kill_group(self.process)
+            await self.process.wait()
+            self.process = None
+
+
+class LibreOfficePool:
+    """
+    LibreOffice转换进程池
+
+    作业从空闲队列中取得一个实例执行，实例在崩溃、超时或处理作业数达到上限后自动重启。
+    """
+
+    def __init__(self,
+                 soffice_path: str = "/usr/bin/libreoffice",
+                 pool_size: Optional[int] = None,
+                 base_port: Optional[int] = None,
+                 profile_root: Optional[str] = None,
+                 job_timeout: Optional[float] = None,
+                 max_jobs_per_instance: Optional[int] = None,
+                 startup_timeout: Optional[float] = None,
+                 uno_python: Optional[str] = None):
+        """
+        初始化进程池
+
+        Args:
+            soffice_path: LibreOffice可执行文件路径
+            pool_size: 实例数，默认读取 LIBREOFFICE_POOL_SIZE
+            base_port: 第一个实例的监听端口，默认读取 LIBREOFFICE_BASE_PORT
+            profile_root: 实例配置目录的根目录，默认读取 LIBREOFFICE_PROFILE_DIR
+            job_timeout: 单个文档转换超时(秒)，默认读取 LIBREOFFICE_JOB_TIMEOUT
+            max_jobs_per_instance: 实例处理多少个文档后重启，默认读取 LIBREOFFICE_MAX_JOBS，0表示不重启
+            startup_timeout: 实例启动超时(秒)，默认读取 LIBREOFFICE_STARTUP_TIMEOUT
+            uno_python: 应用环境不能导入uno时用于执行UNO客户端脚本的Python，默认读取 LIBREOFFICE_UNO_PYTHON
+        """
+        self.soffice_path = soffice_path
+        self.pool_size = max(1, int(pool_size or os.getenv("LIBREOFFICE_POOL_SIZE", "2")))
+        self.base_port = int(base_port or os.getenv("LIBREOFFICE_BASE_PORT", "2002"))
+        self.profile_root = Path(profile_root or os.getenv("LIBREOFFICE_PROFILE_DIR", "/tmp/libreoffice_profiles"))
+        self.job_timeout = float(job_timeout or os.getenv("LIBREOFFICE_JOB_TIMEOUT", "300"))
+        self.max_jobs_per_instance = int(max_jobs_per_instance if max_jobs_per_instance is not None
+                                         else os.getenv("LIBREOFFICE_MAX_JOBS", "200"))
+        self.startup_timeout = float(startup_timeout or os.getenv("LIBREOFFICE_STARTUP_TIMEOUT", "60"))
+        self.uno_python = uno_python or os.getenv("LIBREOFFICE_UNO_PYTHON", "/usr/bin/python3")
+        # 启动时检测UNO可用性后确定
+        self.mode = MODE_UNO if UNO_AVAILABLE else None
+
+        self._instances: List[LibreOfficeInstance] = [
+            LibreOfficeInstance(i, self.soffice_path, self.profile_root / f"instance-{i}", self.base_port + i,
+                                uno_python=self.uno_python)
+            for i in range(self.pool_size)
+        ]
+        self._idle: Optional[asyncio.Queue] = None
+        self._closed = False
+
+        self.stats = {
+            "jobs_completed": 0,
+            "jobs_failed": 0,
+            "jobs_timed_out": 0,
+            "instance_restarts": 0
+        }
+
+        logger.info(f"LibreOfficePool initialized - Instances: {self.pool_size}, Timeout: {self.job_timeout}s")
+
+    async def start(self):
+        """检测UNO可用性并启动全部实例"""
+        if self._idle is not None:
+            return
+        self._idle = asyncio.Queue()
+
+        if self.mode is None:
+            self.mode = await asyncio.to_thread(detect_uno_mode, self.uno_python)
+        if self.mode == MODE_CLI:
+            logger.warning(f"Python UNO bindings not available (in-process or via {self.uno_python}), "
+                           f"LibreOffice will be started for every document; install python3-uno to reuse instances")
+        else:
+            logger.info(f"LibreOfficePool using persistent soffice instances (mode: {self.mode})")
+        for instance in self._instances:
+            instance.mode = self.mode
+
+        results = await asyncio.gather(
+            *[instance.start(self.startup_timeout) for instance in self._instances], return_exceptions=True
+        )
+        for instance, result in zip(self._instances, results):
+            if isinstance(result, Exception):
+                # 启动失败的实例在首次使用时重新启动
+                logger.error(f"Failed to start LibreOffice instance {instance.index}: {result}")
+            self._idle.put_nowait(instance)
+
+    async def convert_to_pdf(self, input_path: str, output_path: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        使用池中的空闲实例将文档转换为PDF
+
+        Args:
+            input_path: 输入文件路径
+            output_path: 输出PDF路径
+            timeout: 超时时间(秒)，默认使用 job_timeout
+
+        Returns:
+            包含实例编号和耗时的字典
+        """
+        if self._closed:
+            raise RuntimeError("LibreOfficePool is shut down")
+        if self._idle is None:
+            await self.start()
+
+        instance = await self._idle.get()
+        start_time = time.time()
+        try:
+            if not instance.is_alive():
+                await self._restart(instance, "instance not running")
+
+            await instance.convert_to_pdf(input_path, output_path, timeout or self.job_timeout)
+            self.stats["jobs_completed"] += 1
+
+            if self.max_jobs_per_instance > 0 and instance.jobs_done >= self.max_jobs_per_instance:
+                await self._restart(instance, f"processed {instance.jobs_done} jobs")
+
+            return {'instance': instance.index, 'duration': time.time() - start_time}
+
+        except LibreOfficeTimeoutError:
+            self.stats["jobs_timed_out"] += 1
+            await self._restart(instance, "conversion timed out")
+            raise
+        except Exception:
+            self.stats["jobs_failed"] += 1
+            # UNO连接异常通常意味着实例已崩溃
+            if not instance.is_alive():
+                await self._restart(instance, "instance crashed")
+            raise
+        finally:
+            self._idle.put_nowait(instance)
+
+    async def _restart(self, instance: LibreOfficeInstance, reason: str):
+        """重启实例（进程池关闭后只结束实例，不再启动）"""
+        if self._closed:
+            await instance.kill()
+            return
+        logger.info(f"Restarting LibreOffice instance {instance.index}: {reason}")
+        instance.restarts += 1
+        self.stats["instance_restarts"] += 1
+        await instance.kill()
+        try:
+            await instance.start(self.startup_timeout)
+        except Exception as e:
+            logger.error(f"Failed to restart LibreOffice instance {instance.index}: {e}")
+
+    async def shutdown(self):
+        """停止全部实例（保留空闲队列，仍在进行的转换结束后照常归还实例）"""
+        self._closed = True
+        await asyncio.gather(*[instance.kill() for instance in self._instances], return_exceptions=True)
+        logger.info("LibreOfficePool shut down")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取进程池统计信息"""
+        return {
+            **self.stats,
+            "mode": self.mode,
+            "closed": self._closed,
+            "pool_size": self.pool_size,
+            "idle_instances": self._idle.qsize() if self._idle else 0,
+            "instances": [
+                {
+                    "index": instance.index,
+                    "port": instance.port,
+                    "alive": instance.is_alive(),
+                    "jobs_done": instance.jobs_done,
+                    "restarts": instance.restarts
+                }
+                for instance in self._instances
+            ]
+        }
@@ -0,0 +1,570 @@
+#!/usr/bin/env python3
+"""
+MinerU同步流水线
+
+封装MinerU 2.0 Python API的同步调用（分析、中间JSON生成、Markdown合成与落盘）。
+本模块中的函数均为顶层函数，参数与返回值均可序列化，
+既可以在线程池中执行，也可以提交到进程池中执行，不得在事件循环中直接调用。
+"""
+
+import gzip
+import importlib.util
+import json
+import os
+import pypdfium2 as pdfium
+import shutil
+import logging
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+# MinerU Python API
+from mineru.cli.common import read_fn
+from mineru.backend.pipeline.pipeline_analyze import doc_analyze as pipeline_doc_analyze
+from mineru.backend.pipeline.pipeline_middle_json_mkcontent import union_make as pipeline_union_make
+from mineru.backend.pipeline.model_json_to_middle_json import result_to_middle_json as pipeline_result_to_middle_json
+from mineru.data.data_reader_writer import FileBasedDataWriter
+from mineru.cli.common import prepare_env, convert_pdf_bytes_to_bytes_by_pypdfium2
+from mineru.utils.enum_class import MakeMode
+from mineru.utils.pdf_image_tools import images_bytes_to_pdf_bytes
+
+logger = logging.getLogger(__name__)
+
+# 默认的MinerU流水线参数，与历史行为保持一致
+DEFAULT_PIPELINE_OPTIONS = {
+    'lang': 'ch',              # 中文语言
+    'parse_method': 'auto',    # 自动判断是否需要OCR
+    'formula_enable': True,    # 启用公式识别
+    'table_enable': True,      # 启用表格识别
+}
+
+# 中间JSON输出格式及对应的文件扩展名
+MIDDLE_JSON_FORMATS = {
+    'pretty': '.json',         # 缩进格式（历史行为）
+    'compact': '.json',        # 无缩进
+    'jsonl': '.jsonl',         # 每行一页
+    'gzip': '.json.gz',
+    'zstd': '.json.zst',       # 需要安装 zstandard
+}
+
+
+def resolve_pipeline_options(params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    从任务参数中解析MinerU流水线参数
+
+    Args:
+        params: 任务参数，可包含 lang / parse_method / formula_enable / table_enable
+
+    Returns:
+        完整的流水线参数字典
+    """
+    params = params or {}
+    options = dict(DEFAULT_PIPELINE_OPTIONS)
+    for key in DEFAULT_PIPELINE_OPTIONS:
+        if params.get(key) is not None:
+            options[key] = params[key]
+    options.update(resolve_output_options(params))
+    return options
+
+
+def resolve_output_options(params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    从任务参数中解析中间JSON的输出格式
+
+    Args:
+        params: 任务参数，json_format / json_omit_fields 优先于环境变量 MIDDLE_JSON_FORMAT / MIDDLE_JSON_OMIT_FIELDS
+
+    Returns:
+        包含 json_format 和 json_omit_fields（已排序的字段列表）的字典
+    """
+    params = params or {}
+    json_format = (params.get('json_format') or os.getenv("MIDDLE_JSON_FORMAT", "compact")).lower()
+    if json_format not in MIDDLE_JSON_FORMATS:
+        logger.warning(f"Unsupported json_format '{json_format}', using compact")
+        json_format = "compact"
+    elif json_format == "zstd" and importlib.util.find_spec("zstandard") is None:
+        logger.warning("zstandard is not installed, writing middle JSON with gzip")
+        json_format = "gzip"
+
+    omit_fields = params.get('json_omit_fields')
+    if omit_fields is None:
+        omit_fields = os.getenv("MIDDLE_JSON_OMIT_FIELDS", "")
+    if isinstance(omit_fields, str):
+        omit_fields = omit_fields.split(",")
+    return {
+        'json_format': json_format,
+        'json_omit_fields': sorted({field.strip() for field in omit_fields if field and field.strip()})
+    }
+
+
+def middle_json_filename(pdf_file_name: str, json_format: str) -> str:
+    """
+    中间JSON文件名
+
+    Args:
+        pdf_file_name: 文档名（不含扩展名）
+        json_format: 输出格式（见 MIDDLE_JSON_FORMATS）
+
+    Returns:
+        文件名
+    """
+    return f"{pdf_file_name}{MIDDLE_JSON_FORMATS.get(json_format, '.json')}"
+
+
+def _open_middle_json(path: Path, json_format: str):
+    """按输出格式打开文本写入流"""
+    if json_format == "gzip":
+        return gzip.open(path, 'wt', encoding='utf-8', compresslevel=6)
+    if json_format == "zstd":
+        import zstandard
+        return zstandard.open(path, 'wt', encoding='utf-8', cctx=zstandard.ZstdCompressor(level=3))
+    return open(path, 'w', encoding='utf-8')
+
+
+def write_middle_json(middle_json: Dict[str, Any],
+                      json_path: str,
+                      json_format: str = "compact",
+                      omit_fields: Optional[List[str]] = None) -> None:
+    """
+    逐页序列化中间JSON，避免一次性在内存中生成整个文档的JSON字符串
+
+    pretty/compact/gzip/zstd 输出与原结构相同的JSON对象；
+    jsonl 第一行为除 pdf_info 外的文档级字段，之后每行一页。
+
+    Args:
+        middle_json: 中间JSON
+        json_path: 输出路径
+        json_format: 输出格式
+        omit_fields: 每页中不输出的字段
+    """
+    omit = set(omit_fields or [])
+    pages = middle_json.get("pdf_info", [])
+    header = {key: value for key, value in middle_json.items() if key != "pdf_info"}
+
+    def page_items():
+        for page_info in pages:
+            yield {key: value for key, value in page_info.items() if key not in omit} if omit else page_info
+
+    with _open_middle_json(Path(json_path), json_format) as f:
+        if json_format == "jsonl":
+            f.write(json.dumps(header, ensure_ascii=False, separators=(',', ':')) + "\n")
+            for page_info in page_items():
+                f.write(json.dumps(page_info, ensure_ascii=False, separators=(',', ':')) + "\n")
+            return
+
+        if json_format == "pretty":
+            indent, separators, newline = 2, None, "\n"
+        else:
+            indent, separators, newline = None, (',', ':'), ""
+
+        f.write("{" + newline + ("  " if indent else "") + '"pdf_info": [')
+        for index, page_info in enumerate(page_items()):
+            f.write(("," if index else "") + newline)
+            page_json = json.dumps(page_info, ensure_ascii=False, indent=indent, separators=separators)
+            if indent:
+                page_json = "    " + page_json.replace("\n", "\n    ")
+            f.write(page_json)
+        f.write(newline + ("  " if indent and pages else "") + "]")
+        for key, value in header.items():
+            value_json = json.dumps(value, ensure_ascii=False, indent=indent, separators=separators)
+            if indent:
+                value_json = value_json.replace("\n", "\n  ")
+            f.write("," + newline + ("  " if indent else "") + json.dumps(key) + (": " if indent else ":") + value_json)
+        f.write(newline + "}")
+
+
+def count_pdf_pages(input_path: str) -> int:
+    """
+    读取PDF页数（只解析文档结构，不渲染页面）
+
+    Args:
+        input_path: PDF路径
+
+    Returns:
+        页数，无法解析时返回0
+    """
+    try:
+        pdf = pdfium.PdfDocument(input_path)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+    except Exception as e:
+        logger.warning(f"Failed to count pages of {input_path}: {e}")
+        return 0
+
+
+def clear_gpu_memory() -> None:
+    """清理GPU内存（在执行推理的线程/进程中调用）"""
+    try:
+        import torch
+        import gc
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+            gc.collect()
+            logger.info("GPU memory cleared")
+    except Exception as e:
+        logger.warning(f"Failed to clear GPU memory: {e}")
+
+
+def run_pdf_to_markdown(input_path: str,
+                        output_path: str,
+                        temp_output_dir: str,
+                        options: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    执行完整的PDF转Markdown流水线
+
+    Args:
+        input_path: 输入PDF路径
+        output_path: 输出Markdown路径
+        temp_output_dir: MinerU临时输出目录
+        options: 流水线参数（见 resolve_pipeline_options）
+
+    Returns:
+        结果字典，包含 json_output_path / images_output_dir / images_moved
+
+    Raises:
+        RuntimeError: MinerU分析或中间JSON生成失败
+    """
+    input_file = Path(input_path)
+    pdf_bytes = read_fn(str(input_file))
+    return _run_pipeline(pdf_bytes, input_file.stem, output_path, temp_output_dir, options)
+
+
+def run_image_to_markdown(input_path: str,
+                          output_path: str,
+                          temp_output_dir: str,
+                          options: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    执行图片转Markdown流水线（图片先转为单页PDF，再走与PDF相同的流水线）
+
+    Args:
+        input_path: 输入图片路径
+        output_path: 输出Markdown路径
+        temp_output_dir: MinerU临时输出目录
+        options: 流水线参数（见 resolve_pipeline_options）
+
+    Returns:
+        结果字典，格式同 run_pdf_to_markdown
+    """
+    input_file = Path(input_path)
+    with open(input_file, 'rb') as f:
+        # 直接使用PIL转换，支持bmp/tiff等read_fn未覆盖的格式
+        pdf_bytes = images_bytes_to_pdf_bytes(f.read())
+    return _run_pipeline(pdf_bytes, input_file.stem, output_path, temp_output_dir, options)
+
+
+def run_pdf_batch_to_markdown(jobs: List[Dict[str, Any]], options: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    批量执行PDF转Markdown流水线：多个文档合并为一次 doc_analyze 调用，再分别输出
+
+    Args:
+        jobs: 文档列表，每项包含 input_path / output_path / temp_output_dir / lang，可选 output_options（JSON输出格式）
+        options: 除lang外共享的流水线参数（parse_method / formula_enable / table_enable）
+
+    Returns:
+        与jobs一一对应的结果列表，成功项格式同 run_pdf_to_markdown，失败项为 {'error': 错误信息}
+
+    Raises:
+        RuntimeError: 批量分析整体失败
+    """
+    pdf_bytes_list = [read_fn(job['input_path']) for job in jobs]
+    lang_list = [job.get('lang') or options['lang'] for job in jobs]
+
+    clear_gpu_memory()
+    try:
+        analyses = _analyze_documents(pdf_bytes_list, lang_list, options)
+        del pdf_bytes_list
+
+        results = []
+        for job, analysis in zip(jobs, analyses):
+            try:
+                results.append(_emit_document(
+                    analysis,
+                    Path(job['input_path']).stem,
+                    job['output_path'],
+                    job['temp_output_dir'],
+                    {**options, **job.get('output_options', {}), 'lang': job.get('lang') or options['lang']}
+                ))
+            except Exception as e:
+                # 单个文档输出失败不影响同批次其他文档
+                logger.error(f"Failed to emit batched document {job['input_path']}: {e}")
+                results.append({'error': f"{type(e).__name__}: {e}"})
+        return results
+    finally:
+        clear_gpu_memory()
+
+
+def _run_pipeline(pdf_bytes: bytes,
+                  pdf_file_name: str,
+                  output_path: str,
+                  temp_output_dir: str,
+                  options: Dict[str, Any]) -> Dict[str, Any]:
+    """分析PDF字节并输出Markdown、JSON结构和图片"""
+    clear_gpu_memory()
+    try:
+        logger.info(f"PDF file loaded: {pdf_file_name}, size: {len(pdf_bytes)} bytes")
+        analysis = _analyze_documents([pdf_bytes], [options['lang']], options)[0]
+        return _emit_document(analysis, pdf_file_name, output_path, temp_output_dir, options)
+    finally:
+        clear_gpu_memory()
+
+
+def _analyze_documents(pdf_bytes_list: List[bytes],
+                       lang_list: List[str],
+                       options: Dict[str, Any]) -> List[Tuple[Any, Any, Any, str, bool]]:
+    """
+    调用 doc_analyze 分析一批PDF，并按文档拆分分析结果
+
+    Returns:
+        每个文档的 (model_list, images_list, pdf_doc, lang, ocr_enable)
+    """
+    # 使用pipeline模式进行分析
+    logger.info(f"Starting MinerU pipeline analysis for {len(pdf_bytes_list)} document(s)...")
+    infer_results, all_image_lists, all_pdf_docs, out_lang_list, ocr_enabled_list = pipeline_doc_analyze(
+        pdf_bytes_list,
+        lang_list,
+        parse_method=options['parse_method'],
+        formula_enable=options['formula_enable'],
+        table_enable=options['table_enable']
+    )
+
+    logger.info("MinerU analysis completed, processing results...")
+
+    if not infer_results or len(infer_results) != len(pdf_bytes_list):
+        raise RuntimeError("MinerU analysis returned no results")
+
+    analyses = []
+    for i, model_list in enumerate(infer_results):
+        images_list = all_image_lists[i] if all_image_lists and len(all_image_lists) > i else []
+        pdf_doc = all_pdf_docs[i] if all_pdf_docs and len(all_pdf_docs) > i else None
+        _lang = out_lang_list[i] if out_lang_list and len(out_lang_list) > i else lang_list[i]
+        _ocr_enable = ocr_enabled_list[i] if ocr_enabled_list and len(ocr_enabled_list) > i else True
+        analyses.append((model_list, images_list, pdf_doc, _lang, _ocr_enable))
+    return analyses
+
+
+def _emit_document(analysis: Tuple[Any, Any, Any, str, bool],
+                   pdf_file_name: str,
+                   output_path: str,
+                   temp_output_dir: str,
+                   options: Dict[str, Any]) -> Dict[str, Any]:
+    """根据单个文档的分析结果生成中间JSON、Markdown并整理图片"""
+    # 准备输出环境
+    local_image_dir, local_md_dir = prepare_env(temp_output_dir, pdf_file_name, options['parse_method'])
+    middle_json = _build_middle_json(analysis, local_image_dir, options)
+    return write_document_outputs(middle_json, pdf_file_name, output_path, local_image_dir, options)
+
+
+def _build_middle_json(analysis: Tuple[Any, Any, Any, str, bool],
+                       local_image_dir: str,
+                       options: Dict[str, Any]) -> Dict[str, Any]:
+    """将分析结果转换为中间JSON，裁剪出的图片写入 local_image_dir"""
+    model_list, images_list, pdf_doc, _lang, _ocr_enable = analysis
+    image_writer = FileBasedDataWriter(local_image_dir)
+
+    # 转换为中间JSON格式
+    middle_json = pipeline_result_to_middle_json(
+        model_list, images_list, pdf_doc, image_writer, _lang, _ocr_enable, options['formula_enable']
+    )
+
+    # 检查middle_json是否有效
+    if not middle_json or "pdf_info" not in middle_json:
+        raise RuntimeError("MinerU middle_json generation failed")
+    return middle_json
+
+
+def analyze_pdf_shard(input_path: str,
+                      start_page: int,
+                      end_page: int,
+                      local_image_dir: str,
+                      options: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    分析PDF的一个页段，返回该页段的中间JSON
+
+    页段内各页的 page_idx 会换算为在原文档中的页码；所有页段共用同一个图片目录，
+    图片文件名由页面图像内容哈希生成，不同页段之间不会冲突。
+
+    Args:
+        input_path: 输入PDF路径
+        start_page: 起始页（含，从0开始）
+        end_page: 结束页（含）
+        local_image_dir: 共用的图片输出目录
+        options: 流水线参数（见 resolve_pipeline_options）
+
+    Returns:
+        页段的中间JSON
+    """
+    shard_bytes = convert_pdf_bytes_to_bytes_by_pypdfium2(read_fn(input_path), start_page, end_page)
+
+    clear_gpu_memory()
+    try:
+        logger.info(f"Analyzing pages {start_page}-{end_page} of {Path(input_path).name}")
+        analysis = _analyze_documents([shard_bytes], [options['lang']], options)[0]
+        del shard_bytes
+        middle_json = _build_middle_json(analysis, local_image_dir, options)
+    finally:
+        clear_gpu_memory()
+
+    for page_info in middle_json["pdf_info"]:
+        page_info["page_idx"] = page_info.get("page_idx", 0) + start_page
+    return middle_json
+
+
+def plan_page_shards(page_count: int, shard_pages: int) -> List[Tuple[int, int]]:
+    """
+    按固定页数划分页段
+
+    Args:
+        page_count: 总页数
+        shard_pages: 每个页段的页数
+
+    Returns:
+        (起始页, 结束页) 列表，均为闭区间
+    """
+    return [(start, min(start + shard_pages, page_count) - 1) for start in range(0, page_count, shard_pages)]
+
+
+def merge_shard_middle_json(shards: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    按页段顺序合并中间JSON
+
+    Args:
+        shards: 按起始页排序的页段中间JSON列表
+
+    Returns:
+        合并后的中间JSON
+    """
+    merged = {key: value for key, value in shards[0].items() if key != "pdf_info"}
+    merged["pdf_info"] = [page_info for shard in shards for page_info in shard["pdf_info"]]
+    merged["pdf_info"].sort(key=lambda page_info: page_info.get("page_idx", 0))
+    return merged
+
+
+def emit_markdown_pages(middle_json: Dict[str, Any],
+                        output_path: str,
+                        local_image_dir: str,
+                        first: bool) -> Dict[str, Any]:
+    """
+    把一段连续页面的Markdown追加到输出文件，并把已生成的图片移动到输出图片目录
+
+    用于分段分析时按页序逐段输出，客户端可以在后续页面完成前读取已输出的页面。
+
+    Args:
+        middle_json: 页段的中间JSON
+        output_path: 输出Markdown路径
+        local_image_dir: 中间JSON引用的图片所在目录
+        first: 是否为第一段（覆盖已有的Markdown和图片目录）
+
+    Returns:
+        结果字典，包含 markdown_bytes（输出文件当前大小）和 page_count（本段页数）
+    """
+    output_file = Path(output_path)
+    images_output_dir = output_file.parent / "images"
+    if first and images_output_dir.exists():
+        shutil.rmtree(images_output_dir)
+
+    image_dir = str(os.path.basename(local_image_dir))
+    md_content_str = pipeline_union_make(middle_json["pdf_info"], MakeMode.MM_MD, image_dir)
+
+    with open(output_file, 'w' if first else 'a', encoding='utf-8') as f:
+        if md_content_str:
+            if f.tell() > 0:
+                f.write("\n\n")
+            f.write(md_content_str)
+        markdown_bytes = f.tell()
+
+    # 先输出的页面引用的图片必须已在输出目录中
+    _merge_images(Path(local_image_dir), images_output_dir)
+
+    return {
+        'markdown_bytes': markdown_bytes,
+        'page_count': len(middle_json["pdf_info"])
+    }
+
+
+def _merge_images(local_image_dir: Path, images_output_dir: Path) -> None:
+    """把图片目录中的文件逐个移动到输出图片目录（同名文件内容由图片哈希决定，直接覆盖）"""
+    if not local_image_dir.exists():
+        return
+    for img_file in local_image_dir.rglob("*"):
+        if img_file.is_file():
+            target = images_output_dir / img_file.relative_to(local_image_dir)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(img_file, target)
+
+
+def write_document_outputs(middle_json: Dict[str, Any],
+                           pdf_file_name: str,
+                           output_path: str,
+                           local_image_dir: str,
+                           options: Optional[Dict[str, Any]] = None,
+                           markdown_emitted: bool = False) -> Dict[str, Any]:
+    """
+    由中间JSON生成Markdown，保存JSON结构文件，并把图片移动到输出目录
+
+    Args:
+        middle_json: 中间JSON
+        pdf_file_name: 文档名（不含扩展名），用于JSON文件命名
+        output_path: 输出Markdown路径
+        local_image_dir: 中间JSON引用的图片所在目录
+        options: 流水线参数，其中 json_format / json_omit_fields 决定JSON输出格式
+        markdown_emitted: Markdown是否已由 emit_markdown_pages 逐段输出（为True时只补齐JSON和剩余图片）
+
+    Returns:
+        结果字典，包含 json_output_path / images_output_dir / images_moved / page_count
+    """
+    output_file = Path(output_path)
+    pdf_info = middle_json["pdf_info"]
+
+    if not markdown_emitted:
+        # 生成Markdown内容
+        image_dir = str(os.path.basename(local_image_dir))
+        md_content_str = pipeline_union_make(pdf_info, MakeMode.MM_MD, image_dir)
+
+        # 写入输出文件
+        with open(output_file, 'w', encoding='utf-8') as f:
+            f.write(md_content_str)
+        del md_content_str
+
+    logger.info(f"MinerU conversion completed successfully: {output_file}")
+
+    # 保存JSON结构文件
+    output_options = resolve_output_options(options)
+    json_output_path = output_file.parent / middle_json_filename(pdf_file_name, output_options['json_format'])
+    try:
+        write_middle_json(middle_json, str(json_output_path),
+                          output_options['json_format'], output_options['json_omit_fields'])
+        logger.info(f"JSON structure saved: {json_output_path}")
+    except Exception as json_error:
+        logger.warning(f"Failed to save JSON structure: {json_error}")
+
+    # 移动图片文件到输出目录
+    images_output_dir = output_file.parent / "images"
+    images_moved = []
+    try:
+        images_updated = markdown_emitted
+        if markdown_emitted:
+            # 图片已随各页段移动到输出目录，这里只移动剩余的
+            _merge_images(Path(local_image_dir), images_output_dir)
+        elif Path(local_image_dir).exists():
+            if images_output_dir.exists():
+                shutil.rmtree(images_output_dir)
+            shutil.move(local_image_dir, images_output_dir)
+            images_updated = True
+
+        # 统计移动的图片文件
+        if images_updated and images_output_dir.exists():
+            for img_file in images_output_dir.rglob("*"):
+                if img_file.is_file() and img_file.suffix.lower() in ['.png', '.jpg', '.jpeg', '.gif', '.bmp']:
+                    images_moved.append(str(img_file))
+
+            logger.info(f"Moved {len(images_moved)} images to: {images_output_dir}")
+    except Exception as move_error:
+        logger.warning(f"Failed to move images: {move_error}")
+
+    return {
+        'json_output_path': str(json_output_path) if json_output_path.exists() else None,
+        'images_output_dir': str(images_output_dir) if images_output_dir.exists() else None,
+        'images_moved': images_moved,
+        'page_count': len(pdf_info)
+    }
@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+"""
+常驻MinerU模型工作进程池
+工作进程启动时加载一次流水线模型，此后通过本地管道(IPC)接收作业，
+避免每次转换重复初始化版面/OCR/公式/表格模型。
+支持健康检查、按作业数回收以及内存上限重启。
+"""
+
+import asyncio
+import concurrent.futures
+import multiprocessing
+import os
+import signal
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from utils.logging_utils import configure_logging
+
+logger = configure_logging(name=__name__)
+
+
+class ModelWorkerError(RuntimeError):
+    """工作进程内作业执行失败或工作进程异常退出"""
+
+
+class ModelWorkerTimeoutError(ModelWorkerError):
+    """工作进程作业超时"""
+
+
+def _model_worker_main(conn, warmup_options: Optional[Dict[str, Any]]):
+    """
+    工作进程入口：预热模型后循环处理作业
+
+    Args:
+        conn: 与父进程通信的管道端点
+        warmup_options: 预热使用的流水线参数，为None时跳过预热
+    """
+    # 由父进程负责退出信号处理
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    warmed = False
+    if warmup_options:
+        try:
+            from mineru.backend.pipeline.pipeline_analyze import ModelSingleton
+            ModelSingleton().get_model(
+                lang=warmup_options.get('lang'),
+                formula_enable=warmup_options.get('formula_enable'),
+                table_enable=warmup_options.get('table_enable')
+            )
+            warmed = True
+        except Exception as e:
+            # 预热失败不影响服务，首个作业会按需加载模型
+            logger.warning(f"Model worker {os.getpid()} warmup failed: {e}")
+
+    conn.send(('ready', warmed))
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+
+        kind = message[0]
+        if kind == 'stop':
+            break
+        elif kind == 'ping':
+            conn.send(('pong', os.getpid()))
+        elif kind == 'job':
+            _, func, args, kwargs = message
+            try:
+                result = func(*args, **kwargs)
+                conn.send(('ok', result))
+            except BaseException as e:
+                # 异常对象不一定可序列化，只回传类型、信息和堆栈
+                conn.send(('error', (type(e).__name__, str(e), traceback.format_exc())))
+
+
+class _ModelWorker:
+    """单个常驻工作进程的父进程侧句柄"""
+
+    def __init__(self, index: int, ctx, warmup_options: Optional[Dict[str, Any]]):
+        self.index = index
+        self.ctx = ctx
+        self.warmup_options = warmup_options
+        self.process = None
+        self.conn = None
+        self.jobs_done = 0
+        self.restarts = 0
+        self.started_at: Optional[float] = None
+        # 最近一次启动是否失败（失败后由池退避重试）
+        self.start_failed = False
+
+    def start(self, startup_timeout: float) -> bool:
+        """启动工作进程并等待模型预热完成（阻塞调用）"""
+        parent_conn, child_conn = self.ctx.Pipe()
+        self.process = self.ctx.Process(
+            target=_model_worker_main,
+            args=(child_conn, self.warmup_options),
+            name=f"mineru-worker-{self.index}",
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+        self.jobs_done = 0
+        self.started_at = time.time()
+
+        if not self.conn.poll(startup_timeout):
+            logger.error(f"Model worker {self.index} did not become ready in {startup_timeout}s")
+            self.kill()
+            return False
+
+        try:
+            _, warmed = self.conn.recv()
+        except (EOFError, OSError):
+            logger.error(f"Model worker {self.index} exited during startup")
+            self.kill()
+            return False
+
+        logger.info(f"Model worker {self.index} ready (pid={self.process.pid}, warmed={warmed}, "
+                    f"startup={time.time() - self.started_at:.1f}s)")
+        return True
+
+    def call(self, func: Callable[..., Any], args: tuple, kwargs: dict, timeout: float) -> Any:
+        """在工作进程中执行作业（阻塞调用）"""
+        # 只使用本次调用开始时的管道：调用被放弃后池会替换 self.conn，不能读到新进程的消息
+        conn = self.conn
+        if conn is None:
+            raise ModelWorkerError(f"Model worker {self.index} is not running")
+        try:
+            conn.send(('job', func, args, kwargs))
+            if not conn.poll(timeout):
+                raise ModelWorkerTimeoutError(
+                    f"Model worker {self.index} job {getattr(func, '__name__', func)} timed out after {timeout}s"
+                )
+            kind, payload = conn.recv()
+        except (EOFError, OSError, BrokenPipeError) as e:
+            raise ModelWorkerError(f"Model worker {self.index} crashed: {e}")
+
+        self.jobs_done += 1
+        if kind == 'ok':
+            return payload
+
+        error_type, error_message, error_traceback = payload
+        raise ModelWorkerError(f"{error_type}: {error_message}\n{error_traceback}")
+
+    def ping(self, timeout: float) -> bool:
+        """健康检查（阻塞调用）"""
+        conn = self.conn
+        if conn is None or not self.is_alive():
+            return False
+        try:
+            conn.send(('ping',))
+            if not conn.poll(timeout):
+                return False
+            kind, _ = conn.recv()
+            return kind == 'pong'
+        except (EOFError, OSError, BrokenPipeError):
+            return False
+
+    def is_alive(self) -> bool:
+        """工作进程是否存活"""
+        return self.process is not None and self.process.is_alive()
+
+    def rss_bytes(self) -> int:
+        """读取工作进程常驻内存(RSS)，无法读取时返回0"""
+        if not self.is_alive():
+            return 0
+        try:
+            with open(f"/proc/{self.process.pid}/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except Exception:
+            return 0
+
+    def stop(self, timeout: float = 10) -> None:
+        """优雅停止工作进程，超时则强制结束"""
+        if self.process is None:
+            return
+        try:
+            if self.is_alive():
+                self.conn.send(('stop',))
+                self.process.join(timeout)
+        except (OSError, BrokenPipeError):
+            pass
+        self.kill()
+
+    def terminate(self) -> None:
+        """强制结束工作进程但保留管道，阻塞在管道上的调用线程会收到EOF后返回"""
+        if self.process is not None and self.process.is_alive():
+            self.process.kill()
+            self.process.join(5)
+
+    def kill(self) -> None:
+        """强制结束工作进程并关闭管道"""
+        self.terminate()
+        if self.conn is not None:
+            self.conn.close()
+        self.process = None
+        self.conn = None
+
+
+class ModelWorkerPool:
+    """
+    常驻MinerU模型工作进程池
+
+    作业函数与参数需可序列化（顶层函数），作业在空闲工作进程中串行执行。
+    """
+
+    def __init__(self,
+                 num_workers: int = 1,
+                 max_jobs_per_worker: Optional[int] = None,
+                 max_memory_mb: Optional[int] = None,
+                 health_check_interval: Optional[float] = None,
+                 startup_timeout: Optional[float] = None,
+                 warmup_options: Optional[Dict[str, Any]] = None):
+        """
+        初始化工作进程池
+
+        Args:
+            num_workers: 工作进程数
+            max_jobs_per_worker: 单个进程处理多少个作业后回收，默认读取 MODEL_WORKER_MAX_JOBS，0表示不回收
+            max_memory_mb: 进程内存上限(MB)，超过后重启，默认读取 MODEL_WORKER_MAX_MEMORY_MB，0表示不限制
+            health_check_interval: 健康检查间隔(秒)，默认读取 MODEL_WORKER_HEALTH_CHECK_INTERVAL
+            startup_timeout: 进程启动及模型预热超时(秒)，默认读取 MODEL_WORKER_STARTUP_TIMEOUT
+            warmup_options: 预热使用的流水线参数
+        """
+        self.num_workers = max(1, num_workers)
+        self.max_jobs_per_worker = int(max_jobs_per_worker if max_jobs_per_worker is not None
+                                       else os.getenv("MODEL_WORKER_MAX_JOBS", "200"))
+        self.max_memory_mb = int(max_memory_mb if max_memory_mb is not None
+                                 else os.getenv("MODEL_WORKER_MAX_MEMORY_MB", "0"))
+        self.health_check_interval = float(health_check_interval or os.getenv("MODEL_WORKER_HEALTH_CHECK_INTERVAL", "30"))
+        self.startup_timeout = float(startup_timeout or os.getenv("MODEL_WORKER_STARTUP_TIMEOUT", "600"))
+        self.warmup_options = warmup_options
+
+        # 使用spawn避免fork后CUDA上下文不可用
+        self._ctx = multiprocessing.get_context("spawn")
+        self._workers: List[_ModelWorker] = [
+            _ModelWorker(i, self._ctx, warmup_options) for i in range(self.num_workers)
+        ]
+        # 管道读写为阻塞操作，使用独立线程池执行
+        self._io_pool = ThreadPoolExecutor(max_workers=self.num_workers + 2, thread_name_prefix="model-worker-io")
+        self._idle: Optional[asyncio.Queue] = None
+        self._background_tasks: List[asyncio.Task] = []
+        self._is_running = False
+
+        self.stats = {
+            "jobs_completed": 0,
+            "jobs_failed": 0,
+            "jobs_timed_out": 0,
+            "worker_restarts": 0,
+            "recycled_by_jobs": 0,
+            "recycled_by_memory": 0,
+            "health_check_failures": 0
+        }
+
+    async def start(self):
+        """启动全部工作进程（后台预热，就绪后进入空闲队列）"""
+        if self._is_running:
+            return
+        self._is_running = True
+        self._idle = asyncio.Queue()
+
+        for worker in self._workers:
+            self._spawn_background(self._launch_worker(worker))
+        self._spawn_background(self._health_check_loop())
+
+        logger.info(f"ModelWorkerPool starting {self.num_workers} workers "
+                    f"(recycle after {self.max_jobs_per_worker} jobs, memory ceiling {self.max_memory_mb}MB)")
+
+    def _spawn_background(self, coro):
+        """创建并记录后台协程"""
+        task = asyncio.create_task(coro)
+        self._background_tasks.append(task)
+        task.add_done_callback(lambda t: t in self._background_tasks and self._background_tasks.remove(t))
+
+    async def _launch_worker(self, worker: _ModelWorker):
+        """启动（或重启）工作进程，成功后放入空闲队列，失败则退避重试"""
+        loop = asyncio.get_running_loop()
+        backoff = 1
+        while self._is_running:
+            try:
+                started = await loop.run_in_executor(self._io_pool, worker.start, self.startup_timeout)
+            except Exception as e:
+                logger.error(f"Model worker {worker.index} failed to start: {e}")
+                await loop.run_in_executor(self._io_pool, worker.kill)
+                started = False
+            worker.start_failed = not started
+            if started:
+                await self._idle.put(worker)
+                return
+            logger.warning(f"Retrying model worker {worker.index} startup in {backoff}s")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 60)
+
+    async def _restart_worker(self, worker: _ModelWorker, reason: str,
+                              pending_call: Optional[concurrent.futures.Future] = None):
+        """
+        停止并重新启动工作进程
+
+        Args:
+            worker: 工作进程句柄
+            reason: 重启原因
+            pending_call: 仍在IO线程中等待该进程结果的调用，先结束进程并等它返回，再关闭管道、启动新进程
+        """
+        logger.info(f"Restarting model worker {worker.index}: {reason}")
+        worker.restarts += 1
+        self.stats["worker_restarts"] += 1
+        loop = asyncio.get_running_loop()
+        if pending_call is not None and not pending_call.done():
+            await loop.run_in_executor(self._io_pool, worker.terminate)
+            await asyncio.gather(asyncio.wrap_future(pending_call, loop=loop), return_exceptions=True)
+        await loop.run_in_executor(self._io_pool, worker.stop)
+        self._spawn_background(self._launch_worker(worker))
+
+    async def run(self, func: Callable[..., Any], *args, timeout: float = 3600, **kwargs) -> Any:
+        """
+        在空闲工作进程中执行作业
+
+        Args:
+            func: 可序列化的顶层函数
+            *args: 位置参数
+            timeout: 作业超时时间(秒)，包含等待空闲工作进程的时间，超时后工作进程会被强制重启
+            **kwargs: 关键字参数
+
+        Returns:
+            函数返回值
+
+        Raises:
+            ModelWorkerTimeoutError: 超时前没有可用的工作进程或作业超时
+            ModelWorkerError: 全部工作进程启动失败或作业执行失败
+        """
+        if not self._is_running:
+            raise ModelWorkerError("ModelWorkerPool is not running")
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        worker = await self._acquire_worker(timeout)
+        call_future = self._io_pool.submit(worker.call, func, args, kwargs, max(0.0, deadline - loop.time()))
+        try:
+            result = await asyncio.wrap_future(call_future, loop=loop)
+            self.stats["jobs_completed"] += 1
+        except ModelWorkerTimeoutError:
+            self.stats["jobs_timed_out"] += 1
+            await self._restart_worker(worker, "job timeout")
+            raise
+        except ModelWorkerError:
+            self.stats["jobs_failed"] += 1
+            if not worker.is_alive():
+                await self._restart_worker(worker, "worker crashed")
+            else:
+                await self._release(worker)
+            raise
+        except BaseException:
+            # 协程被取消时IO线程仍阻塞在管道上：结束进程并等该线程返回后再重启，
+            # 避免它读到已关闭的管道或新进程的就绪消息
+            await self._restart_worker(worker, "job cancelled", pending_call=call_future)
+            raise
+
+        await self._release(worker)
+        return result
+
+    async def _acquire_worker(self, timeout: float) -> _ModelWorker:
+        """
+        等待空闲工作进程
+
+        Args:
+            timeout: 最长等待时间(秒)
+
+        Returns:
+            空闲工作进程
+        """
+        if self._idle.empty() and all(worker.start_failed for worker in self._workers):
+            # 工作进程都在启动失败后的退避中，立即失败而不是让作业排队等待
+            raise ModelWorkerError(f"No model worker available: all {self.num_workers} workers failed to start")
+        try:
+            return await asyncio.wait_for(self._idle.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.stats["jobs_timed_out"] += 1
+            raise ModelWorkerTimeoutError(f"No model worker became available within {timeout}s")
+
+    async def _release(self, worker: _ModelWorker):
+        """作业结束后检查回收条件，然后归还工作进程"""
+        if self.max_jobs_per_worker > 0 and worker.jobs_done >= self.max_jobs_per_worker:
+            self.stats["recycled_by_jobs"] += 1
+            await self._restart_worker(worker, f"processed {worker.jobs_done} jobs")
+            return
+
+        if self.max_memory_mb > 0:
+            rss_mb = worker.rss_bytes() / (1024 * 1024)
+            if rss_mb > self.max_memory_mb:
+                self.stats["recycled_by_memory"] += 1
+                await self._restart_worker(worker, f"RSS {rss_mb:.0f}MB exceeds {self.max_memory_mb}MB")
+                return
+
+        await self._idle.put(worker)
+
+    async def _health_check_loop(self):
+        """定期检查空闲工作进程是否存活并能响应"""
+        loop = asyncio.get_running_loop()
+        while self._is_running:
+            await asyncio.sleep(self.health_check_interval)
+
+            # 只检查当前空闲的进程，忙碌进程由作业结果判断健康状态
+            idle_workers = []
+            while not self._idle.empty():
+                idle_workers.append(self._idle.get_nowait())
+
+            for worker in idle_workers:
+                healthy = await loop.run_in_executor(self._io_pool, worker.ping, 10)
+                if healthy:
+                    await self._release(worker)
+                else:
+                    self.stats["health_check_failures"] += 1
+                    await self._restart_worker(worker, "health check failed")
+
+    async def shutdown(self):
+        """停止全部工作进程"""
+        if not self._is_running:
+            return
+        self._is_running = False
+
+        for task in list(self._background_tasks):
+            task.cancel()
+        await asyncio.gather(*self._background_tasks, return_exceptions=True)
+
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[
+            loop.run_in_executor(self._io_pool, worker.stop) for worker in self._workers
+        ], return_exceptions=True)
+        self._io_pool.shutdown(wait=False)
+        logger.info("ModelWorkerPool shut down")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取工作进程池统计信息"""
+        return {
+            **self.stats,
+            "num_workers": self.num_workers,
+            "idle_workers": self._idle.qsize() if self._idle else 0,
+            "workers": [
+                {
+                    "index": worker.index,
+                    "pid": worker.process.pid if worker.process else None,
+                    "alive": worker.is_alive(),
+                    "start_failed": worker.start_failed,
+                    "jobs_done": worker.jobs_done,
+                    "restarts": worker.restarts,
+                    "rss_mb": round(worker.rss_bytes() / (1024 * 1024), 1)
+                }
+                for worker in self._workers
+            ]
+        }
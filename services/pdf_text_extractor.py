@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+PDF文本层快速通道
+抽样检查PDF页面的文本层覆盖、图片面积占比和乱码比例，判断文档是否为原生数字PDF；
+原生数字PDF直接从文本层生成Markdown，不经过MinerU的版面、OCR、公式和表格模型。
+本模块中的函数均为同步函数，由调用方放到线程中执行。
+"""
+
+import os
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import pypdfium2 as pdfium
+import pypdfium2.raw as pdfium_c
+
+from utils.logging_utils import configure_logging
+
+logger = configure_logging(name=__name__)
+
+# 段落结束标点：行尾是这些字符时不与下一行合并
+_PARAGRAPH_END = tuple("。！？；：.!?;:」』》）)")
+_CJK_RE = re.compile("[\u3000-\u9fff\uff00-\uffef]")
+_LIST_ITEM_RE = re.compile(r"^(\d+[.、)）]|[(（]\d+[)）]|[-•·*])\s*")
+
+
+def resolve_fast_path(params: Optional[Dict[str, Any]] = None) -> bool:
+    """
+    判断任务是否启用文本层快速通道
+
+    Args:
+        params: 任务参数，fast_path 优先于环境变量 PDF_FAST_PATH
+
+    Returns:
+        是否启用
+    """
+    value = (params or {}).get('fast_path')
+    if value is None:
+        value = os.getenv("PDF_FAST_PATH", "false")
+    if isinstance(value, str):
+        return value.lower() in ("1", "true", "yes", "on")
+    return bool(value)
+
+
+def _sample_page_indices(page_count: int, sample_pages: int) -> List[int]:
+    """在全文范围内均匀抽样页码（包含首页和末页）"""
+    if page_count <= sample_pages:
+        return list(range(page_count))
+    step = (page_count - 1) / (sample_pages - 1) if sample_pages > 1 else 0
+    return sorted({round(i * step) for i in range(sample_pages)})
+
+
+def _image_area_ratio(page) -> float:
+    """计算页面中图片对象覆盖面积占页面面积的比例"""
+    width, height = page.get_size()
+    page_area = width * height
+    if page_area <= 0:
+        return 0.0
+    image_area = 0.0
+    for obj in page.get_objects(filter=[pdfium_c.FPDF_PAGEOBJ_IMAGE], max_depth=2):
+        left, bottom, right, top = obj.get_pos()
+        image_area += max(0.0, right - left) * max(0.0, top - bottom)
+    return min(1.0, image_area / page_area)
+
+
+def _garbled_ratio(text: str) -> float:
+    """文本中无法映射到Unicode的字符（替换符、私有区、控制字符）所占比例"""
+    chars = [c for c in text if not c.isspace()]
+    if not chars:
+        return 0.0
+    garbled = sum(
+        1 for c in chars
+        if c == "\ufffd" or "\ue000" <= c <= "\uf8ff" or ord(c) < 32
+    )
+    return garbled / len(chars)
+
+
+def classify_pdf(input_path: str,
+                 sample_pages: Optional[int] = None,
+                 min_chars: Optional[int] = None,
+                 max_image_ratio: Optional[float] = None) -> Dict[str, Any]:
+    """
+    抽样判断PDF应走文本层快速通道还是完整MinerU流水线
+
+    任一抽样页文本过少（扫描件）、图片面积过大（图表/插图需要版面分析）或乱码过多（字体缺少ToUnicode映射）时，
+    整个文档走完整流水线。
+
+    Args:
+        input_path: PDF路径
+        sample_pages: 抽样页数，默认读取 PDF_FAST_PATH_SAMPLE_PAGES
+        min_chars: 每个抽样页最少的文本字符数，默认读取 PDF_FAST_PATH_MIN_CHARS
+        max_image_ratio: 每个抽样页图片面积占比上限，默认读取 PDF_FAST_PATH_MAX_IMAGE_RATIO
+
+    Returns:
+        分类结果，包含 route（text / pipeline）、reason、page_count、sampled_pages 和抽样统计
+    """
+    sample_pages = int(sample_pages or os.getenv("PDF_FAST_PATH_SAMPLE_PAGES", "8"))
+    min_chars = int(min_chars or os.getenv("PDF_FAST_PATH_MIN_CHARS", "100"))
+    if max_image_ratio is None:
+        max_image_ratio = float(os.getenv("PDF_FAST_PATH_MAX_IMAGE_RATIO", "0.2"))
+
+    pdf = pdfium.PdfDocument(input_path)
+    try:
+        page_count = len(pdf)
+        indices = _sample_page_indices(page_count, max(1, sample_pages))
+        reason = None
+        min_page_chars = None
+        max_page_image_ratio = 0.0
+        max_page_garbled_ratio = 0.0
+
+        for index in indices:
+            page = pdf[index]
+            try:
+                textpage = page.get_textpage()
+                try:
+                    text = textpage.get_text_range()
+                finally:
+                    textpage.close()
+                char_count = len([c for c in text if not c.isspace()])
+                image_ratio = _image_area_ratio(page)
+                garbled_ratio = _garbled_ratio(text)
+            finally:
+                page.close()
+
+            min_page_chars = char_count if min_page_chars is None else min(min_page_chars, char_count)
+            max_page_image_ratio = max(max_page_image_ratio, image_ratio)
+            max_page_garbled_ratio = max(max_page_garbled_ratio, garbled_ratio)
+
+            if char_count < min_chars:
+                reason = f"page {index} has {char_count} text chars (< {min_chars})"
+            elif image_ratio > max_image_ratio:
+                reason = f"page {index} image area ratio {image_ratio:.2f} (> {max_image_ratio})"
+            elif garbled_ratio > 0.05:
+                reason = f"page {index} garbled text ratio {garbled_ratio:.2f}"
+            if reason:
+                break
+
+        if page_count == 0:
+            reason = "empty document"
+    finally:
+        pdf.close()
+
+    return {
+        'route': 'pipeline' if reason else 'text',
+        'reason': reason or "text layer covers all sampled pages",
+        'page_count': page_count,
+        'sampled_pages': len(indices),
+        'min_page_chars': min_page_chars or 0,
+        'max_image_ratio': round(max_page_image_ratio, 4),
+        'max_garbled_ratio': round(max_page_garbled_ratio, 4)
+    }
+
+
+def _lines_to_paragraphs(lines: List[str]) -> List[str]:
+    """
+    把文本层按行输出的内容合并为段落
+
+    折行产生的行接近满行宽度；行尾是结束标点、明显短于满行（标题、段尾），
+    或下一行以列表编号开头时结束当前段落。
+    """
+    if not lines:
+        return []
+    lengths = sorted(len(line) for line in lines)
+    full_width = lengths[int(len(lengths) * 0.8)] if len(lengths) > 1 else lengths[0]
+
+    paragraphs = []
+    current = ""
+    for line in lines:
+        if current and _LIST_ITEM_RE.match(line):
+            paragraphs.append(current)
+            current = ""
+        if not current:
+            current = line
+        elif _CJK_RE.search(current[-1]) or _CJK_RE.search(line[0]):
+            current += line
+        elif current.endswith("-"):
+            current = current[:-1] + line
+        else:
+            current += " " + line
+        if line.endswith(_PARAGRAPH_END) or len(line) < full_width * 0.8:
+            paragraphs.append(current)
+            current = ""
+    if current:
+        paragraphs.append(current)
+    return paragraphs
+
+
+def extract_text_to_markdown(input_path: str, output_path: str) -> Dict[str, Any]:
+    """
+    从PDF文本层生成Markdown
+
+    Args:
+        input_path: PDF路径
+        output_path: 输出Markdown路径
+
+    Returns:
+        结果字典，包含 page_count 和 char_count
+    """
+    output_file = Path(output_path)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+
+    pages = []
+    char_count = 0
+    pdf = pdfium.PdfDocument(input_path)
+    try:
+        page_count = len(pdf)
+        for index in range(page_count):
+            page = pdf[index]
+            try:
+                textpage = page.get_textpage()
+                try:
+                    text = textpage.get_text_range()
+                finally:
+                    textpage.close()
+            finally:
+                page.close()
+
+            lines = [line.strip() for line in text.replace("\r\n", "\n").replace("\r", "\n").split("\n")]
+            paragraphs = _lines_to_paragraphs([line for line in lines if line])
+            char_count += sum(len(p) for p in paragraphs)
+            pages.append("\n\n".join(paragraphs))
+    finally:
+        pdf.close()
+
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write("\n\n".join(page for page in pages if page) + "\n")
+
+    logger.info(f"Text layer extracted: {input_path} -> {output_path} ({page_count} pages, {char_count} chars)")
+    return {
+        'page_count': page_count,
+        'char_count': char_count
+    }
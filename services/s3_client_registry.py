@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+S3客户端注册表
+按 端点 + 区域 + 凭证 缓存boto3 S3客户端，下载与上传服务共享同一组连接池，
+避免每次操作都重新构建客户端；连通性检查只在启动时显式执行一次。
+"""
+
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError, NoCredentialsError
+
+from utils.logging_utils import configure_logging
+
+logger = configure_logging(name=__name__)
+
+_clients: Dict[Tuple, Any] = {}
+_probe_results: Dict[Tuple, Dict[str, Any]] = {}
+_lock = threading.Lock()
+
+
+def _client_key(config: Dict[str, Any]) -> Tuple:
+    """由S3配置生成缓存键"""
+    return (
+        config.get("s3_endpoint_url") or "",
+        config.get("aws_region") or "us-east-1",
+        config.get("aws_access_key_id") or "",
+        config.get("aws_secret_access_key") or "",
+    )
+
+
+def _build_client_config() -> Config:
+    """构建botocore客户端配置（连接池大小、长连接、超时与重试）"""
+    return Config(
+        max_pool_connections=int(os.getenv("S3_MAX_POOL_CONNECTIONS", "50")),
+        tcp_keepalive=os.getenv("S3_TCP_KEEPALIVE", "true").lower() == "true",
+        connect_timeout=float(os.getenv("S3_CONNECT_TIMEOUT", "10")),
+        read_timeout=float(os.getenv("S3_READ_TIMEOUT", "60")),
+        retries={"max_attempts": int(os.getenv("S3_MAX_ATTEMPTS", "5")), "mode": "standard"}
+    )
+
+
+def get_s3_client(config: Dict[str, Any]):
+    """
+    获取（必要时创建）共享的S3客户端
+
+    Args:
+        config: S3配置字典（aws_access_key_id / aws_secret_access_key / s3_endpoint_url / aws_region）
+
+    Returns:
+        boto3 S3客户端（线程安全，可在线程池中并发使用）
+    """
+    key = _client_key(config)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client_kwargs = {
+                "aws_access_key_id": config.get("aws_access_key_id"),
+                "aws_secret_access_key": config.get("aws_secret_access_key"),
+                "region_name": config.get("aws_region", "us-east-1"),
+                "config": _build_client_config()
+            }
+            # 如果提供了自定义endpoint，使用它
+            if config.get("s3_endpoint_url"):
+                client_kwargs["endpoint_url"] = config["s3_endpoint_url"]
+
+            # 默认Session不是线程安全的，每个客户端使用独立Session创建
+            client = boto3.session.Session().client("s3", **client_kwargs)
+            _clients[key] = client
+            logger.info(f"S3 client created for endpoint: {config.get('s3_endpoint_url') or 'AWS S3'}")
+    return client
+
+
+def probe_s3_connection(config: Dict[str, Any], force: bool = False) -> Dict[str, Any]:
+    """
+    检查S3连通性（每组配置只检查一次，结果会被缓存）
+
+    Args:
+        config: S3配置字典
+        force: 是否忽略缓存重新检查
+
+    Returns:
+        检查结果字典，包含 success 和 error
+    """
+    key = _client_key(config)
+    if not force and key in _probe_results:
+        return _probe_results[key]
+
+    endpoint = config.get("s3_endpoint_url") or "AWS S3"
+    try:
+        get_s3_client(config).list_buckets()
+        result = {'success': True, 'endpoint': endpoint}
+        logger.info(f"S3 connection probe succeeded for endpoint: {endpoint}")
+    except NoCredentialsError:
+        result = {'success': False, 'endpoint': endpoint, 'error': "S3 credentials not provided or invalid"}
+    except ClientError as e:
+        result = {'success': False, 'endpoint': endpoint, 'error': f"S3 error: {e}"}
+    except Exception as e:
+        result = {'success': False, 'endpoint': endpoint, 'error': str(e)}
+
+    if not result['success']:
+        logger.warning(f"S3 connection probe failed for endpoint {endpoint}: {result['error']}")
+    _probe_results[key] = result
+    return result
+
+
+def clear_s3_clients() -> None:
+    """清空缓存的客户端和检查结果（凭证轮换后调用）"""
+    with _lock:
+        _clients.clear()
+        _probe_results.clear()
@@ -9,11 +9,13 @@ import boto3
 import aiofiles
 import asyncio
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, AsyncIterator, List
 from datetime import datetime
+from email.utils import format_datetime
 from botocore.exceptions import ClientError, NoCredentialsError
 
 from utils.logging_utils import configure_logging
+from services.s3_client_registry import get_s3_client, probe_s3_connection
 
 logger = configure_logging(name=__name__)
 
@@ -23,6 +25,8 @@ class S3DownloadService:
     
     def __init__(self):
         """初始化S3下载服务"""
+        # 流式下载时每次从S3读取的块大小，决定单个下载请求占用的内存上限
+        self.stream_chunk_size = int(os.getenv("S3_DOWNLOAD_CHUNK_SIZE_KB", "1024")) * 1024
         self.default_config = self._get_default_download_config()
     
     def _get_default_download_config(self) -> Dict[str, Any]:
@@ -62,7 +66,7 @@ class S3DownloadService:
     
     def create_s3_client(self, config: Optional[Dict[str, Any]] = None) -> boto3.client:
         """
-        创建S3客户端
+        获取S3客户端（按端点和凭证共享，不再逐次创建和检查连接）
         
         Args:
             config: S3配置字典，如果为None则使用默认配置
@@ -74,36 +78,30 @@ class S3DownloadService:
             config = self.default_config
             
         try:
-            client_config = {
-                "aws_access_key_id": config.get("aws_access_key_id"),
-                "aws_secret_access_key": config.get("aws_secret_access_key"),
-                "region_name": config.get("aws_region", "us-east-1")
-            }
-            
-            # 如果提供了自定义endpoint，使用它
-            if config.get("s3_endpoint_url"):
-                client_config["endpoint_url"] = config["s3_endpoint_url"]
-            
-            s3_client = boto3.client("s3", **client_config)
-            
-            # 测试连接
-            s3_client.list_buckets()
-            
-            logger.info(f"S3 download client created successfully for endpoint: {config.get('s3_endpoint_url', 'AWS S3')}")
-            return s3_client
-            
+            return get_s3_client(config)
         except NoCredentialsError:
             raise ValueError("S3 credentials not provided or invalid")
-        except ClientError as e:
-            raise ValueError(f"Failed to create S3 client: {str(e)}")
         except Exception as e:
             raise ValueError(f"Unexpected error creating S3 client: {str(e)}")
+
+    async def probe_connection(self, config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        检查S3连通性（启动时调用一次）
+
+        Args:
+            config: S3配置字典，如果为None则使用默认配置
+
+        Returns:
+            检查结果字典
+        """
+        return await asyncio.to_thread(probe_s3_connection, config or self.default_config)
     
     async def download_file(self,
                           bucket_name: str,
                           s3_key: str,
                           local_file_path: str,
-                          s3_config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+                          s3_config: Optional[Dict[str, Any]] = None,
+                          object_info: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         从S3下载文件到本地
 
@@ -112,6 +110,7 @@ class S3DownloadService:
             s3_key: S3对象键
             local_file_path: 本地文件保存路径
             s3_config: S3配置，如果为None则使用默认配置
+            object_info: 调用方已通过 check_file_exists 获取的对象信息，提供时不再重复HEAD
 
         Returns:
             下载结果字典
@@ -139,19 +138,24 @@ class S3DownloadService:
             logger.info(f"Starting download from s3://{bucket_name}/{s3_key} to {local_file_path}")
             
             # 获取文件信息
-            try:
-                head_response = s3_client.head_object(Bucket=bucket_name, Key=s3_key)
-                file_size = head_response.get('ContentLength', 0)
-                last_modified = head_response.get('LastModified')
-                content_type = head_response.get('ContentType', 'application/octet-stream')
-                
-                logger.info(f"File info - Size: {file_size} bytes, Type: {content_type}, Modified: {last_modified}")
-                
-            except ClientError as e:
-                if e.response['Error']['Code'] == 'NoSuchKey':
-                    raise FileNotFoundError(f"File not found in S3: s3://{bucket_name}/{s3_key}")
-                else:
-                    raise
+            if object_info and object_info.get('exists'):
+                file_size = object_info.get('file_size', 0)
+                last_modified = object_info.get('last_modified')
+                content_type = object_info.get('content_type', 'application/octet-stream')
+            else:
+                try:
+                    head_response = s3_client.head_object(Bucket=bucket_name, Key=s3_key)
+                    file_size = head_response.get('ContentLength', 0)
+                    last_modified = head_response.get('LastModified')
+                    content_type = head_response.get('ContentType', 'application/octet-stream')
+
+                except ClientError as e:
+                    if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                        raise FileNotFoundError(f"File not found in S3: s3://{bucket_name}/{s3_key}")
+                    else:
+                        raise
+
+            logger.info(f"File info - Size: {file_size} bytes, Type: {content_type}, Modified: {last_modified}")
             
             # 在线程池中执行下载（避免阻塞事件循环）
             loop = asyncio.get_event_loop()
@@ -306,6 +310,140 @@ class S3DownloadService:
                 'error_type': type(e).__name__
             }
 
+    async def open_object_stream(self,
+                                 bucket_name: str,
+                                 s3_key: str,
+                                 range_header: Optional[str] = None,
+                                 if_range: Optional[str] = None,
+                                 if_none_match: Optional[str] = None,
+                                 if_modified_since: Optional[str] = None,
+                                 s3_config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        打开S3对象的流式读取（不把对象读入内存）
+
+        Range / If-None-Match / If-Modified-Since 直接透传给S3，由S3完成范围计算与条件判断。
+        S3不支持多段范围，此时按完整对象返回；If-Range与对象ETag不一致时也返回完整对象。
+
+        Args:
+            bucket_name: S3存储桶名称
+            s3_key: S3对象键
+            range_header: 客户端的Range请求头
+            if_range: 客户端的If-Range请求头
+            if_none_match: 客户端的If-None-Match请求头
+            if_modified_since: 客户端的If-Modified-Since请求头
+            s3_config: S3配置，如果为None则使用默认配置
+
+        Returns:
+            结果字典：status 为 200/206/304/416；200/206 时 body 为S3流式响应体，
+            headers 为需要返回给客户端的响应头
+        """
+        try:
+            from utils.encoding_utils import EncodingUtils
+
+            s3_key = EncodingUtils.ensure_utf8(s3_key)
+            s3_client = self.create_s3_client(s3_config or self.default_config)
+
+            request_args = {'Bucket': bucket_name, 'Key': s3_key}
+            if range_header and range_header.strip().startswith('bytes=') and ',' not in range_header:
+                request_args['Range'] = range_header.strip()
+            if if_none_match:
+                request_args['IfNoneMatch'] = if_none_match
+            elif if_modified_since:
+                try:
+                    from email.utils import parsedate_to_datetime
+                    request_args['IfModifiedSince'] = parsedate_to_datetime(if_modified_since)
+                except (TypeError, ValueError):
+                    pass
+
+            loop = asyncio.get_event_loop()
+            try:
+                response = await loop.run_in_executor(None, lambda: s3_client.get_object(**request_args))
+            except ClientError as e:
+                error_code = str(e.response.get('Error', {}).get('Code', ''))
+                if error_code in ('304', 'NotModified'):
+                    headers = e.response.get('ResponseMetadata', {}).get('HTTPHeaders', {})
+                    not_modified_headers = {}
+                    if headers.get('etag'):
+                        not_modified_headers['ETag'] = headers['etag']
+                    if headers.get('last-modified'):
+                        not_modified_headers['Last-Modified'] = headers['last-modified']
+                    return {'success': True, 'status': 304, 'body': None, 'headers': not_modified_headers}
+                if error_code == 'InvalidRange':
+                    head = await loop.run_in_executor(None, lambda: s3_client.head_object(Bucket=bucket_name, Key=s3_key))
+                    return {
+                        'success': True,
+                        'status': 416,
+                        'body': None,
+                        'headers': {'Content-Range': f"bytes */{head.get('ContentLength', 0)}"}
+                    }
+                raise
+
+            # If-Range不匹配（对象已变化）时放弃范围请求，重新读取完整对象
+            if 'Range' in request_args and if_range and if_range != response.get('ETag'):
+                response['Body'].close()
+                request_args.pop('Range')
+                response = await loop.run_in_executor(None, lambda: s3_client.get_object(**request_args))
+
+            headers = {
+                'Accept-Ranges': 'bytes',
+                'Content-Length': str(response.get('ContentLength', 0))
+            }
+            if response.get('ETag'):
+                headers['ETag'] = response['ETag']
+            if response.get('LastModified'):
+                headers['Last-Modified'] = format_datetime(response['LastModified'], usegmt=True)
+            if response.get('ContentRange'):
+                headers['Content-Range'] = response['ContentRange']
+
+            return {
+                'success': True,
+                'status': 206 if response.get('ContentRange') else 200,
+                'body': response['Body'],
+                'headers': headers,
+                'content_type': response.get('ContentType', 'application/octet-stream'),
+                's3_url': f"s3://{bucket_name}/{s3_key}"
+            }
+
+        except ClientError as e:
+            error_code = e.response['Error']['Code']
+            error_message = e.response['Error']['Message']
+            logger.error(f"S3 client error ({error_code}): {error_message}")
+            return {
+                'success': False,
+                'error': f"S3 error: {error_message}",
+                'error_type': 'S3ClientError',
+                'error_code': error_code
+            }
+        except Exception as e:
+            logger.error(f"Unexpected error opening S3 stream: {e}")
+            return {
+                'success': False,
+                'error': str(e),
+                'error_type': type(e).__name__
+            }
+
+    async def iter_object_chunks(self, body, chunk_size: Optional[int] = None) -> AsyncIterator[bytes]:
+        """
+        按块异步读取S3响应体，同一时刻只在内存中保留一个块
+
+        Args:
+            body: open_object_stream 返回的S3流式响应体
+            chunk_size: 块大小，默认读取 S3_DOWNLOAD_CHUNK_SIZE_KB
+
+        Yields:
+            数据块
+        """
+        chunk_size = chunk_size or self.stream_chunk_size
+        try:
+            while True:
+                chunk = await asyncio.to_thread(body.read, chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            # 客户端中途断开时关闭连接，归还连接池
+            body.close()
+
     async def check_file_exists(self, 
                               bucket_name: str,
                               s3_key: str,
@@ -325,7 +463,11 @@ class S3DownloadService:
             config = s3_config or self.default_config
             s3_client = self.create_s3_client(config)
             
-            head_response = s3_client.head_object(Bucket=bucket_name, Key=s3_key)
+            loop = asyncio.get_event_loop()
+            head_response = await loop.run_in_executor(
+                None,
+                lambda: s3_client.head_object(Bucket=bucket_name, Key=s3_key)
+            )
             
             return {
                 'exists': True,
@@ -336,7 +478,8 @@ class S3DownloadService:
             }
             
         except ClientError as e:
-            if e.response['Error']['Code'] == 'NoSuchKey':
+            # head_object 对不存在的对象返回404而不是NoSuchKey
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
                 return {'exists': False}
             else:
                 logger.error(f"Error checking file existence: {e}")
@@ -351,6 +494,68 @@ class S3DownloadService:
                 'error': str(e)
             }
     
+    async def list_objects(self,
+                           bucket_name: str,
+                           prefix: str = "",
+                           suffixes: Optional[List[str]] = None,
+                           max_keys: Optional[int] = None,
+                           s3_config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        列出前缀下的对象（分页读取，跳过目录占位对象）
+
+        Args:
+            bucket_name: S3存储桶名称
+            prefix: 对象键前缀
+            suffixes: 只保留这些扩展名的对象（不区分大小写），为空时不过滤
+            max_keys: 最多返回的对象数，超出时 truncated 为True
+            s3_config: S3配置
+
+        Returns:
+            结果字典，objects 为 {key, size, etag} 列表
+        """
+        suffixes = tuple(suffix.lower() for suffix in suffixes or [])
+
+        def list_keys():
+            s3_client = self.create_s3_client(s3_config or self.default_config)
+            paginator = s3_client.get_paginator('list_objects_v2')
+            objects = []
+            for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+                for item in page.get('Contents', []):
+                    key = item['Key']
+                    if key.endswith('/') or (suffixes and not key.lower().endswith(suffixes)):
+                        continue
+                    if max_keys is not None and len(objects) >= max_keys:
+                        return objects, True
+                    objects.append({
+                        'key': key,
+                        'size': item.get('Size', 0),
+                        'etag': item.get('ETag', '').strip('"')
+                    })
+            return objects, False
+
+        try:
+            objects, truncated = await asyncio.to_thread(list_keys)
+            logger.info(f"Listed {len(objects)} objects under s3://{bucket_name}/{prefix}" +
+                        (" (truncated)" if truncated else ""))
+            return {
+                'success': True,
+                'objects': objects,
+                'truncated': truncated
+            }
+        except ClientError as e:
+            logger.error(f"S3 error listing s3://{bucket_name}/{prefix}: {e}")
+            return {
+                'success': False,
+                'error': f"S3 error: {e}",
+                'error_code': e.response.get('Error', {}).get('Code')
+            }
+        except Exception as e:
+            logger.error(f"Unexpected error listing s3://{bucket_name}/{prefix}: {e}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
     async def get_download_url(self, 
                              bucket_name: str,
                              s3_key: str,
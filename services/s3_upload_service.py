@@ -5,17 +5,24 @@ S3上传服务
 """
 
 import os
+import base64
+import hashlib
+import inspect
 import boto3
 import asyncio
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable, List
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from botocore.exceptions import ClientError, NoCredentialsError
 
 from utils.logging_utils import configure_logging
+from services.s3_client_registry import get_s3_client, probe_s3_connection
 
 logger = configure_logging(name=__name__)
 
+MB = 1024 * 1024
+
 
 class S3UploadService:
     """S3上传服务类"""
@@ -23,6 +30,13 @@ class S3UploadService:
     def __init__(self):
         """初始化S3上传服务"""
         self.default_config = self._get_default_upload_config()
+        # 目录上传时同时进行的文件传输数
+        self.upload_concurrency = max(1, int(os.getenv("S3_UPLOAD_CONCURRENCY", "8")))
+        # 超过阈值的文件使用分片上传，分片大小与单文件分片并发数可配置
+        self.multipart_threshold = int(os.getenv("S3_MULTIPART_THRESHOLD_MB", "16")) * MB
+        # S3要求除最后一片外每片至少5MB
+        self.multipart_chunksize = max(5, int(os.getenv("S3_MULTIPART_CHUNKSIZE_MB", "16"))) * MB
+        self.multipart_concurrency = max(1, int(os.getenv("S3_MULTIPART_CONCURRENCY", "4")))
     
     def _get_default_upload_config(self) -> Dict[str, Any]:
         """获取默认上传配置"""
@@ -64,7 +78,7 @@ class S3UploadService:
     
     def create_s3_client(self, config: Optional[Dict[str, Any]] = None) -> boto3.client:
         """
-        创建S3客户端
+        获取S3客户端（按端点和凭证共享，不再逐次创建和检查连接）
         
         Args:
             config: S3配置字典，如果为None则使用默认配置
@@ -76,30 +90,23 @@ class S3UploadService:
             config = self.default_config
             
         try:
-            client_config = {
-                "aws_access_key_id": config.get("aws_access_key_id"),
-                "aws_secret_access_key": config.get("aws_secret_access_key"),
-                "region_name": config.get("aws_region", "us-east-1")
-            }
-            
-            # 如果提供了自定义endpoint，使用它
-            if config.get("s3_endpoint_url"):
-                client_config["endpoint_url"] = config["s3_endpoint_url"]
-            
-            s3_client = boto3.client("s3", **client_config)
-            
-            # 测试连接
-            s3_client.list_buckets()
-            
-            logger.info(f"S3 upload client created successfully for endpoint: {config.get('s3_endpoint_url', 'AWS S3')}")
-            return s3_client
-            
+            return get_s3_client(config)
         except NoCredentialsError:
             raise ValueError("S3 credentials not provided or invalid")
-        except ClientError as e:
-            raise ValueError(f"Failed to create S3 client: {str(e)}")
         except Exception as e:
             raise ValueError(f"Unexpected error creating S3 client: {str(e)}")
+
+    async def probe_connection(self, config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        检查S3连通性（启动时调用一次）
+
+        Args:
+            config: S3配置字典，如果为None则使用默认配置
+
+        Returns:
+            检查结果字典
+        """
+        return await asyncio.to_thread(probe_s3_connection, config or self.default_config)
     
     async def upload_file(self, 
                          local_file_path: str,
@@ -153,29 +160,13 @@ class S3UploadService:
             if content_type:
                 extra_args['ContentType'] = content_type
 
-            # 在线程池中执行上传（避免阻塞事件循环）
+            # 在线程池中执行上传（避免阻塞事件循环），由服务端校验Content-MD5并比对返回的ETag
             loop = asyncio.get_event_loop()
-            await loop.run_in_executor(
+            etag = await loop.run_in_executor(
                 None,
-                lambda: s3_client.upload_file(
-                    str(local_path),
-                    bucket,
-                    s3_key,
-                    ExtraArgs=extra_args if extra_args else None
-                )
+                lambda: self._upload_file_verified(s3_client, local_path, bucket, s3_key, file_size, extra_args)
             )
             
-            # 验证上传结果
-            try:
-                head_response = s3_client.head_object(Bucket=bucket, Key=s3_key)
-                uploaded_size = head_response.get('ContentLength', 0)
-                
-                if uploaded_size != file_size:
-                    raise ValueError(f"Upload size mismatch. Expected: {file_size}, Got: {uploaded_size}")
-                
-            except ClientError as e:
-                raise ValueError(f"Failed to verify uploaded file: {e}")
-            
             end_time = datetime.now()
             upload_time = (end_time - start_time).total_seconds()
             
@@ -210,6 +201,7 @@ class S3UploadService:
                 'file_size': file_size,
                 'upload_time': upload_time,
                 'content_type': content_type,
+                'etag': etag,
                 'metadata': metadata
             }
             
@@ -238,14 +230,114 @@ class S3UploadService:
                 'error_type': type(e).__name__
             }
     
+    def _upload_file_verified(self,
+                              s3_client,
+                              local_path: Path,
+                              bucket: str,
+                              s3_key: str,
+                              file_size: int,
+                              extra_args: Dict[str, Any]) -> str:
+        """
+        同步上传单个文件并校验完整性（在线程池中调用）
+
+        小文件使用 put_object 附带 Content-MD5；大文件使用分片上传，每个分片附带 Content-MD5，
+        完成后用本地计算的分片ETag（各分片MD5拼接后的MD5-分片数）与服务端返回值比对，
+        无需再发起 head_object 请求。
+
+        Args:
+            s3_client: S3客户端
+            local_path: 本地文件路径
+            bucket: 存储桶名称
+            s3_key: S3对象键
+            file_size: 文件大小
+            extra_args: 额外参数（Metadata / ContentType）
+
+        Returns:
+            服务端返回的ETag（不含引号）
+        """
+        if file_size < self.multipart_threshold:
+            data = local_path.read_bytes()
+            digest = hashlib.md5(data).digest()
+            response = s3_client.put_object(
+                Bucket=bucket,
+                Key=s3_key,
+                Body=data,
+                ContentMD5=base64.b64encode(digest).decode('ascii'),
+                **extra_args
+            )
+            expected_etag = digest.hex()
+        else:
+            response, expected_etag = self._multipart_upload(s3_client, local_path, bucket, s3_key, file_size, extra_args)
+
+        etag = response.get('ETag', '').strip('"')
+        if etag != expected_etag:
+            # 服务端已按Content-MD5校验数据；SSE-KMS等加密方式下ETag不是MD5，只记录警告
+            logger.warning(f"ETag mismatch for s3://{bucket}/{s3_key}. Expected: {expected_etag}, Got: {etag}")
+        return etag
+
+    def _multipart_upload(self,
+                          s3_client,
+                          local_path: Path,
+                          bucket: str,
+                          s3_key: str,
+                          file_size: int,
+                          extra_args: Dict[str, Any]):
+        """
+        分片并发上传大文件
+
+        Returns:
+            (complete_multipart_upload响应, 期望的ETag)
+        """
+        chunk_size = self.multipart_chunksize
+        part_count = (file_size + chunk_size - 1) // chunk_size
+        upload_id = s3_client.create_multipart_upload(Bucket=bucket, Key=s3_key, **extra_args)['UploadId']
+
+        def upload_part(part_number: int) -> Dict[str, Any]:
+            # 每个分片独立打开文件按偏移读取，避免线程间共享文件指针
+            with open(local_path, 'rb') as f:
+                f.seek((part_number - 1) * chunk_size)
+                data = f.read(chunk_size)
+            digest = hashlib.md5(data).digest()
+            response = s3_client.upload_part(
+                Bucket=bucket,
+                Key=s3_key,
+                UploadId=upload_id,
+                PartNumber=part_number,
+                Body=data,
+                ContentMD5=base64.b64encode(digest).decode('ascii')
+            )
+            return {'PartNumber': part_number, 'ETag': response['ETag'], 'digest': digest}
+
+        try:
+            with ThreadPoolExecutor(max_workers=min(self.multipart_concurrency, part_count)) as pool:
+                parts = list(pool.map(upload_part, range(1, part_count + 1)))
+
+            response = s3_client.complete_multipart_upload(
+                Bucket=bucket,
+                Key=s3_key,
+                UploadId=upload_id,
+                MultipartUpload={'Parts': [{'PartNumber': p['PartNumber'], 'ETag': p['ETag']} for p in parts]}
+            )
+        except Exception:
+            try:
+                s3_client.abort_multipart_upload(Bucket=bucket, Key=s3_key, UploadId=upload_id)
+            except Exception as abort_error:
+                logger.warning(f"Failed to abort multipart upload for s3://{bucket}/{s3_key}: {abort_error}")
+            raise
+
+        expected_etag = f"{hashlib.md5(b''.join(p['digest'] for p in parts)).hexdigest()}-{part_count}"
+        logger.debug(f"Multipart upload completed for s3://{bucket}/{s3_key}: {part_count} parts")
+        return response, expected_etag
+
     async def upload_directory(self,
                              local_dir_path: str,
                              s3_prefix: str,
                              bucket_name: Optional[str] = None,
                              s3_config: Optional[Dict[str, Any]] = None,
-                             metadata: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+                             metadata: Optional[Dict[str, str]] = None,
+                             progress_callback: Optional[Callable[[Dict[str, Any]], Any]] = None) -> Dict[str, Any]:
         """
-        上传整个目录到S3
+        并发上传整个目录到S3
 
         Args:
             local_dir_path: 本地目录路径
@@ -253,6 +345,7 @@ class S3UploadService:
             bucket_name: S3存储桶名称
             s3_config: S3配置
             metadata: 文件元数据
+            progress_callback: 每个文件上传结束后的回调（可为协程函数），参数为进度字典
 
         Returns:
             上传结果字典
@@ -262,21 +355,23 @@ class S3UploadService:
             if not local_dir.exists() or not local_dir.is_dir():
                 raise ValueError(f"Local directory not found or not a directory: {local_dir_path}")
 
-            uploaded_files = []
-            failed_files = []
-            total_size = 0
+            # 递归收集目录中的所有文件
+            files = sorted(file_path for file_path in local_dir.rglob("*") if file_path.is_file())
+            total_files = len(files)
+            total_bytes = sum(file_path.stat().st_size for file_path in files)
+
+            semaphore = asyncio.Semaphore(self.upload_concurrency)
+            progress = {'completed_files': 0, 'uploaded_bytes': 0}
 
-            # 递归遍历目录中的所有文件
-            for file_path in local_dir.rglob("*"):
-                if file_path.is_file():
-                    # 计算相对路径
-                    relative_path = file_path.relative_to(local_dir)
-                    s3_key = f"{s3_prefix.rstrip('/')}/{relative_path.as_posix()}"
+            async def upload_one(file_path: Path) -> Dict[str, Any]:
+                # 计算相对路径
+                relative_path = file_path.relative_to(local_dir)
+                s3_key = f"{s3_prefix.rstrip('/')}/{relative_path.as_posix()}"
 
+                async with semaphore:
                     try:
                         # 为每个文件添加特定的元数据（使用base64编码处理中文）
                         file_metadata = metadata.copy() if metadata else {}
-                        import base64
                         relative_path_b64 = base64.b64encode(str(relative_path).encode('utf-8')).decode('ascii')
                         file_metadata.update({
                             'relative-path-base64': relative_path_b64,
@@ -291,22 +386,54 @@ class S3UploadService:
                             s3_config=s3_config,
                             metadata=file_metadata
                         )
-
-                        if result.get('success'):
-                            # 添加relative_path字段到结果中
-                            result['relative_path'] = str(relative_path)
-                            uploaded_files.append(result)
-                            total_size += result.get('file_size', 0)
-                        else:
-                            failed_files.append({
-                                'file': str(file_path),
-                                'error': result.get('error', 'Unknown error')
-                            })
                     except Exception as e:
-                        failed_files.append({
-                            'file': str(file_path),
-                            'error': str(e)
+                        result = {'success': False, 'error': str(e)}
+
+                # 添加relative_path字段到结果中
+                result['relative_path'] = str(relative_path)
+                progress['completed_files'] += 1
+                if result.get('success'):
+                    progress['uploaded_bytes'] += result.get('file_size', 0)
+
+                if progress_callback:
+                    try:
+                        callback_result = progress_callback({
+                            'relative_path': str(relative_path),
+                            's3_key': s3_key,
+                            'success': bool(result.get('success')),
+                            'error': result.get('error'),
+                            'file_size': result.get('file_size', 0),
+                            'upload_time': result.get('upload_time', 0),
+                            'completed_files': progress['completed_files'],
+                            'total_files': total_files,
+                            'uploaded_bytes': progress['uploaded_bytes'],
+                            'total_bytes': total_bytes
                         })
+                        if inspect.isawaitable(callback_result):
+                            await callback_result
+                    except Exception as e:
+                        logger.warning(f"Upload progress callback failed: {e}")
+                return result
+
+            start_time = datetime.now()
+            results: List[Dict[str, Any]] = await asyncio.gather(*[upload_one(file_path) for file_path in files])
+
+            uploaded_files = []
+            failed_files = []
+            total_size = 0
+            for file_path, result in zip(files, results):
+                if result.get('success'):
+                    uploaded_files.append(result)
+                    total_size += result.get('file_size', 0)
+                else:
+                    failed_files.append({
+                        'file': str(file_path),
+                        'error': result.get('error', 'Unknown error')
+                    })
+
+            upload_time = (datetime.now() - start_time).total_seconds()
+            logger.info(f"Directory upload finished: {len(uploaded_files)}/{total_files} files, {total_size} bytes "
+                        f"in {upload_time:.2f}s (concurrency: {self.upload_concurrency})")
 
             success = len(failed_files) == 0
             return {
@@ -317,7 +444,8 @@ class S3UploadService:
                 'failed_files_count': len(failed_files),
                 'uploaded_files': uploaded_files,
                 'failed_files': failed_files,
-                'total_uploaded_size': total_size
+                'total_uploaded_size': total_size,
+                'upload_time': upload_time
             }
         except Exception as e:
             logger.error(f"Unexpected error during directory upload: {e}")
@@ -427,7 +555,8 @@ class S3UploadService:
                                               original_filename: Optional[str] = None,
                                               original_bucket: Optional[str] = None,
                                               original_folder: Optional[str] = None,
-                                              task_type: str = "document-conversion") -> Dict[str, Any]:
+                                              task_type: str = "document-conversion",
+                                              progress_callback: Optional[Callable[[Dict[str, Any]], Any]] = None) -> Dict[str, Any]:
         """
         上传完整的转换结果（包括Markdown、JSON、图片等所有文件）
 
@@ -438,6 +567,7 @@ class S3UploadService:
             original_bucket: 原始文件所在的bucket
             original_folder: 原始文件所在的文件夹
             task_type: 任务类型
+            progress_callback: 每个文件上传结束后的进度回调
 
         Returns:
             上传结果字典
@@ -497,7 +627,8 @@ class S3UploadService:
                 local_dir_path=str(output_dir),
                 s3_prefix=s3_prefix,
                 bucket_name="ai-file",
-                metadata=metadata
+                metadata=metadata,
+                progress_callback=progress_callback
             )
 
             if result['success']:
@@ -531,6 +662,32 @@ class S3UploadService:
                 'error_type': type(e).__name__
             }
     
+    async def check_object_exists(self, s3_url: str, s3_config: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        检查已上传的输出对象是否仍然存在
+
+        Args:
+            s3_url: s3://bucket/key 格式的地址
+            s3_config: S3配置，如果为None则使用默认配置
+
+        Returns:
+            对象是否存在
+        """
+        if not s3_url or not s3_url.startswith('s3://') or '/' not in s3_url[5:]:
+            return False
+        bucket, s3_key = s3_url[5:].split('/', 1)
+        try:
+            s3_client = self.create_s3_client(s3_config or self.default_config)
+            await asyncio.to_thread(s3_client.head_object, Bucket=bucket, Key=s3_key)
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] not in ('NoSuchKey', '404'):
+                logger.warning(f"Failed to check object {s3_url}: {e}")
+            return False
+        except Exception as e:
+            logger.warning(f"Failed to check object {s3_url}: {e}")
+            return False
+
     def _get_content_type(self, file_path: Path) -> Optional[str]:
         """根据文件扩展名获取Content-Type"""
         content_types = {
@@ -545,6 +702,9 @@ class S3UploadService:
             '.ppt': 'application/vnd.ms-powerpoint',
             '.zip': 'application/zip',
             '.json': 'application/json',
+            '.jsonl': 'application/x-ndjson',
+            '.gz': 'application/gzip',
+            '.zst': 'application/zstd',
             '.html': 'text/html',
             '.htm': 'text/html'
         }
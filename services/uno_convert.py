@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+UNO转换客户端
+连接常驻soffice实例并把文档导出为PDF。本模块只依赖标准库和UNO绑定：
+应用所在的Python环境能导入uno时由进程池在线程中直接调用；否则由安装了python3-uno的
+系统Python以脚本方式执行（与unoserver的unoconvert客户端相同的做法），常驻实例照常复用。
+
+用法:
+    /usr/bin/python3 services/uno_convert.py <port> <input_path> <output_path>
+"""
+
+import os
+import sys
+from typing import Any
+
+try:
+    import uno
+    from com.sun.star.beans import PropertyValue
+    UNO_AVAILABLE = True
+except ImportError:
+    uno = None
+    PropertyValue = None
+    UNO_AVAILABLE = False
+
+
+# 按文档类型选择PDF导出过滤器
+_PDF_EXPORT_FILTERS = [
+    ("com.sun.star.presentation.PresentationDocument", "impress_pdf_Export"),
+    ("com.sun.star.sheet.SpreadsheetDocument", "calc_pdf_Export"),
+    ("com.sun.star.drawing.DrawingDocument", "draw_pdf_Export"),
+    ("com.sun.star.text.TextDocument", "writer_pdf_Export"),
+]
+
+
+def _uno_property(name: str, value: Any):
+    """构造UNO PropertyValue"""
+    prop = PropertyValue()
+    prop.Name = name
+    prop.Value = value
+    return prop
+
+
+def convert_to_pdf(port: int, input_path: str, output_path: str) -> None:
+    """
+    通过UNO连接常驻soffice实例并导出PDF（阻塞调用）
+
+    Args:
+        port: soffice实例监听端口
+        input_path: 输入文件路径
+        output_path: 输出PDF路径
+    """
+    local_ctx = uno.getComponentContext()
+    resolver = local_ctx.ServiceManager.createInstanceWithContext("com.sun.star.bridge.UnoUrlResolver", local_ctx)
+    ctx = resolver.resolve(f"uno:socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext")
+    desktop = ctx.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", ctx)
+
+    document = desktop.loadComponentFromURL(
+        uno.systemPathToFileUrl(os.path.abspath(input_path)), "_blank", 0,
+        (_uno_property("Hidden", True), _uno_property("ReadOnly", True))
+    )
+    if document is None:
+        raise RuntimeError(f"LibreOffice failed to load document: {input_path}")
+
+    try:
+        filter_name = "writer_pdf_Export"
+        for service_name, export_filter in _PDF_EXPORT_FILTERS:
+            if document.supportsService(service_name):
+                filter_name = export_filter
+                break
+        document.storeToURL(
+            uno.systemPathToFileUrl(os.path.abspath(output_path)),
+            (_uno_property("FilterName", filter_name),)
+        )
+    finally:
+        document.close(True)
+
+
+def main() -> int:
+    """命令行入口"""
+    if len(sys.argv) != 4:
+        print("usage: uno_convert.py <port> <input_path> <output_path>", file=sys.stderr)
+        return 2
+    if not UNO_AVAILABLE:
+        print("python UNO bindings (python3-uno) are not installed for this interpreter", file=sys.stderr)
+        return 3
+    try:
+        convert_to_pdf(int(sys.argv[1]), sys.argv[2], sys.argv[3])
+    except Exception as e:
+        print(f"{type(e).__name__}: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+转换结果缓存键隔离测试
+缓存键只能来自服务端计算的哈希，客户端在params中提供的 input_sha256 既不能命中也不能写入其他文档的缓存条目
+"""
+
+import asyncio
+
+from api.unified_document_api import _build_batch_request, _strip_internal_params
+from database.models import DocumentTask
+from processors.enhanced_task_processor import EnhancedTaskProcessor
+from services.conversion_cache import ConversionCache, compute_file_sha256
+
+
+def _make_processor(cache: ConversionCache) -> EnhancedTaskProcessor:
+    """只带转换缓存的处理器（不启动数据库、S3等依赖）"""
+    processor = EnhancedTaskProcessor.__new__(EnhancedTaskProcessor)
+    processor.conversion_cache = cache
+    return processor
+
+
+def _cache_key(processor: EnhancedTaskProcessor, task: DocumentTask, input_file) -> str:
+    return asyncio.run(processor._get_conversion_cache_key(task, input_file))
+
+
+def _write(path, content: str):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content, encoding='utf-8')
+    return path
+
+
+def test_client_supplied_hash_cannot_hit_other_document(tmp_path):
+    cache = ConversionCache(cache_dir=str(tmp_path / "cache"), max_size_mb=10)
+    processor = _make_processor(cache)
+
+    victim_input = _write(tmp_path / "victim.pdf", "victim document")
+    victim_task = DocumentTask(task_type='pdf_to_markdown', params={})
+    victim_key = _cache_key(processor, victim_task, victim_input)
+    assert cache.store(victim_key, str(_write(tmp_path / "victim_out" / "victim.md", "secret markdown")))
+
+    attacker_input = _write(tmp_path / "attacker.pdf", "attacker document")
+    attacker_task = DocumentTask(task_type='pdf_to_markdown',
+                                 params={'input_sha256': compute_file_sha256(str(victim_input))})
+    attacker_key = _cache_key(processor, attacker_task, attacker_input)
+
+    assert attacker_key != victim_key
+    assert attacker_key == cache.build_key(compute_file_sha256(str(attacker_input)), 'pdf_to_markdown',
+                                           processor._get_output_options(attacker_task))
+    assert cache.restore(attacker_key, str(tmp_path / "attacker_out" / "attacker.md"), "attacker.json") is None
+
+
+def test_client_supplied_hash_cannot_fill_other_document_entry(tmp_path):
+    cache = ConversionCache(cache_dir=str(tmp_path / "cache"), max_size_mb=10)
+    processor = _make_processor(cache)
+
+    victim_input = _write(tmp_path / "victim.pdf", "victim document")
+    victim_key = _cache_key(processor, DocumentTask(task_type='pdf_to_markdown', params={}), victim_input)
+
+    # 攻击者先完成转换，其结果只能写入自己输入内容对应的条目
+    attacker_input = _write(tmp_path / "attacker.pdf", "attacker document")
+    attacker_task = DocumentTask(task_type='pdf_to_markdown',
+                                 params={'input_sha256': compute_file_sha256(str(victim_input))})
+    attacker_key = _cache_key(processor, attacker_task, attacker_input)
+    assert cache.store(attacker_key, str(_write(tmp_path / "attacker_out" / "attacker.md", "poisoned markdown")))
+
+    assert cache.restore(victim_key, str(tmp_path / "victim_out" / "victim.md"), "victim.json") is None
+
+
+def test_server_computed_upload_hash_is_used(tmp_path):
+    cache = ConversionCache(cache_dir=str(tmp_path / "cache"), max_size_mb=10)
+    processor = _make_processor(cache)
+
+    upload_sha256 = "a" * 64
+    task = DocumentTask(task_type='pdf_to_markdown', params={'input_sha256': "b" * 64},
+                        input_sha256=upload_sha256)
+    # 上传暂存时已计算哈希，不再读取输入文件
+    key = _cache_key(processor, task, tmp_path / "missing.pdf")
+    assert key == cache.build_key(upload_sha256, 'pdf_to_markdown', processor._get_output_options(task))
+
+
+def test_api_strips_client_supplied_hash():
+    assert _strip_internal_params({'lang': 'ch', 'input_sha256': "a" * 64}) == {'lang': 'ch'}
+
+    request = _build_batch_request(
+        {'task_type': 'pdf_to_markdown', 'params': {'input_sha256': "a" * 64}},
+        {'file_url': 'http://example.com/a.pdf', 'params': {'lang': 'en'}}
+    )
+    assert request.params == {'lang': 'en'}
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+数据库管理器测试
+覆盖原子认领与优先级老化、租约续期/释放/回收，以及任务列表游标分页
+"""
+
+import asyncio
+import datetime as dt
+
+from database.database_manager import DatabaseManager
+from database.models import QueryTasksFilter, TaskPriority, TaskStatus, decode_task_cursor, encode_task_cursor
+
+
+def _run_with_db(tmp_path, scenario):
+    """在临时SQLite文件数据库上运行一个异步场景"""
+    async def _main():
+        db = DatabaseManager("sqlite", f"sqlite+aiosqlite:///{tmp_path / 'tasks.db'}", reconnect_interval=1)
+        await db.initialize()
+        try:
+            return await scenario(db)
+        finally:
+            await db.close()
+
+    return asyncio.run(_main())
+
+
+def _task_row(priority: TaskPriority, created_at: dt.datetime, **fields) -> dict:
+    return {
+        'task_type': 'pdf_to_markdown',
+        'status': TaskStatus.pending,
+        'priority': priority,
+        'bucket_name': 'ai-file',
+        'file_path': 'docs/test.pdf',
+        'params': {},
+        'retry_count': 0,
+        'max_retry_count': 3,
+        'created_at': created_at,
+        **fields
+    }
+
+
+def test_claim_ages_waiting_low_priority_ahead_of_new_high_priority(tmp_path):
+    now = dt.datetime.now()
+
+    async def scenario(db):
+        low_id, high_id = await db.create_tasks_bulk([
+            _task_row(TaskPriority.low, now - dt.timedelta(seconds=1000)),
+            _task_row(TaskPriority.high, now),
+        ])
+        # 低优先级比高优先级早1000秒，老化间隔300秒时低两级只折算600秒，应先被认领
+        aged = await db.claim_pending_tasks(limit=1, worker_id="worker-a", aging_seconds=300)
+        rest = await db.claim_pending_tasks(limit=1, worker_id="worker-a", aging_seconds=300)
+        return low_id, high_id, aged, rest
+
+    low_id, high_id, aged, rest = _run_with_db(tmp_path, scenario)
+    assert [task.id for task in aged] == [low_id]
+    assert [task.id for task in rest] == [high_id]
+    assert aged[0].status == TaskStatus.processing
+    assert aged[0].worker_id == "worker-a"
+    assert aged[0].lease_expires_at is not None
+
+
+def test_claim_keeps_strict_priority_within_aging_window(tmp_path):
+    now = dt.datetime.now()
+
+    async def scenario(db):
+        low_id, high_id = await db.create_tasks_bulk([
+            _task_row(TaskPriority.low, now - dt.timedelta(seconds=1000)),
+            _task_row(TaskPriority.high, now),
+        ])
+        claimed = await db.claim_pending_tasks(limit=2, worker_id="worker-a", aging_seconds=3600)
+        return low_id, high_id, claimed
+
+    low_id, high_id, claimed = _run_with_db(tmp_path, scenario)
+    assert [task.id for task in claimed] == [high_id, low_id]
+
+
+def test_concurrent_claims_never_return_the_same_task(tmp_path):
+    now = dt.datetime.now()
+
+    async def scenario(db):
+        task_ids = await db.create_tasks_bulk([
+            _task_row(TaskPriority.normal, now - dt.timedelta(seconds=i)) for i in range(30)
+        ])
+        batches = await asyncio.gather(*(
+            db.claim_pending_tasks(limit=4, worker_id=f"worker-{i}") for i in range(10)
+        ))
+        return task_ids, batches
+
+    task_ids, batches = _run_with_db(tmp_path, scenario)
+    claimed = [task.id for batch in batches for task in batch]
+    assert len(claimed) == len(set(claimed)) == len(task_ids)
+    assert set(claimed) == set(task_ids)
+
+
+def test_lease_renew_release_and_recovery_respect_ownership(tmp_path):
+    now = dt.datetime.now()
+
+    async def scenario(db):
+        expired_id, live_id, released_id = await db.create_tasks_bulk([
+            _task_row(TaskPriority.high, now - dt.timedelta(seconds=30)),
+            _task_row(TaskPriority.normal, now - dt.timedelta(seconds=20)),
+            _task_row(TaskPriority.low, now - dt.timedelta(seconds=10)),
+        ])
+        # worker-a 的租约已过期（崩溃的处理器），worker-b 持有有效租约
+        await db.claim_pending_tasks(limit=1, worker_id="worker-a", lease_seconds=-1, aging_seconds=3600)
+        await db.claim_pending_tasks(limit=2, worker_id="worker-b", lease_seconds=300, aging_seconds=3600)
+
+        results = {
+            'renew_foreign': await db.renew_task_leases([live_id], "worker-a", 300),
+            'release_foreign': await db.release_task_leases([live_id], "worker-a"),
+            'release_own': await db.release_task_leases([released_id], "worker-b"),
+            'recovered': await db.recover_expired_tasks(),
+            'renew_recovered': await db.renew_task_leases([expired_id], "worker-a", 300),
+        }
+        tasks = {task_id: await db.get_task(task_id) for task_id in (expired_id, live_id, released_id)}
+        return expired_id, live_id, released_id, results, tasks
+
+    expired_id, live_id, released_id, results, tasks = _run_with_db(tmp_path, scenario)
+    assert results == {'renew_foreign': 0, 'release_foreign': 0, 'release_own': 1,
+                       'recovered': 1, 'renew_recovered': 0}
+
+    assert tasks[expired_id].status == TaskStatus.pending
+    assert tasks[expired_id].worker_id is None
+    assert tasks[expired_id].lease_expires_at is None
+
+    assert tasks[live_id].status == TaskStatus.processing
+    assert tasks[live_id].worker_id == "worker-b"
+
+    assert tasks[released_id].status == TaskStatus.pending
+    assert tasks[released_id].worker_id is None
+    assert tasks[released_id].started_at is None
+
+
+def test_cursor_round_trip():
+    created_at = dt.datetime(2026, 1, 2, 3, 4, 5, 678901)
+    assert decode_task_cursor(encode_task_cursor(created_at, 42)) == (created_at, 42)
+
+
+def test_cursor_pages_cover_every_task_once_with_tied_timestamps(tmp_path):
+    base = dt.datetime(2026, 1, 1)
+
+    async def scenario(db):
+        # 每3个任务共用一个创建时间，游标必须靠ID区分同一时间的任务
+        await db.create_tasks_bulk([
+            _task_row(TaskPriority.normal, base + dt.timedelta(seconds=i // 3)) for i in range(25)
+        ])
+        expected = await db.query_tasks_page(QueryTasksFilter(limit=100))
+
+        pages, cursor = [], None
+        while True:
+            page = await db.query_tasks_page(QueryTasksFilter(limit=7, cursor=cursor))
+            pages.append(page)
+            if not page['has_more']:
+                break
+            cursor = page['next_cursor']
+
+        # 分页期间插入的新任务排在已读页面之前，不会让后续页面错位
+        await db.create_tasks_bulk([_task_row(TaskPriority.normal, base + dt.timedelta(days=1))])
+        resumed = await db.query_tasks_page(QueryTasksFilter(limit=7, cursor=pages[0]['next_cursor']))
+        return expected, pages, resumed
+
+    expected, pages, resumed = _run_with_db(tmp_path, scenario)
+    expected_ids = [task.id for task in expected['tasks']]
+    paged_ids = [task.id for page in pages for task in page['tasks']]
+
+    assert len(expected_ids) == 25
+    assert paged_ids == expected_ids
+    assert [len(page['tasks']) for page in pages] == [7, 7, 7, 4]
+    assert pages[-1]['next_cursor'] is None
+    assert [task.id for task in resumed['tasks']] == expected_ids[7:14]
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+推理执行器名额统计测试
+作业成功、失败、超时以及工作进程启动失败后，名额和在途作业数都必须回到初始值
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from services.inference_executor import InferenceExecutor, InferenceTimeoutError
+from services.model_worker_pool import ModelWorkerError, ModelWorkerTimeoutError
+
+
+class _FakeWorkerPool:
+    """替代常驻模型工作进程池：按预设行为启动和运行作业"""
+
+    def __init__(self, start_error=None, run_error=None):
+        self.start_error = start_error
+        self.run_error = run_error
+        self.start_calls = 0
+
+    async def start(self):
+        self.start_calls += 1
+        if self.start_error is not None:
+            raise self.start_error
+
+    async def run(self, func, *args, timeout=3600, **kwargs):
+        if self.run_error is not None:
+            raise self.run_error
+        return func(*args, **kwargs)
+
+    async def shutdown(self):
+        pass
+
+    def get_stats(self):
+        return {}
+
+
+def _warm_executor(worker_pool: _FakeWorkerPool) -> InferenceExecutor:
+    executor = InferenceExecutor(mode="warm", max_workers=1, max_queue_size=1, job_timeout=5)
+    executor._worker_pool = worker_pool
+    return executor
+
+
+def _assert_slots_released(executor: InferenceExecutor):
+    assert executor.stats["inflight_jobs"] == 0
+    assert executor._slots._value == executor.max_workers + executor.max_queue_size
+
+
+def _fail():
+    raise ValueError("conversion failed")
+
+
+def test_thread_mode_releases_slots_after_success_and_failure():
+    async def scenario():
+        executor = InferenceExecutor(mode="thread", max_workers=1, max_queue_size=1, job_timeout=5)
+        try:
+            assert await executor.run(sum, [1, 2, 3]) == 6
+            with pytest.raises(ValueError):
+                await executor.run(_fail)
+            await asyncio.sleep(0)
+            _assert_slots_released(executor)
+            return executor.stats
+        finally:
+            await executor.shutdown()
+
+    stats = asyncio.run(scenario())
+    assert stats["completed_jobs"] == 1
+    assert stats["failed_jobs"] == 1
+
+
+def test_thread_mode_timed_out_job_holds_slot_until_it_finishes():
+    release = threading.Event()
+
+    async def scenario():
+        executor = InferenceExecutor(mode="thread", max_workers=1, max_queue_size=1, job_timeout=5)
+        try:
+            with pytest.raises(InferenceTimeoutError):
+                await executor.run(release.wait, 5, timeout=0.1)
+            # 线程无法中断，作业仍在运行并占用名额
+            held = (executor.stats["inflight_jobs"], executor._slots._value)
+            release.set()
+            for _ in range(100):
+                if executor.stats["inflight_jobs"] == 0:
+                    break
+                await asyncio.sleep(0.01)
+            _assert_slots_released(executor)
+            return held, executor.stats
+        finally:
+            release.set()
+            await executor.shutdown()
+
+    held, stats = asyncio.run(scenario())
+    assert held == (1, 1)
+    assert stats["timed_out_jobs"] == 1
+
+
+def test_warm_mode_releases_slot_when_lazy_start_fails():
+    worker_pool = _FakeWorkerPool(start_error=ModelWorkerError("model load failed"))
+
+    async def scenario():
+        executor = _warm_executor(worker_pool)
+        # 连续失败次数超过名额总数，名额泄漏时会永久阻塞
+        for _ in range(executor.max_workers + executor.max_queue_size + 2):
+            with pytest.raises(ModelWorkerError):
+                await asyncio.wait_for(executor.run(sum, [1]), timeout=1)
+        _assert_slots_released(executor)
+        return executor
+
+    executor = asyncio.run(scenario())
+    assert executor._started is False
+    assert worker_pool.start_calls == 4
+    assert executor.stats["failed_jobs"] == 4
+
+
+def test_warm_mode_releases_slot_on_timeout_and_failure():
+    async def scenario():
+        executor = _warm_executor(_FakeWorkerPool(run_error=ModelWorkerTimeoutError("job timed out")))
+        with pytest.raises(InferenceTimeoutError):
+            await executor.run(sum, [1])
+        _assert_slots_released(executor)
+
+        executor._worker_pool.run_error = RuntimeError("worker crashed")
+        with pytest.raises(RuntimeError):
+            await executor.run(sum, [1])
+        _assert_slots_released(executor)
+
+        executor._worker_pool.run_error = None
+        assert await executor.run(sum, [1, 2]) == 3
+        _assert_slots_released(executor)
+        return executor.stats
+
+    stats = asyncio.run(scenario())
+    assert stats["timed_out_jobs"] == 1
+    assert stats["failed_jobs"] == 1
+    assert stats["completed_jobs"] == 1
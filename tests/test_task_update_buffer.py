@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+任务字段写合并缓冲测试
+写入失败时字段必须留在缓冲中，由下一次 flush() 重试
+"""
+
+import asyncio
+
+from database.task_update_buffer import TaskUpdateBuffer
+
+
+class _FakeDatabase:
+    """按预设结果返回的 update_task，记录每次写入的字段"""
+
+    def __init__(self, results):
+        self.results = list(results)
+        self.writes = []
+
+    async def update_task(self, task_id, **fields):
+        self.writes.append((task_id, fields))
+        return self.results.pop(0)
+
+
+def test_failed_flush_restages_fields_for_retry():
+    db = _FakeDatabase([False, True])
+    buffer = TaskUpdateBuffer(db, enabled=True)
+
+    async def scenario():
+        await buffer.stage(1, output_path="/out/1.md", file_size_bytes=10)
+        first = await buffer.flush(1, status="completed")
+        staged_after_failure = buffer.peek(1)
+        # 失败后新暂存的字段优先于放回的旧值
+        await buffer.stage(1, output_path="/out/1-retry.md")
+        second = await buffer.flush(1)
+        return first, staged_after_failure, second
+
+    first, staged_after_failure, second = asyncio.run(scenario())
+    assert first is False
+    assert staged_after_failure == {"output_path": "/out/1.md", "file_size_bytes": 10, "status": "completed"}
+    assert second is True
+    assert db.writes[1] == (1, {"output_path": "/out/1-retry.md", "file_size_bytes": 10, "status": "completed"})
+    assert buffer.peek(1) == {}
+    assert buffer.get_stats()["failed_writes"] == 1
+    assert buffer.get_stats()["writes"] == 1
+
+
+def test_direct_flush_bypasses_failing_writer():
+    db = _FakeDatabase([True])
+    writer_calls = []
+
+    async def failing_writer(task_id, values):
+        writer_calls.append((task_id, values))
+        return False
+
+    buffer = TaskUpdateBuffer(db, enabled=True, writer=failing_writer)
+
+    async def scenario():
+        await buffer.stage(7, status="completed")
+        via_writer = await buffer.flush(7)
+        via_database = await buffer.flush(7, direct=True)
+        return via_writer, via_database
+
+    via_writer, via_database = asyncio.run(scenario())
+    assert via_writer is False
+    assert via_database is True
+    assert writer_calls == [(7, {"status": "completed"})]
+    assert db.writes == [(7, {"status": "completed"})]
+    assert buffer.peek(7) == {}
@@ -7,14 +7,21 @@
 import os
 import shutil
 import tempfile
+import uuid
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 
 from utils.logging_utils import configure_logging
 
 logger = configure_logging(name=__name__)
 
+# ioctl(FICLONE)：在支持的文件系统(btrfs/xfs等)上创建共享数据块的副本
+FICLONE = 0x40049409
+
+# 默认的输入文件放置策略顺序
+DEFAULT_STAGING_STRATEGIES = "hardlink,reflink,copy_file_range,symlink,copy"
+
 
 class WorkspaceManager:
     """工作空间管理器"""
@@ -119,6 +126,117 @@ class WorkspaceManager:
         input_dir = self.get_task_input_dir(task_id)
         return input_dir / filename
     
+    def create_upload_staging_path(self) -> Path:
+        """
+        获取上传文件的暂存路径
+        
+        暂存目录位于工作空间内，与任务input目录在同一文件系统，
+        任务创建后可直接重命名到input目录，无需复制。
+        
+        Returns:
+            暂存文件路径
+        """
+        staging_dir = self.base_workspace_dir / ".uploads"
+        staging_dir.mkdir(parents=True, exist_ok=True)
+        return staging_dir / f"{uuid.uuid4().hex}.part"
+    
+    def stage_input_file(self, source_path: Path, target_path: Path,
+                         strategies: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        把本地输入文件放到任务input目录，尽量避免复制数据
+        
+        依次尝试：硬链接 -> reflink(FICLONE) -> copy_file_range（内核内复制，仅同一设备）
+        -> 符号链接（只读引用源文件，跨设备时使用）-> 普通复制。
+        
+        Args:
+            source_path: 源文件路径
+            target_path: 目标路径（任务input目录中）
+            strategies: 策略顺序，默认读取 INPUT_STAGING_STRATEGIES
+            
+        Returns:
+            结果字典，包含 path / strategy / size
+        """
+        if strategies is None:
+            strategies = [item.strip() for item in
+                          os.getenv("INPUT_STAGING_STRATEGIES", DEFAULT_STAGING_STRATEGIES).split(",") if item.strip()]
+        
+        source_path = Path(source_path).resolve()
+        target_path = Path(target_path)
+        target_path.parent.mkdir(parents=True, exist_ok=True)
+        same_device = source_path.stat().st_dev == target_path.parent.stat().st_dev
+        
+        handlers = {
+            "hardlink": self._stage_hardlink,
+            "reflink": self._stage_reflink,
+            "copy_file_range": self._stage_copy_file_range,
+            "symlink": self._stage_symlink,
+            "copy": self._stage_copy,
+        }
+        
+        last_error = None
+        for strategy in strategies:
+            handler = handlers.get(strategy)
+            if handler is None:
+                logger.warning(f"Unknown input staging strategy: {strategy}")
+                continue
+            # 硬链接、reflink和copy_file_range只在同一设备上有意义
+            if strategy in ("hardlink", "reflink", "copy_file_range") and not same_device:
+                continue
+            if os.path.lexists(target_path):
+                target_path.unlink()
+            try:
+                handler(source_path, target_path)
+                logger.debug(f"Staged input {source_path} -> {target_path} via {strategy}")
+                return {
+                    'path': target_path,
+                    'strategy': strategy,
+                    'size': source_path.stat().st_size
+                }
+            except (OSError, NotImplementedError) as e:
+                last_error = e
+                logger.debug(f"Input staging via {strategy} failed: {e}")
+                if os.path.lexists(target_path):
+                    target_path.unlink()
+        
+        raise OSError(f"Failed to stage input file {source_path}: {last_error}")
+    
+    @staticmethod
+    def _stage_hardlink(source_path: Path, target_path: Path):
+        """硬链接（共享同一inode）"""
+        os.link(source_path, target_path)
+    
+    @staticmethod
+    def _stage_reflink(source_path: Path, target_path: Path):
+        """reflink：写时复制的数据块共享"""
+        import fcntl
+        with open(source_path, 'rb') as src, open(target_path, 'wb') as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        shutil.copystat(source_path, target_path)
+    
+    @staticmethod
+    def _stage_copy_file_range(source_path: Path, target_path: Path):
+        """copy_file_range：数据在内核内复制，不经过用户态缓冲区"""
+        if not hasattr(os, "copy_file_range"):
+            raise NotImplementedError("copy_file_range is not available")
+        remaining = source_path.stat().st_size
+        with open(source_path, 'rb') as src, open(target_path, 'wb') as dst:
+            while remaining > 0:
+                copied = os.copy_file_range(src.fileno(), dst.fileno(), min(remaining, 1 << 30))
+                if copied == 0:
+                    raise OSError("copy_file_range returned 0 before end of file")
+                remaining -= copied
+        shutil.copystat(source_path, target_path)
+    
+    @staticmethod
+    def _stage_symlink(source_path: Path, target_path: Path):
+        """符号链接（任务只读取输入文件，不修改源文件）"""
+        os.symlink(source_path, target_path)
+    
+    @staticmethod
+    def _stage_copy(source_path: Path, target_path: Path):
+        """普通复制"""
+        shutil.copy2(source_path, target_path)
+    
     def get_output_file_path(self, task_id: str, filename: str) -> Path:
         """
         获取输出文件的存储路径